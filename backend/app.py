@@ -1,27 +1,402 @@
-
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from database.db_connector import DatabaseConnector
+from database.db_connector import DatabaseConnector, STRESS_RECORD_FIELDS
+from database.cache import create_cache
+from database.write_behind import WriteBehindQueue
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.security import generate_password_hash, check_password_hash
-from stress_detector.detector import StressDetector
+from stress_detector.inference_pool import InferencePool, InferenceTimeout
+from stress_detector.model_registry import DEFAULT_REGISTRY_DIR
 import jwt
 import datetime
 import os
-import base64
+import binascii
+import json
+import struct
+import tarfile
+import tempfile
+import threading
 import uuid
+import zipfile
 from typing import Dict, List, Any, Optional
 
 app = Flask(__name__)
-CORS(app)
+# Browsers only let scripts read response headers that are exposed
+CORS(app, expose_headers=['X-Next-Cursor'])
 
 # In a real application, use a strong secret key stored in environment variables
 app.config['SECRET_KEY'] = 'your_secret_key_here'
 
-# Initialize database connector
-db = DatabaseConnector()
+# Initialize database connector (size the pool to the worker's thread count)
+db = DatabaseConnector(
+    pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+    checkout_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    notification_cooldown_minutes=float(os.environ.get('STRESS_ALERT_COOLDOWN_MINUTES', 60)),
+    cache=create_cache(
+        backend=os.environ.get('DB_CACHE_BACKEND', 'local'),
+        ttl=float(os.environ.get('DB_CACHE_TTL', 60)),
+        max_entries=int(os.environ.get('DB_CACHE_MAX_ENTRIES', 10000)),
+        path=os.environ.get('DB_CACHE_PATH')
+    )
+)
+
+# Stress records are saved by a background writer so responses don't wait on MySQL
+write_behind = None
+if os.environ.get('STRESS_WRITE_BEHIND', '1') == '1':
+    write_behind = WriteBehindQueue(
+        db,
+        journal_dir=os.environ.get('STRESS_WRITE_BEHIND_DIR', os.path.join(os.path.dirname(__file__), 'data', 'journal')),
+        max_queue=int(os.environ.get('STRESS_WRITE_BEHIND_MAX_QUEUE', 10000)),
+        batch_size=int(os.environ.get('STRESS_WRITE_BEHIND_BATCH_SIZE', 200)),
+        flush_interval=float(os.environ.get('STRESS_WRITE_BEHIND_FLUSH_INTERVAL', 0.5)),
+        on_full=os.environ.get('STRESS_WRITE_BEHIND_ON_FULL', 'block'),
+        fsync=os.environ.get('STRESS_WRITE_BEHIND_FSYNC', '0') == '1'
+    )
+
+def save_stress_result(user_id: str, level: str, score: int, source: str, notes: str = None,
+                       model_version: str = None) -> Optional[str]:
+    """Save a stress record through the write-behind queue, or directly if it is disabled"""
+    if write_behind is not None:
+        return write_behind.submit(user_id, level, score, source, notes, model_version)
+    return db.save_stress_record(user_id=user_id, level=level, score=score, source=source, notes=notes,
+                                 model_version=model_version)
+
+# Stress detector settings
+# Concurrent requests are micro-batched; tune both limits under real load
+DETECTOR_CONFIG = dict(
+    max_batch_size=int(os.environ.get('STRESS_MAX_BATCH_SIZE', 8)),
+    max_wait_ms=float(os.environ.get('STRESS_MAX_WAIT_MS', 5)),
+    model_path=os.environ.get('STRESS_MODEL_PATH') or None,
+    backend=os.environ.get('STRESS_MODEL_BACKEND', 'graph'),
+    backend_config={
+        'buckets': [int(b) for b in os.environ.get('STRESS_GRAPH_BUCKETS', '1,2,4,8').split(',') if b.strip()],
+        'intra_op_threads': int(os.environ.get('STRESS_TF_INTRA_OP_THREADS', 0)) or None,
+        'inter_op_threads': int(os.environ.get('STRESS_TF_INTER_OP_THREADS', 0)) or None,
+        'num_threads': int(os.environ.get('STRESS_TFLITE_THREADS', 0)) or None
+    },
+    face_config={
+        'scale_factor': float(os.environ.get('STRESS_FACE_SCALE_FACTOR', 1.3)),
+        'min_neighbors': int(os.environ.get('STRESS_FACE_MIN_NEIGHBORS', 5)),
+        'min_size': (int(os.environ['STRESS_FACE_MIN_SIZE']),) * 2 if os.environ.get('STRESS_FACE_MIN_SIZE') else None,
+        'max_size': (int(os.environ['STRESS_FACE_MAX_SIZE']),) * 2 if os.environ.get('STRESS_FACE_MAX_SIZE') else None
+    },
+    preprocess_config={
+        'detect_max_side': int(os.environ.get('STRESS_DETECT_MAX_SIDE', 480)),
+        'reduced_decode_min_side': int(os.environ.get('STRESS_REDUCED_DECODE_MIN_SIDE', 896)) or None
+    },
+    result_cache_config={
+        'max_bytes': int(os.environ.get('STRESS_RESULT_CACHE_MB', 16)) * 1024 * 1024
+    },
+    # Serves the registry's active version unless STRESS_MODEL_PATH pins a file
+    registry_config={
+        'root': os.environ.get('STRESS_MODEL_REGISTRY') or DEFAULT_REGISTRY_DIR,
+        'poll_interval': float(os.environ.get('STRESS_MODEL_RELOAD_INTERVAL', 10))
+    },
+    video_config={
+        'sample_fps': float(os.environ.get('STRESS_VIDEO_SAMPLE_FPS', 2)),
+        'frame_stride': int(os.environ.get('STRESS_VIDEO_FRAME_STRIDE', 0)) or None,
+        'segment_seconds': float(os.environ.get('STRESS_VIDEO_SEGMENT_SECONDS', 10)),
+        'batch_size': int(os.environ.get('STRESS_VIDEO_BATCH_SIZE', 16))
+    }
+)
+
+# The model is loaded once per worker process, after the server has forked,
+# never at import time (see init_worker and gunicorn.conf.py). The detector
+# module pulls in OpenCV and, once loaded, TensorFlow, so it is imported lazily
+# too: processes that only serve auth or history never pay for either.
+detector = None
+inference_pool = None
+realtime_sessions = None
+_worker_lock = threading.Lock()
+
+def get_detector():
+    global detector
+    if detector is None:
+        with _worker_lock:
+            if detector is None:
+                from stress_detector.detector import StressDetector
+                detector = StressDetector(**DETECTOR_CONFIG)
+    return detector
+
+def get_inference_pool() -> InferencePool:
+    global inference_pool
+    if inference_pool is None:
+        with _worker_lock:
+            if inference_pool is None:
+                inference_pool = InferencePool(
+                    get_detector,
+                    detector_config=DETECTOR_CONFIG,
+                    mode=os.environ.get('STRESS_INFERENCE_MODE', 'thread'),
+                    workers=int(os.environ.get('STRESS_INFERENCE_WORKERS', 0)) or None,
+                    threads_per_process=int(os.environ.get('STRESS_INFERENCE_THREADS', 0)) or None,
+                    timeout=float(os.environ.get('STRESS_INFERENCE_TIMEOUT', 60))
+                )
+    return inference_pool
+
+# Seconds a client is asked to wait after an inference call times out
+INFERENCE_RETRY_AFTER = int(os.environ.get('STRESS_INFERENCE_RETRY_AFTER', 5))
+
+def inference_busy(error: InferenceTimeout):
+    """503 response for a detection that timed out waiting on the inference pool"""
+    response = jsonify({'message': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(INFERENCE_RETRY_AFTER)
+    return response
+
+# STRESS_WARMUP: 'sync' blocks until ready, 'background' lets the worker
+# serve other endpoints meanwhile, 'off' loads on the first detection
+STRESS_WARMUP = os.environ.get('STRESS_WARMUP', 'background')
+
+def warm_up():
+    """Load the model and trace the inference graph before traffic arrives"""
+    timings = get_detector().warm_up()
+    print(f"Stress detector warm-up finished: {timings}")
+
+def init_worker():
+    """Per-process startup: open the DB pool, start background writers and warm up the model"""
+    db.connect()
+    if write_behind is not None:
+        write_behind.start()
+    pool = get_inference_pool()
+    
+    if pool.mode == 'thread' and STRESS_WARMUP == 'sync':
+        warm_up()
+    elif pool.mode == 'thread' and STRESS_WARMUP == 'background':
+        threading.Thread(target=warm_up, name='stress-warm-up', daemon=True).start()
+    elif pool.mode == 'thread':
+        # Build the detector (cheap, no TensorFlow) so readiness has something to report
+        get_detector()
+
+# Realtime camera sessions (kept in this process; route a session to one worker)
+def get_realtime_preprocessor(pool: InferencePool):
+    """
+    Frames are decoded and face-tracked in this process and only the forward
+    pass goes through the inference pool. In process mode this builds a
+    preprocessor of its own so the web worker never loads the model.
+    """
+    if pool.mode == 'thread':
+        return get_detector().preprocessor
+    from stress_detector.face_detector import get_face_detector
+    from stress_detector.preprocessing import ImagePreprocessor
+    return ImagePreprocessor(get_face_detector(**DETECTOR_CONFIG['face_config']),
+                             **DETECTOR_CONFIG['preprocess_config'])
+
+def flush_expired_session(session):
+    """Save the last summary of a session whose client went away without closing it"""
+    with session.lock:
+        save_realtime_summary(session)
+
+def get_realtime_sessions():
+    global realtime_sessions
+    if realtime_sessions is None:
+        with _worker_lock:
+            if realtime_sessions is None:
+                from stress_detector.realtime import RealtimeSessionManager
+                pool = get_inference_pool()
+                realtime_sessions = RealtimeSessionManager(
+                    get_realtime_preprocessor(pool),
+                    pool.predict_image,
+                    on_expire=flush_expired_session,
+                    idle_timeout=float(os.environ.get('STRESS_REALTIME_IDLE_TIMEOUT', 300)),
+                    diff_threshold=float(os.environ.get('STRESS_REALTIME_DIFF_THRESHOLD', 4)),
+                    ewma_alpha=float(os.environ.get('STRESS_REALTIME_EWMA_ALPHA', 0.3)),
+                    summary_interval=float(os.environ.get('STRESS_REALTIME_SUMMARY_INTERVAL', 30)),
+                    redetect_every=int(os.environ.get('STRESS_REALTIME_REDETECT_EVERY', 15))
+                )
+    return realtime_sessions
+
+# Realtime frames are sent as a 4-byte big-endian length followed by the encoded image
+REALTIME_FRAME_HEADER = struct.Struct('>I')
+REALTIME_MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+def analyze_video_upload(file) -> Dict[str, Any]:
+    """Spool an uploaded video to a temp file in chunks and score it"""
+    suffix = os.path.splitext(file.filename or '')[1] or '.mp4'
+    fd, path = tempfile.mkstemp(prefix='stresssense_', suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            spool_upload(file.stream, spool, MAX_VIDEO_UPLOAD_BYTES)
+        return get_inference_pool().detect_stress_video(path)
+    finally:
+        os.remove(path)
+
+# Upload size limits, checked against Content-Length before any of the body is read
+# and enforced again while reading, for chunked bodies without a Content-Length
+MAX_IMAGE_UPLOAD_BYTES = int(float(os.environ.get('STRESS_MAX_IMAGE_UPLOAD_MB', 16)) * 1024 * 1024)
+MAX_VIDEO_UPLOAD_BYTES = int(float(os.environ.get('STRESS_MAX_VIDEO_UPLOAD_MB', 256)) * 1024 * 1024)
+
+# Per-thread upload buffer, reused across requests and grown on demand
+_upload_buffers = threading.local()
+
+class UploadTooLarge(ValueError):
+    pass
+
+def upload_too_large(limit: int) -> bool:
+    return request.content_length is not None and request.content_length > limit
+
+def limit_request_body(limit: Optional[int]):
+    """
+    Cap how much of this request's body Flask reads (form parsing included);
+    None lifts the app-wide MAX_CONTENT_LENGTH, e.g. for streams. Per-request
+    limits need Flask 3.1; older versions keep the app-wide cap.
+    """
+    try:
+        request.max_content_length = limit
+    except AttributeError:
+        pass
+
+def spool_upload(stream, spool, limit: int, chunk_size: int = 1024 * 1024) -> int:
+    """Copy an upload to a file in chunks; raises UploadTooLarge once more than limit bytes arrive"""
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLarge('Upload is too large')
+        spool.write(chunk)
+
+def read_into_buffer(stream, limit: int, size_hint: int = None) -> memoryview:
+    """
+    Read a stream into this thread's reusable buffer and return a view of the
+    bytes read. Raises UploadTooLarge once more than limit bytes arrive. The view
+    is only valid until the same thread reads the next upload.
+    """
+    buffer = getattr(_upload_buffers, 'buffer', None)
+    wanted = min((size_hint or 256 * 1024) + 1, limit + 1)
+    if buffer is None or len(buffer) < wanted:
+        buffer = bytearray(wanted)
+    
+    readinto = getattr(stream, 'readinto', None)
+    size = 0
+    while True:
+        if size == len(buffer):
+            if size > limit:
+                raise UploadTooLarge('Upload is too large')
+            # Grow into a new buffer; views handed out earlier keep the old one alive
+            grown = bytearray(min(len(buffer) * 2, limit + 1))
+            grown[:size] = buffer[:size]
+            buffer = grown
+        view = memoryview(buffer)[size:]
+        if readinto is not None:
+            count = readinto(view)
+        else:
+            chunk = stream.read(len(view))
+            count = len(chunk)
+            view[:count] = chunk
+        if not count:
+            break
+        size += count
+    
+    _upload_buffers.buffer = buffer
+    if size > limit:
+        raise UploadTooLarge('Upload is too large')
+    return memoryview(buffer)[:size]
+
+def abandon_upload_buffer():
+    """
+    Stop reusing this thread's upload buffer, e.g. when a job still reading a
+    view of it was abandoned after a timeout. The job keeps the old buffer
+    alive; the next upload gets a new one instead of overwriting it.
+    """
+    _upload_buffers.buffer = None
+
+def decode_base64_image(value: str) -> bytes:
+    """Decode a base64 image or data URL without copying the payload to strip the prefix"""
+    encoded = value.encode('ascii')
+    start = encoded.find(b',') + 1 if encoded.startswith(b'data:') else 0
+    try:
+        return binascii.a2b_base64(memoryview(encoded)[start:])
+    except binascii.Error:
+        raise ValueError('Invalid base64 image data')
+
+def check_source_access(access: Dict[str, Any], source: str):
+    """Return an error response if the user may not use this detection source"""
+    if source == 'image' and not access['image_upload_access']:
+        return jsonify({'message': 'You do not have permission to upload images'}), 403
+    elif source == 'video' and not access['video_upload_access']:
+        return jsonify({'message': 'You do not have permission to upload videos'}), 403
+    elif source == 'realtime' and not access['camera_access']:
+        return jsonify({'message': 'You do not have permission to use realtime detection'}), 403
+    return None
+
+def score_image(current_user, image_data, source: str, notes: str):
+    """Run detection on image bytes, save the record and build the response"""
+    try:
+        result = get_inference_pool().detect_stress(image_data)
+    except InferenceTimeout as e:
+        # The job may still be running on a view of the upload buffer
+        if isinstance(image_data, memoryview):
+            abandon_upload_buffer()
+        return inference_busy(e)
+    
+    record_id = save_stress_result(
+        user_id=current_user['id'],
+        level=result['stress_level'],
+        score=result['stress_score'],
+        source=source,
+        notes=notes,
+        model_version=result.get('model_version')
+    )
+    
+    return jsonify({
+        'record_id': record_id,
+        'result': result
+    })
+
+# Batch uploads: many images as repeated multipart 'files' fields or one zip/tar 'archive'
+MAX_BATCH_IMAGES = int(os.environ.get('STRESS_BATCH_MAX_IMAGES', 64))
+MAX_BATCH_UPLOAD_BYTES = int(float(os.environ.get('STRESS_MAX_BATCH_UPLOAD_MB', 256)) * 1024 * 1024)
+BATCH_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
 
-# Initialize stress detector
-detector = StressDetector()
+# No request body is ever read past the largest per-source limit; routes lower it further
+app.config['MAX_CONTENT_LENGTH'] = max(MAX_IMAGE_UPLOAD_BYTES, MAX_VIDEO_UPLOAD_BYTES, MAX_BATCH_UPLOAD_BYTES)
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    return jsonify({'message': 'Upload is too large'}), 413
+
+def read_batch_archive(file) -> List[tuple]:
+    """
+    Spool an uploaded zip or tar archive to disk and return (name, bytes) for
+    each image in it. Member sizes are checked before anything is extracted.
+    """
+    fd, path = tempfile.mkstemp(prefix='stresssense_batch_')
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            spool_upload(file.stream, spool, MAX_BATCH_UPLOAD_BYTES)
+        
+        images = []
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                members = [m for m in archive.infolist()
+                           if not m.is_dir() and m.filename.lower().endswith(BATCH_IMAGE_EXTENSIONS)]
+                check_batch_members([(m.filename, m.file_size) for m in members])
+                for member in members:
+                    images.append((member.filename, archive.read(member)))
+        elif tarfile.is_tarfile(path):
+            with tarfile.open(path) as archive:
+                members = [m for m in archive.getmembers()
+                           if m.isfile() and m.name.lower().endswith(BATCH_IMAGE_EXTENSIONS)]
+                check_batch_members([(m.name, m.size) for m in members])
+                for member in members:
+                    images.append((member.name, archive.extractfile(member).read()))
+        else:
+            raise ValueError('Archive must be a zip or tar file')
+        return images
+    finally:
+        os.remove(path)
+
+def check_batch_members(members: List[tuple]):
+    if not members:
+        raise ValueError('No images found in archive')
+    if len(members) > MAX_BATCH_IMAGES:
+        raise UploadTooLarge(f'At most {MAX_BATCH_IMAGES} images per batch')
+    if any(size > MAX_IMAGE_UPLOAD_BYTES for _, size in members):
+        raise UploadTooLarge('Upload is too large')
+    if sum(size for _, size in members) > MAX_BATCH_UPLOAD_BYTES:
+        raise UploadTooLarge('Upload is too large')
 
 # Authentication middleware
 def token_required(f):
@@ -38,7 +413,7 @@ def token_required(f):
             
         try:
             data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = db.get_user_by_id(data['user_id'])
+            current_user = db.get_user_principal(data['user_id'])
             
             if not current_user:
                 return jsonify({'message': 'Invalid token'}), 401
@@ -64,6 +439,26 @@ def admin_required(f):
     decorated.__name__ = f.__name__
     return decorated
 
+# Health checks
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    return jsonify({'status': 'ok'})
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    # Ready once the model is loaded (or known to be unavailable, i.e. mock mode)
+    if inference_pool is not None and inference_pool.mode == 'process':
+        # Each inference process loads and warms its own model in its initializer
+        status = inference_pool.readiness()
+    elif detector is None:
+        status = {'state': 'not_loaded', 'ready': False}
+    else:
+        status = detector.get_model_status()
+        if STRESS_WARMUP == 'off' and status['state'] == 'not_loaded':
+            # Loading is deferred to the first detection, which needs traffic to happen
+            status['ready'] = True
+    return jsonify(status), 200 if status['ready'] else 503
+
 # Routes
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -138,6 +533,16 @@ def register():
 @app.route('/api/stress/detect', methods=['POST'])
 @token_required
 def detect_stress(current_user):
+    # The per-source limit is applied before Flask parses (and spools) the
+    # multipart body, so the source must be readable without it: the query
+    # string or an X-Stress-Source header. A source sent only as a form field
+    # still works, but gets the image limit.
+    source = request.args.get('source') or request.headers.get('X-Stress-Source')
+    limit = MAX_VIDEO_UPLOAD_BYTES if source == 'video' else MAX_IMAGE_UPLOAD_BYTES
+    if upload_too_large(limit):
+        return jsonify({'message': 'Upload is too large'}), 413
+    limit_request_body(limit)
+    
     # Check if user has permission to use selected source
     access = db.get_user_access(current_user['id'])
     
@@ -145,53 +550,296 @@ def detect_stress(current_user):
         return jsonify({'message': 'Access settings not found'}), 404
         
     # Get the source type from the request
-    if 'source' not in request.form:
-        return jsonify({'message': 'Source type is required'}), 400
-        
-    source = request.form['source']
+    if source is None:
+        if 'source' not in request.form:
+            return jsonify({'message': 'Source type is required'}), 400
+        source = request.form['source']
     
     # Check permissions based on source
-    if source == 'image' and not access['image_upload_access']:
-        return jsonify({'message': 'You do not have permission to upload images'}), 403
-    elif source == 'video' and not access['video_upload_access']:
-        return jsonify({'message': 'You do not have permission to upload videos'}), 403
-    elif source == 'realtime' and not access['camera_access']:
-        return jsonify({'message': 'You do not have permission to use realtime detection'}), 403
+    denied = check_source_access(access, source)
+    if denied:
+        return denied
+    
+    # Videos are spooled to disk and sampled frame by frame
+    if source == 'video':
+        if 'file' not in request.files:
+            return jsonify({'message': 'No video file provided'}), 400
+        try:
+            result = analyze_video_upload(request.files['file'])
+        except UploadTooLarge as e:
+            return jsonify({'message': str(e)}), 413
+        except InferenceTimeout as e:
+            return inference_busy(e)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        record_id = save_stress_result(
+            user_id=current_user['id'],
+            level=result['stress_level'],
+            score=result['stress_score'],
+            source=source,
+            notes=request.form.get('notes', ''),
+            model_version=result.get('model_version')
+        )
+        
+        return jsonify({
+            'record_id': record_id,
+            'result': result
+        })
     
     # Process the file or base64 image
-    image_data = None
-    if 'file' in request.files:
-        file = request.files['file']
-        image_data = file.read()
-    elif 'image_data' in request.form:
-        # Assuming base64 encoded image
-        image_b64 = request.form['image_data']
-        if image_b64.startswith('data:image'):
-            # Remove MIME type prefix if present
-            image_b64 = image_b64.split(',')[1]
-        image_data = base64.b64decode(image_b64)
-    else:
+    try:
+        if 'file' in request.files:
+            file = request.files['file']
+            image_data = read_into_buffer(file.stream, MAX_IMAGE_UPLOAD_BYTES, request.content_length)
+        elif 'image_data' in request.form:
+            image_data = decode_base64_image(request.form['image_data'])
+            if len(image_data) > MAX_IMAGE_UPLOAD_BYTES:
+                raise UploadTooLarge('Upload is too large')
+        else:
+            return jsonify({'message': 'No image data provided'}), 400
+    except UploadTooLarge as e:
+        return jsonify({'message': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return score_image(current_user, image_data, source, request.form.get('notes', ''))
+
+@app.route('/api/stress/detect/raw', methods=['POST'])
+@token_required
+def detect_stress_raw(current_user):
+    """
+    Detect stress from an image sent as the raw request body
+    (Content-Type: application/octet-stream or image/*). The source ('image'
+    or 'realtime') and notes are passed as query parameters.
+    """
+    if upload_too_large(MAX_IMAGE_UPLOAD_BYTES):
+        return jsonify({'message': 'Upload is too large'}), 413
+    limit_request_body(MAX_IMAGE_UPLOAD_BYTES)
+    
+    mimetype = request.mimetype or ''
+    if mimetype != 'application/octet-stream' and not mimetype.startswith('image/'):
+        return jsonify({'message': 'Expected an application/octet-stream or image/* body'}), 415
+    
+    source = request.args.get('source', 'image')
+    if source not in ('image', 'realtime'):
+        return jsonify({'message': 'Source must be image or realtime'}), 400
+    
+    access = db.get_user_access(current_user['id'])
+    if not access:
+        return jsonify({'message': 'Access settings not found'}), 404
+    denied = check_source_access(access, source)
+    if denied:
+        return denied
+    
+    try:
+        image_data = read_into_buffer(request.stream, MAX_IMAGE_UPLOAD_BYTES, request.content_length)
+    except UploadTooLarge as e:
+        return jsonify({'message': str(e)}), 413
+    if not image_data:
         return jsonify({'message': 'No image data provided'}), 400
     
-    # Call the stress detector
-    result = detector.detect_stress(image_data)
+    return score_image(current_user, image_data, source, request.args.get('notes', ''))
+
+@app.route('/api/stress/detect/batch', methods=['POST'])
+@token_required
+def detect_stress_batch(current_user):
+    """
+    Detect stress for many images in one call: one access check, one batched
+    forward pass, one multi-row insert and one notification evaluation.
+    """
+    if upload_too_large(MAX_BATCH_UPLOAD_BYTES):
+        return jsonify({'message': 'Upload is too large'}), 413
+    
+    access = db.get_user_access(current_user['id'])
+    if not access:
+        return jsonify({'message': 'Access settings not found'}), 404
+    denied = check_source_access(access, 'image')
+    if denied:
+        return denied
+    
+    try:
+        if 'archive' in request.files:
+            images = read_batch_archive(request.files['archive'])
+        elif 'files' in request.files:
+            files = request.files.getlist('files')
+            if len(files) > MAX_BATCH_IMAGES:
+                raise UploadTooLarge(f'At most {MAX_BATCH_IMAGES} images per batch')
+            # Each file needs its own bytes here, so the shared upload buffer isn't used
+            images = [(file.filename, file.read()) for file in files]
+            if any(len(data) > MAX_IMAGE_UPLOAD_BYTES for _, data in images):
+                raise UploadTooLarge('Upload is too large')
+        else:
+            return jsonify({'message': 'Provide images as files fields or an archive'}), 400
+    except UploadTooLarge as e:
+        return jsonify({'message': str(e)}), 413
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        results = get_inference_pool().detect_stress_batch([data for _, data in images])
+    except InferenceTimeout as e:
+        return inference_busy(e)
     
-    # Save the result to the database
-    level = result['stress_level']
-    score = result['stress_score']
     notes = request.form.get('notes', '')
+    timestamp = datetime.datetime.now().replace(microsecond=0)
+    records = []
+    items = []
+    for (name, _), result in zip(images, results):
+        if 'error' in result:
+            items.append({'name': name, 'error': result['error']})
+            continue
+        record = {
+            'id': str(uuid.uuid4()),
+            'user_id': current_user['id'],
+            'level': result['stress_level'],
+            'score': result['stress_score'],
+            'source': 'image',
+            'notes': notes,
+            'timestamp': timestamp,
+            'model_version': result.get('model_version')
+        }
+        records.append(record)
+        items.append({'name': name, 'record_id': record['id'], 'result': result})
     
-    record_id = db.save_stress_record(
-        user_id=current_user['id'],
-        level=level,
-        score=score,
-        source=source,
-        notes=notes
+    if records:
+        if not db.save_stress_records(records):
+            return jsonify({'message': 'Could not save stress records'}), 500
+        db.notification_rules.observe_many(current_user['id'], records)
+    
+    return jsonify({
+        'count': len(records),
+        'results': items
+    })
+
+def read_exactly(stream, size: int) -> Optional[bytes]:
+    """Read size bytes from a request stream, or None at a clean end of stream"""
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ValueError('Truncated frame')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+def save_realtime_summary(session) -> Optional[str]:
+    summary = session.pop_summary()
+    if not summary:
+        return None
+    return save_stress_result(
+        user_id=session.user_id,
+        level=summary['stress_level'],
+        score=summary['stress_score'],
+        source='realtime',
+        notes=summary['notes'],
+        model_version=summary['model_version']
     )
+
+@app.route('/api/stress/realtime/session', methods=['POST'])
+@token_required
+def open_realtime_session(current_user):
+    access = db.get_user_access(current_user['id'])
+    
+    if not access:
+        return jsonify({'message': 'Access settings not found'}), 404
+    if not access['camera_access']:
+        return jsonify({'message': 'You do not have permission to use realtime detection'}), 403
+    
+    session = get_realtime_sessions().create(current_user['id'])
+    
+    return jsonify({
+        'session_id': session.session_id,
+        'summary_interval': session.summary_interval
+    }), 201
+
+@app.route('/api/stress/realtime/session/<session_id>/frames', methods=['POST'])
+@token_required
+def stream_realtime_frames(current_user, session_id):
+    # Auth and access checks happen once per stream, not once per frame
+    session = get_realtime_sessions().get(session_id, current_user['id'])
+    if not session:
+        return jsonify({'message': 'Session not found'}), 404
+    if not session.lock.acquire(blocking=False):
+        return jsonify({'message': 'Session is already streaming'}), 409
+    # A stream is open-ended; each frame is capped by REALTIME_MAX_FRAME_BYTES instead
+    limit_request_body(None)
+    
+    try:
+        stream = request.stream
+        
+        def generate():
+            # A DELETE for the session stops the stream before its next frame
+            while not session.cancelled.is_set():
+                try:
+                    header = read_exactly(stream, REALTIME_FRAME_HEADER.size)
+                    if header is None:
+                        break
+                    (size,) = REALTIME_FRAME_HEADER.unpack(header)
+                    if size == 0 or size > REALTIME_MAX_FRAME_BYTES:
+                        raise ValueError('Invalid frame size')
+                    frame = read_exactly(stream, size)
+                    if frame is None:
+                        raise ValueError('Truncated frame')
+                    result = session.process_frame(frame)
+                    if session.summary_due():
+                        result['record_id'] = save_realtime_summary(session)
+                except (ValueError, InferenceTimeout) as e:
+                    yield json.dumps({'error': str(e)}) + '\n'
+                    break
+                except Exception as e:
+                    # End with an error line rather than a truncated body
+                    print(f"Error processing a frame for realtime session {session.session_id}: {e}")
+                    yield json.dumps({'error': 'Could not process frame'}) + '\n'
+                    break
+                
+                yield json.dumps(result) + '\n'
+        
+        def finish_stream():
+            try:
+                # A DELETE that arrived mid-stream left the last summary for the stream to save
+                if session.cancelled.is_set():
+                    save_realtime_summary(session)
+            except Exception as e:
+                print(f"Error saving the last summary of realtime session {session.session_id}: {e}")
+            finally:
+                session.lock.release()
+        
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    except BaseException:
+        session.lock.release()
+        raise
+    # The server closes the response even if the body is never iterated (e.g.
+    # the client disconnected first), so the lock is released either way
+    response.call_on_close(finish_stream)
+    return response
+
+@app.route('/api/stress/realtime/session/<session_id>', methods=['DELETE'])
+@token_required
+def close_realtime_session(current_user, session_id):
+    session = get_realtime_sessions().get(session_id, current_user['id'])
+    if not session:
+        return jsonify({'message': 'Session not found'}), 404
+    
+    # Never waits on an open stream: it stops at its next frame and saves the
+    # last summary itself when it closes
+    get_realtime_sessions().close(session_id)
+    record_id = None
+    streaming = not session.lock.acquire(blocking=False)
+    if not streaming:
+        try:
+            record_id = save_realtime_summary(session)
+        finally:
+            session.lock.release()
     
     return jsonify({
         'record_id': record_id,
-        'result': result
+        'streaming': streaming,
+        'frames_received': session.frames_received,
+        'frames_scored': session.frames_scored
     })
 
 @app.route('/api/stress/history', methods=['GET'])
@@ -204,9 +852,26 @@ def get_stress_history(current_user):
         return jsonify({'message': 'Unauthorized to view other user data'}), 403
     
     limit = request.args.get('limit', 100, type=int)
-    records = db.get_stress_records(user_id, limit)
+    cursor = request.args.get('cursor')
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+    
+    if fields:
+        unknown = [field for field in fields if field not in STRESS_RECORD_FIELDS]
+        if unknown:
+            return jsonify({'message': f"Unknown fields: {', '.join(unknown)}"}), 400
     
-    return jsonify(records)
+    try:
+        page = db.get_stress_page(user_id, limit, cursor, fields)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # The body stays the plain list of records existing clients read; the
+    # cursor for the next page travels in a header
+    response = jsonify(page['records'])
+    if page['next_cursor']:
+        response.headers['X-Next-Cursor'] = page['next_cursor']
+    return response
 
 @app.route('/api/stress/trend', methods=['GET'])
 @token_required
@@ -264,7 +929,29 @@ def update_access(current_user):
         
     return jsonify({'message': 'Access settings updated successfully'})
 
+@app.route('/api/stress/stats', methods=['GET'])
+@token_required
+@admin_required
+def get_inference_stats(current_user):
+    # Inference pool, batching and face detection counters (admin only)
+    stats = get_detector().get_stats() if detector is not None else {'loaded': False}
+    stats['inference_pool'] = get_inference_pool().get_stats()
+    return jsonify(stats)
+
+@app.route('/api/db/stats', methods=['GET'])
+@token_required
+@admin_required
+def get_db_stats(current_user):
+    # Connection pool, cache, write-behind and alert rule counters (admin only)
+    return jsonify({
+        'pool': db.get_pool_stats(),
+        'cache': db.get_cache_stats(),
+        'write_behind': write_behind.get_stats() if write_behind is not None else None,
+        'notification_rules': db.notification_rules.get_stats()
+    })
+
 # Main entry point
 if __name__ == '__main__':
-    db.connect()
-    app.run(debug=True, port=5000)
+    # Development server only; use gunicorn.conf.py for production
+    init_worker()
+    app.run(debug=True, port=5000, use_reloader=False)
@@ -1,4 +1,8 @@
 
-from .db_connector import DatabaseConnector
+from .db_connector import DatabaseConnector, PoolTimeoutError
+from .cache import LookupCache, CacheBackend, LocalCacheBackend, SQLiteCacheBackend, create_cache
 
-__all__ = ['DatabaseConnector']
+__all__ = [
+    'DatabaseConnector', 'PoolTimeoutError',
+    'LookupCache', 'CacheBackend', 'LocalCacheBackend', 'SQLiteCacheBackend', 'create_cache'
+]
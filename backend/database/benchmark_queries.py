@@ -0,0 +1,244 @@
+"""
+Seeded-data benchmark for the stress_records access paths.
+
+Seeds a scratch database, times the DatabaseConnector history, trend and
+notification-count queries, applies the index migration (001) and times them
+again, then prints p50/p99 before and after. Every other migration is applied
+before seeding, so both passes run against the schema the code expects and
+only the indexes differ.
+
+get_stress_trend reads stress_daily_rollup, which the indexes don't touch, so
+the index comparison uses the equivalent raw scan of stress_records instead.
+The rollup is rebuilt after seeding, and its read is timed on its own.
+
+MySQL/MariaDB (uses DatabaseConnector against a scratch database that is
+dropped and recreated, never the application database):
+    python -m database.benchmark_queries --database stresssense_bench
+
+SQLite stand-in (same data shape, same index DDL, equivalent queries):
+    python -m database.benchmark_queries --sqlite /tmp/stress_bench.db
+"""
+import argparse
+import random
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from .migrate import ensure_base_schema, list_migrations, migrate, split_statements
+
+LEVELS = ('low', 'medium', 'high', 'severe')
+
+# The migration being measured
+INDEX_MIGRATION = 1
+SOURCES = ('image', 'video', 'realtime')
+
+NOTIFICATION_COUNT_QUERY = """
+SELECT COUNT(*) as count FROM stress_records
+WHERE user_id = %s AND level IN ('high', 'severe')
+AND timestamp >= DATE_SUB(CURRENT_TIMESTAMP, INTERVAL 24 HOUR)
+"""
+
+# What get_stress_trend computed before the daily rollup existed
+TREND_SCAN_QUERY = """
+SELECT DATE(timestamp) as date, AVG(score) as avg_score, MAX(score) as max_score
+FROM stress_records
+WHERE user_id = %s AND timestamp >= DATE_SUB(CURRENT_DATE(), INTERVAL %s DAY)
+GROUP BY DATE(timestamp)
+ORDER BY date
+"""
+
+SQLITE_SCHEMA = """
+CREATE TABLE users (id TEXT PRIMARY KEY, name TEXT, email TEXT UNIQUE, password_hash TEXT, type TEXT);
+CREATE TABLE stress_records (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, level TEXT NOT NULL, score INTEGER NOT NULL,
+    timestamp TEXT DEFAULT CURRENT_TIMESTAMP, source TEXT NOT NULL, notes TEXT, reviewed INTEGER DEFAULT 0
+);
+CREATE TABLE notifications (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT, message TEXT,
+    is_read INTEGER DEFAULT 0, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE email_notifications (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, stress_level_threshold TEXT,
+    consecutive_readings INTEGER DEFAULT 3, enabled INTEGER DEFAULT 1, last_sent TEXT
+)
+"""
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[int(p / 100.0 * (len(ordered) - 1))] if ordered else 0.0
+
+
+def generate_records(user_ids: List[str], records_per_user: int, days: int):
+    now = datetime.now()
+    rng = random.Random(42)
+    for user_id in user_ids:
+        for _ in range(records_per_user):
+            score = rng.randint(0, 100)
+            yield (
+                str(uuid.uuid4()), user_id, LEVELS[min(3, score // 25)], score,
+                (now - timedelta(seconds=rng.randint(0, days * 86400))).strftime('%Y-%m-%d %H:%M:%S'),
+                rng.choice(SOURCES), 'seeded benchmark record'
+            )
+
+
+def time_queries(queries: Dict[str, Callable[[str], object]], user_ids: List[str],
+                 iterations: int) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(7)
+    results = {}
+    for name, run in queries.items():
+        samples = []
+        for _ in range(iterations):
+            user_id = rng.choice(user_ids)
+            started = time.perf_counter()
+            run(user_id)
+            samples.append((time.perf_counter() - started) * 1000.0)
+        results[name] = {'p50': percentile(samples, 50), 'p99': percentile(samples, 99)}
+    return results
+
+
+def print_report(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]):
+    print(f"\n{'query':<22}{'p50 before':>12}{'p50 after':>12}{'p99 before':>12}{'p99 after':>12}  (ms)")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<22}{b['p50']:>12.3f}{a['p50']:>12.3f}{b['p99']:>12.3f}{a['p99']:>12.3f}")
+
+
+def run_mysql(args) -> None:
+    import mysql.connector
+    from .db_connector import DatabaseConnector
+
+    db = DatabaseConnector(pool_size=2)
+    server_config = {k: v for k, v in db.config.items() if k != 'database'}
+    server = mysql.connector.connect(**server_config)
+    cursor = server.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{args.database}`")
+    cursor.execute(f"CREATE DATABASE `{args.database}`")
+    cursor.close()
+    server.close()
+
+    # The pool shares this dict, so no connection has used the old name yet
+    db.config['database'] = args.database
+
+    # Everything but the index migration, which is what is being measured
+    ensure_base_schema(db)
+    migrate(db, versions=[version for version, _, _ in list_migrations() if version != INDEX_MIGRATION])
+
+    user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+    with db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, name, email, password_hash, type) VALUES (%s, %s, %s, %s, %s)",
+            [(u, 'Bench User', f'{u}@bench.local', 'x', 'it_professional') for u in user_ids]
+        )
+
+    print(f"Seeding {args.users * args.records:,} stress records...")
+    batch = []
+    for row in generate_records(user_ids, args.records, args.days):
+        batch.append(row)
+        if len(batch) == 5000:
+            with db.transaction() as cursor:
+                cursor.executemany(
+                    "INSERT INTO stress_records (id, user_id, level, score, timestamp, source, notes) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s)", batch
+                )
+            batch = []
+    if batch:
+        with db.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO stress_records (id, user_id, level, score, timestamp, source, notes) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)", batch
+            )
+    # Seeding bypasses save_stress_records, so fill the rollup in one pass
+    if not db.rebuild_daily_rollup():
+        raise SystemExit("Could not build stress_daily_rollup")
+    with db.transaction() as cursor:
+        cursor.execute("ANALYZE TABLE stress_records")
+        cursor.fetchall()
+
+    queries = {
+        'get_stress_records': lambda u: db.get_stress_records(u, 100),
+        'trend_raw_scan': lambda u: db.execute_query(TREND_SCAN_QUERY, (u, 30)),
+        'notification_count': lambda u: db.execute_query(NOTIFICATION_COUNT_QUERY, (u,))
+    }
+
+    rollup = time_queries({'get_stress_trend': lambda u: db.get_stress_trend(u, 30)}, user_ids, args.iterations)
+    before = time_queries(queries, user_ids, args.iterations)
+    migrate(db, versions=[INDEX_MIGRATION])
+    with db.transaction() as cursor:
+        cursor.execute("ANALYZE TABLE stress_records")
+        cursor.fetchall()
+    after = time_queries(queries, user_ids, args.iterations)
+
+    print_report(before, after)
+    trend = rollup['get_stress_trend']
+    print(f"\nget_stress_trend (daily rollup): p50 {trend['p50']:.3f} ms, p99 {trend['p99']:.3f} ms")
+    db.disconnect()
+
+
+def run_sqlite(args) -> None:
+    connection = sqlite3.connect(args.sqlite)
+    for table in ('stress_records', 'notifications', 'email_notifications', 'users'):
+        connection.execute(f"DROP TABLE IF EXISTS {table}")
+    for statement in split_statements(SQLITE_SCHEMA):
+        connection.execute(statement)
+
+    user_ids = [str(uuid.uuid4()) for _ in range(args.users)]
+    print(f"Seeding {args.users * args.records:,} stress records...")
+    connection.executemany(
+        "INSERT INTO stress_records (id, user_id, level, score, timestamp, source, notes) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        generate_records(user_ids, args.records, args.days)
+    )
+    connection.commit()
+
+    # SQLite equivalents of the DatabaseConnector queries
+    queries = {
+        'get_stress_records': lambda u: connection.execute(
+            "SELECT * FROM stress_records WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?",
+            (u, 100)).fetchall(),
+        'trend_raw_scan': lambda u: connection.execute(
+            "SELECT DATE(timestamp) as date, AVG(score) as avg_score, MAX(score) as max_score "
+            "FROM stress_records WHERE user_id = ? AND timestamp >= DATE('now', ?) "
+            "GROUP BY DATE(timestamp) ORDER BY date", (u, '-30 day')).fetchall(),
+        'notification_count': lambda u: connection.execute(
+            "SELECT COUNT(*) as count FROM stress_records WHERE user_id = ? "
+            "AND level IN ('high', 'severe') AND timestamp >= DATETIME('now', '-24 hours')",
+            (u,)).fetchall()
+    }
+
+    before = time_queries(queries, user_ids, args.iterations)
+    for version, name, path in list_migrations():
+        if version != INDEX_MIGRATION:
+            continue
+        with open(path) as f:
+            for statement in split_statements(f.read()):
+                if statement.upper().startswith('CREATE INDEX'):
+                    connection.execute(statement)
+    connection.execute("ANALYZE")
+    connection.commit()
+    after = time_queries(queries, user_ids, args.iterations)
+
+    print_report(before, after)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stress_records queries before/after migrations")
+    parser.add_argument('--database', default='stresssense_bench', help="Scratch MySQL database (recreated)")
+    parser.add_argument('--sqlite', help="Use SQLite at this path instead of MySQL")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--records', type=int, default=5000, help="Records per user")
+    parser.add_argument('--days', type=int, default=180, help="Spread records over this many days")
+    parser.add_argument('--iterations', type=int, default=200, help="Timed calls per query")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        run_sqlite(args)
+    else:
+        run_mysql(args)
+
+
+if __name__ == '__main__':
+    main()
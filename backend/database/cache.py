@@ -0,0 +1,217 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Returned by backends on a miss so that falsy cached values still count as hits
+MISSING = object()
+
+
+class CacheBackend:
+    """Storage interface for LookupCache; implementations must be thread-safe"""
+
+    def get(self, key: str) -> Any:
+        """Return the cached value or MISSING"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process LRU with per-entry expiry, bounded by max_entries"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'local',
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'expirations': self._expirations
+            }
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker process on one host, stored in a SQLite file.
+
+    A local stand-in for a networked cache: an invalidation in one worker is
+    seen by all of them. Entries are evicted least-recently-used once the
+    table grows past max_entries.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 10000):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'stresssense_cache.sqlite')
+        self.max_entries = max(1, max_entries)
+        self._local = threading.local()
+        self._evictions = 0
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_cache_used_at ON cache (used_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Any:
+        connection = self._connection()
+        row = connection.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISSING
+        now = time.time()
+        if row[1] < now:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return MISSING
+        connection.execute("UPDATE cache SET used_at = ? WHERE key = ?", (now, key))
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + ttl, now)
+        )
+        excess = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at LIMIT ?)", (excess,)
+            )
+            self._evictions += excess
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        size = self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'size': size,
+            'max_entries': self.max_entries,
+            'evictions': self._evictions
+        }
+
+
+class LookupCache:
+    """
+    Read-through cache for database lookups with hit/miss counters.
+
+    Keys are namespaced (e.g. 'user', 'access') so related entries can be
+    invalidated together. Missing rows (None) are not cached.
+    """
+
+    def __init__(self, backend: CacheBackend = None, ttl: float = 60.0):
+        self.backend = backend or LocalCacheBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], Any]) -> Any:
+        cache_key = f"{namespace}:{key}"
+        value = self.backend.get(cache_key)
+        if value is not MISSING:
+            with self._lock:
+                self._hits[namespace] = self._hits.get(namespace, 0) + 1
+            return value
+
+        with self._lock:
+            self._misses[namespace] = self._misses.get(namespace, 0) + 1
+        value = loader()
+        if value is not None:
+            self.backend.set(cache_key, value, self.ttl)
+        return value
+
+    def invalidate(self, namespace: str, key: str):
+        self.backend.delete(f"{namespace}:{key}")
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = sorted(set(self._hits) | set(self._misses))
+            per_namespace = {}
+            for namespace in namespaces:
+                hits, misses = self._hits.get(namespace, 0), self._misses.get(namespace, 0)
+                per_namespace[namespace] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+                }
+        stats = self.backend.get_stats()
+        stats['ttl'] = self.ttl
+        stats['namespaces'] = per_namespace
+        return stats
+
+
+def create_cache(backend: str = 'local', ttl: float = 60.0, max_entries: int = 10000,
+                 path: Optional[str] = None) -> LookupCache:
+    """Build a LookupCache for the named backend ('local' or 'sqlite')"""
+    if backend == 'sqlite':
+        return LookupCache(SQLiteCacheBackend(path, max_entries=max_entries), ttl=ttl)
+    if backend == 'local':
+        return LookupCache(LocalCacheBackend(max_entries=max_entries), ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -1,12 +1,193 @@
-
+import base64
+import json
 import mysql.connector
 import os
+import queue
+import threading
+import time
 import uuid
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+from .cache import LookupCache
+from .notification_rules import NotificationRuleEngine
+
+# Columns callers may request from stress_records via field projection
+STRESS_RECORD_FIELDS = ('id', 'user_id', 'level', 'score', 'timestamp', 'source', 'notes', 'reviewed', 'model_version')
+
+# Hard upper bound on a single history page regardless of what the client asks for
+MAX_STRESS_PAGE_SIZE = 200
+
+def encode_cursor(timestamp: datetime, record_id: str) -> str:
+    """Build an opaque keyset cursor from the last row of a page"""
+    payload = json.dumps([timestamp.isoformat(), record_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Parse a cursor from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), str(record_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as err:
+        raise ValueError('Invalid cursor') from err
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+    pass
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    Connections are opened lazily up to pool_size. Checkout blocks until one is
+    returned or the timeout expires. A connection that has been idle longer than
+    health_check_interval is pinged before use and replaced if it went stale.
+    """
+    
+    def __init__(self, config: Dict[str, Any], pool_size: int = 10, checkout_timeout: float = 5.0,
+                 health_check_interval: float = 30.0):
+        self.config = config
+        self.pool_size = max(1, pool_size)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        
+        # Holds (connection, last_used) for idle connections
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        
+        # Gauges and counters for sizing the pool
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+    
+    def _open(self):
+        return mysql.connector.connect(**self.config)
+    
+    def _is_healthy(self, connection, last_used: float) -> bool:
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+    
+    def acquire(self):
+        started = time.monotonic()
+        connection = None
+        
+        try:
+            connection, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._created < self.pool_size
+                if can_open:
+                    self._created += 1
+            if can_open:
+                try:
+                    connection, last_used = self._open(), time.monotonic()
+                except mysql.connector.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                with self._lock:
+                    self._waits += 1
+                try:
+                    connection, last_used = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.checkout_timeout}s"
+                    )
+        
+        if not self._is_healthy(connection, last_used):
+            try:
+                connection.close()
+            except mysql.connector.Error:
+                pass
+            try:
+                connection = self._open()
+            except mysql.connector.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._reconnects += 1
+        
+        wait_ms = (time.monotonic() - started) * 1000.0
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._total_wait_ms += wait_ms
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+        
+        return connection
+    
+    def release(self, connection, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+            closed = self._closed
+        
+        if broken or closed:
+            try:
+                connection.close()
+            except mysql.connector.Error:
+                pass
+            with self._lock:
+                self._created -= 1
+            return
+        
+        self._idle.put((connection, time.monotonic()))
+    
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                connection.close()
+            except mysql.connector.Error:
+                pass
+            with self._lock:
+                self._created -= 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'avg_wait_ms': (self._total_wait_ms / self._checkouts) if self._checkouts else 0.0,
+                'max_wait_ms': self._max_wait_ms
+            }
 
 class DatabaseConnector:
-    def __init__(self):
+    # Columns needed to authorize a request; never includes password_hash
+    PRINCIPAL_FIELDS = ('id', 'name', 'email', 'type', 'department', 'position', 'avatar_url')
+    
+    def __init__(self, pool_size: int = 10, checkout_timeout: float = 5.0, health_check_interval: float = 30.0,
+                 cache: LookupCache = None, notification_cooldown_minutes: float = 60.0):
         # In a real application, these would be environment variables
         self.config = {
             'host': 'localhost',
@@ -14,39 +195,83 @@ class DatabaseConnector:
             'password': 'your_password_here',
             'database': 'stresssense_db'
         }
-        self.connection = None
-        self.cursor = None
+        # Connections are checked out per query/transaction, so a single
+        # connector can be shared by every request thread
+        self.pool = ConnectionPool(
+            self.config,
+            pool_size=pool_size,
+            checkout_timeout=checkout_timeout,
+            health_check_interval=health_check_interval
+        )
+        # Principals and access settings are read on every request, so they are
+        # served from a TTL/LRU cache and invalidated when they change
+        self.cache = cache or LookupCache()
+        
+        # Alert rules are evaluated incrementally from in-memory per-user state
+        self.notification_rules = NotificationRuleEngine.for_database(
+            self, cooldown=timedelta(minutes=notification_cooldown_minutes)
+        )
     
     def connect(self):
+        # Open one connection up front to surface configuration errors early
         try:
-            self.connection = mysql.connector.connect(**self.config)
-            self.cursor = self.connection.cursor(dictionary=True)
+            with self.connection():
+                pass
             print("Database connection successful")
             return True
-        except mysql.connector.Error as err:
+        except (mysql.connector.Error, PoolTimeoutError) as err:
             print(f"Error connecting to database: {err}")
             return False
     
     def disconnect(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
-            print("Database connection closed")
+        self.pool.close()
+        print("Database connection closed")
+    
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the duration of the block"""
+        connection = self.pool.acquire()
+        broken = False
+        try:
+            yield connection
+        except mysql.connector.errors.OperationalError:
+            broken = True
+            raise
+        finally:
+            self.pool.release(connection, broken=broken)
+    
+    @contextmanager
+    def transaction(self):
+        """Yield a dictionary cursor; commit on success, roll back on error"""
+        with self.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
     
     def execute_query(self, query, params=None):
         try:
-            self.cursor.execute(query, params or ())
-            if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
-                self.connection.commit()
-                return self.cursor.lastrowid
-            else:
-                return self.cursor.fetchall()
-        except mysql.connector.Error as err:
+            with self.transaction() as cursor:
+                cursor.execute(query, params or ())
+                if query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
+                    return cursor.lastrowid
+                else:
+                    return cursor.fetchall()
+        except (mysql.connector.Error, PoolTimeoutError) as err:
             print(f"Error executing query: {err}")
-            self.connection.rollback()
             return None
     
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return self.pool.get_stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self.cache.get_stats()
+    
     # User methods
     def get_user_by_email(self, email: str):
         query = "SELECT * FROM users WHERE email = %s"
@@ -57,6 +282,20 @@ class DatabaseConnector:
         result = self.execute_query(query, (user_id,))
         return result[0] if result else None
     
+    def get_user_principal(self, user_id: str):
+        """Cached user lookup for authentication, without the password hash"""
+        def load():
+            query = f"SELECT {', '.join(self.PRINCIPAL_FIELDS)} FROM users WHERE id = %s"
+            result = self.execute_query(query, (user_id,))
+            return result[0] if result else None
+        
+        return self.cache.get_or_load('user', user_id, load)
+    
+    def invalidate_user(self, user_id: str):
+        """Drop cached principal and access settings after a user changes"""
+        self.cache.invalidate('user', user_id)
+        self.cache.invalidate('access', user_id)
+    
     def create_user(self, name: str, email: str, password_hash: str, user_type: str, 
                     department: str = None, position: str = None, avatar_url: str = None) -> str:
         user_id = str(uuid.uuid4())
@@ -79,49 +318,197 @@ class DatabaseConnector:
         admin_id = user_id if user_type == 'admin' else user_id
         access_params = (access_id, user_id, False, True, False, False, admin_id)
         self.execute_query(access_query, access_params)
+        self.invalidate_user(user_id)
         
         return user_id
     
     # Stress record methods
-    def save_stress_record(self, user_id: str, level: str, score: int, source: str, notes: str = None) -> str:
+    
+    # Folds just-inserted records into their (user_id, date) rollup rows
+    ROLLUP_UPSERT = """
+    INSERT INTO stress_daily_rollup
+        (user_id, date, record_count, score_sum, score_max, score_min,
+         low_count, medium_count, high_count, severe_count)
+    SELECT
+        user_id, DATE(timestamp), COUNT(*), SUM(score), MAX(score), MIN(score),
+        SUM(level = 'low'), SUM(level = 'medium'), SUM(level = 'high'), SUM(level = 'severe')
+    FROM stress_records WHERE id IN ({placeholders})
+    GROUP BY user_id, DATE(timestamp)
+    ON DUPLICATE KEY UPDATE
+        record_count = record_count + VALUES(record_count),
+        score_sum = score_sum + VALUES(score_sum),
+        score_max = GREATEST(score_max, VALUES(score_max)),
+        score_min = LEAST(score_min, VALUES(score_min)),
+        low_count = low_count + VALUES(low_count),
+        medium_count = medium_count + VALUES(medium_count),
+        high_count = high_count + VALUES(high_count),
+        severe_count = severe_count + VALUES(severe_count)
+    """
+    
+    def save_stress_record(self, user_id: str, level: str, score: int, source: str, notes: str = None,
+                           model_version: str = None) -> str:
         record_id = str(uuid.uuid4())
-        query = """
-        INSERT INTO stress_records (id, user_id, level, score, source, notes)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        params = (record_id, user_id, level, score, source, notes)
-        self.execute_query(query, params)
+        timestamp = datetime.now().replace(microsecond=0)
+        saved = self.save_stress_records([{
+            'id': record_id,
+            'user_id': user_id,
+            'level': level,
+            'score': score,
+            'source': source,
+            'notes': notes,
+            'timestamp': timestamp,
+            'model_version': model_version
+        }])
+        if not saved:
+            return None
         
-        # Check if we need to send a notification based on stress level
-        if level in ['high', 'severe']:
-            self.check_and_create_notification(user_id, level, score)
+        # Every reading feeds the rule engine; low readings break a high-stress run
+        self.notification_rules.observe(user_id, level, score, timestamp, record_id)
             
         return record_id
     
-    def get_stress_records(self, user_id: str, limit: int = 100):
-        query = """
-        SELECT * FROM stress_records 
-        WHERE user_id = %s 
-        ORDER BY timestamp DESC 
+    def save_stress_records(self, records: List[Dict[str, Any]]) -> bool:
+        """
+        Insert many records with one multi-row INSERT and update their rollups.
+        
+        Each record needs id, user_id, level, score and source; notes,
+        model_version and timestamp are optional (timestamp defaults to now).
+        Notification rules are not evaluated here.
+        """
+        if not records:
+            return True
+        
+        now = datetime.now()
+        rows = []
+        for record in records:
+            rows.extend([
+                record['id'], record['user_id'], record['level'], record['score'],
+                record.get('timestamp') or now, record['source'], record.get('notes'),
+                record.get('model_version')
+            ])
+        record_ids = [record['id'] for record in records]
+        
+        query = f"""
+        INSERT INTO stress_records (id, user_id, level, score, timestamp, source, notes, model_version)
+        VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(records))}
+        """
+        
+        # The records and their daily rollup updates commit together
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(query, tuple(rows))
+                cursor.execute(
+                    self.ROLLUP_UPSERT.format(placeholders=', '.join(['%s'] * len(record_ids))),
+                    tuple(record_ids)
+                )
+            return True
+        except (mysql.connector.Error, PoolTimeoutError) as err:
+            print(f"Error saving stress records: {err}")
+            return False
+    
+    def existing_stress_record_ids(self, record_ids: List[str]) -> List[str]:
+        """Return which of the given ids are already stored"""
+        if not record_ids:
+            return []
+        query = f"SELECT id FROM stress_records WHERE id IN ({', '.join(['%s'] * len(record_ids))})"
+        result = self.execute_query(query, tuple(record_ids))
+        return [row['id'] for row in result or []]
+    
+    def get_stress_records(self, user_id: str, limit: int = 100, after: Tuple[datetime, str] = None,
+                           fields: List[str] = None):
+        """
+        Return one page of a user's records, newest first.
+        
+        Pages are keyset-paginated on (timestamp, id): pass the last row's values
+        as after to continue, so every page is an index range scan of the same
+        cost. fields limits the selected columns; id and timestamp are always
+        included because the next cursor is built from them.
+        """
+        limit = max(1, min(int(limit), MAX_STRESS_PAGE_SIZE))
+        return self._query_stress_records(user_id, limit, after, fields)
+    
+    def _query_stress_records(self, user_id: str, limit: int, after: Optional[Tuple[datetime, str]],
+                              fields: Optional[List[str]]):
+        columns = [field for field in STRESS_RECORD_FIELDS if not fields or field in fields]
+        for required in ('id', 'timestamp'):
+            if required not in columns:
+                columns.append(required)
+        
+        conditions = ["user_id = %s"]
+        params = [user_id]
+        if after:
+            conditions.append("(timestamp < %s OR (timestamp = %s AND id < %s))")
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit)
+        
+        query = f"""
+        SELECT {', '.join(columns)} FROM stress_records 
+        WHERE {' AND '.join(conditions)} 
+        ORDER BY timestamp DESC, id DESC 
         LIMIT %s
         """
-        return self.execute_query(query, (user_id, limit))
+        return self.execute_query(query, tuple(params))
+    
+    def get_stress_page(self, user_id: str, limit: int = 100, cursor: str = None,
+                        fields: List[str] = None) -> Dict[str, Any]:
+        """Return {'records', 'next_cursor'} for a page of history"""
+        limit = max(1, min(int(limit), MAX_STRESS_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+        
+        # Fetch one extra row to learn whether another page exists
+        records = self._query_stress_records(user_id, limit + 1, after, fields) or []
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            last = records[-1]
+            next_cursor = encode_cursor(last['timestamp'], last['id'])
+        
+        return {'records': records, 'next_cursor': next_cursor}
     
     def get_stress_trend(self, user_id: str, days: int = 7):
+        # Reads one pre-aggregated row per day instead of every record in the window
         query = """
         SELECT 
-            DATE(timestamp) as date,
-            AVG(score) as avg_score,
-            MAX(score) as max_score
-        FROM stress_records
-        WHERE user_id = %s AND timestamp >= DATE_SUB(CURRENT_DATE(), INTERVAL %s DAY)
-        GROUP BY DATE(timestamp)
+            date,
+            score_sum / record_count as avg_score,
+            score_max as max_score
+        FROM stress_daily_rollup
+        WHERE user_id = %s AND date >= %s
         ORDER BY date
         """
-        return self.execute_query(query, (user_id, days))
+        # Records are stamped with the app's clock, so the window starts by it too
+        # rather than by the database's CURRENT_DATE, which may be in another zone
+        start = datetime.now().date() - timedelta(days=days)
+        return self.execute_query(query, (user_id, start))
+    
+    def rebuild_daily_rollup(self, user_id: str = None) -> bool:
+        """Recompute stress_daily_rollup from stress_records for one user or everyone"""
+        where = "WHERE user_id = %s" if user_id else ""
+        params = (user_id,) if user_id else ()
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(f"DELETE FROM stress_daily_rollup {where}", params)
+                cursor.execute(f"""
+                INSERT INTO stress_daily_rollup
+                    (user_id, date, record_count, score_sum, score_max, score_min,
+                     low_count, medium_count, high_count, severe_count)
+                SELECT
+                    user_id, DATE(timestamp), COUNT(*), SUM(score), MAX(score), MIN(score),
+                    SUM(level = 'low'), SUM(level = 'medium'), SUM(level = 'high'), SUM(level = 'severe')
+                FROM stress_records
+                {where}
+                GROUP BY user_id, DATE(timestamp)
+                """, params)
+            return True
+        except (mysql.connector.Error, PoolTimeoutError) as err:
+            print(f"Error rebuilding daily rollup: {err}")
+            return False
     
     # Access settings methods
     def get_user_access(self, user_id: str):
+        return self.cache.get_or_load('access', user_id, lambda: self._load_user_access(user_id))
+    
+    def _load_user_access(self, user_id: str):
         query = "SELECT * FROM user_access_settings WHERE user_id = %s"
         result = self.execute_query(query, (user_id,))
         return result[0] if result else None
@@ -129,7 +516,7 @@ class DatabaseConnector:
     def update_user_access(self, user_id: str, admin_id: str, camera_access: bool = None, 
                            image_upload_access: bool = None, video_upload_access: bool = None, 
                            realtime_monitoring: bool = None):
-        current_settings = self.get_user_access(user_id)
+        current_settings = self._load_user_access(user_id)
         if not current_settings:
             return False
             
@@ -168,53 +555,47 @@ class DatabaseConnector:
         """
         
         self.execute_query(query, tuple(params))
+        self.cache.invalidate('access', user_id)
         return True
     
     # Notification methods
-    def check_and_create_notification(self, user_id: str, stress_level: str, score: int):
-        # Check if we should send an email based on settings
-        query = """
-        SELECT * FROM email_notifications
-        WHERE user_id = %s AND enabled = TRUE
-        AND (stress_level_threshold = 'high' OR 
-            (stress_level_threshold = 'severe' AND %s = 'severe'))
+    def get_notification_setting(self, user_id: str):
+        query = "SELECT * FROM email_notifications WHERE user_id = %s AND enabled = TRUE"
+        result = self.execute_query(query, (user_id,))
+        return result[0] if result else None
+    
+    def get_recent_readings(self, user_id: str, limit: int, exclude_ids: Sequence[str] = ()) -> List[Tuple[str, datetime]]:
+        """Return the user's latest (level, timestamp) readings, oldest first"""
+        exclude_ids = list(exclude_ids) or ['']
+        query = f"""
+        SELECT level, timestamp FROM stress_records
+        WHERE user_id = %s AND id NOT IN ({', '.join(['%s'] * len(exclude_ids))})
+        ORDER BY timestamp DESC, id DESC
+        LIMIT %s
         """
-        settings = self.execute_query(query, (user_id, stress_level))
-        
-        if not settings:
-            return False
-            
-        # Check for consecutive high readings
-        setting = settings[0]
-        threshold = setting['consecutive_readings']
+        result = self.execute_query(query, (user_id, *exclude_ids, limit)) or []
+        return [(row['level'], row['timestamp']) for row in reversed(result)]
+    
+    def create_notification(self, user_id: str, setting: Dict[str, Any], stress_level: str, score: int):
+        notification_id = str(uuid.uuid4())
+        title = "High Stress Alert"
+        message = f"Your stress level has been detected as {stress_level.upper()} ({score}/100). Please consider taking a break or talking to someone."
         
-        query = """
-        SELECT COUNT(*) as count FROM stress_records
-        WHERE user_id = %s AND level IN ('high', 'severe')
-        AND timestamp >= DATE_SUB(CURRENT_TIMESTAMP, INTERVAL 24 HOUR)
-        """
-        result = self.execute_query(query, (user_id,))
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO notifications (id, user_id, title, message) VALUES (%s, %s, %s, %s)",
+                    (notification_id, user_id, title, message)
+                )
+                # Update last sent timestamp
+                cursor.execute(
+                    "UPDATE email_notifications SET last_sent = CURRENT_TIMESTAMP WHERE id = %s",
+                    (setting['id'],)
+                )
+        except (mysql.connector.Error, PoolTimeoutError) as err:
+            print(f"Error creating notification: {err}")
+            return None
         
-        if result and result[0]['count'] >= threshold:
-            # Create notification
-            notification_id = str(uuid.uuid4())
-            notif_query = """
-            INSERT INTO notifications (id, user_id, title, message)
-            VALUES (%s, %s, %s, %s)
-            """
-            title = "High Stress Alert"
-            message = f"Your stress level has been detected as {stress_level.upper()} ({score}/100). Please consider taking a break or talking to someone."
-            
-            self.execute_query(notif_query, (notification_id, user_id, title, message))
-            
-            # Update last sent timestamp
-            self.execute_query(
-                "UPDATE email_notifications SET last_sent = CURRENT_TIMESTAMP WHERE id = %s",
-                (setting['id'],)
-            )
-            
-            # Here you would actually send an email
-            # This requires an email sending library like smtplib
-            return True
-            
-        return False
+        # Here you would actually send an email
+        # This requires an email sending library like smtplib
+        return notification_id
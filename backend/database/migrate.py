@@ -0,0 +1,128 @@
+"""
+Apply versioned schema migrations.
+
+schema.sql is the base schema. Changes after it live in database/migrations as
+NNN_description.sql files and are applied in version order. Applied versions
+are recorded in the schema_migrations table, so running this again only applies
+new files.
+
+Usage:
+    python -m database.migrate            # apply pending migrations
+    python -m database.migrate --status   # list applied and pending versions
+"""
+import argparse
+import os
+import re
+from typing import Collection, List, Tuple
+
+from .db_connector import DatabaseConnector
+
+DATABASE_DIR = os.path.dirname(__file__)
+SCHEMA_PATH = os.path.join(DATABASE_DIR, 'schema.sql')
+MIGRATIONS_DIR = os.path.join(DATABASE_DIR, 'migrations')
+
+_MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a SQL script into statements, dropping '--' comment lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def list_migrations(migrations_dir: str = MIGRATIONS_DIR) -> List[Tuple[int, str, str]]:
+    """Return (version, name, path) for every migration file, sorted by version"""
+    migrations = []
+    for filename in os.listdir(migrations_dir):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(migrations_dir, filename)))
+    return sorted(migrations)
+
+
+def ensure_migrations_table(db: DatabaseConnector):
+    with db.transaction() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+
+
+def applied_versions(db: DatabaseConnector) -> List[int]:
+    with db.transaction() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+        return [row['version'] for row in cursor.fetchall()]
+
+
+def ensure_base_schema(db: DatabaseConnector):
+    """Load schema.sql into an empty database"""
+    with db.transaction() as cursor:
+        cursor.execute("SHOW TABLES LIKE 'users'")
+        if cursor.fetchall():
+            return
+        print("Empty database, loading schema.sql")
+        with open(SCHEMA_PATH) as f:
+            for statement in split_statements(f.read()):
+                cursor.execute(statement)
+
+
+def migrate(db: DatabaseConnector, migrations_dir: str = MIGRATIONS_DIR,
+            versions: Collection[int] = None) -> List[int]:
+    """Apply pending migrations (or just the given versions) in order and return the versions applied"""
+    ensure_base_schema(db)
+    ensure_migrations_table(db)
+    done = set(applied_versions(db))
+
+    applied = []
+    for version, name, path in list_migrations(migrations_dir):
+        if version in done or (versions is not None and version not in versions):
+            continue
+        print(f"Applying migration {version:03d}_{name}")
+        with open(path) as f:
+            statements = split_statements(f.read())
+        # MySQL commits DDL implicitly, so the version row is written last;
+        # a failed migration is retried from the start on the next run
+        with db.transaction() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+        applied.append(version)
+
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply StressSense schema migrations")
+    parser.add_argument('--status', action='store_true', help="Show applied and pending migrations")
+    args = parser.parse_args()
+
+    db = DatabaseConnector(pool_size=1)
+    if not db.connect():
+        raise SystemExit(1)
+
+    try:
+        if args.status:
+            ensure_migrations_table(db)
+            done = set(applied_versions(db))
+            for version, name, _ in list_migrations():
+                state = 'applied' if version in done else 'pending'
+                print(f"{version:03d}_{name}: {state}")
+            return
+
+        applied = migrate(db)
+        if applied:
+            print(f"Applied {len(applied)} migration(s)")
+        else:
+            print("Database is up to date")
+    finally:
+        db.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+-- Access-path indexes for stress_records and notification lookups
+
+-- One index serves every per-user stress_records query:
+-- History and recent readings: WHERE user_id = ? ORDER BY timestamp DESC, id DESC
+-- is a backward index scan with no filesort, and (timestamp, id) keyset
+-- pagination stays in index order.
+-- Trend and notification checks: range-scan user_id + timestamp and read only
+-- level/score, which the trailing columns cover without touching the rows.
+CREATE INDEX idx_stress_records_user_time_level_score ON stress_records (user_id, timestamp, id, level, score);
+
+-- Notification settings lookup per user
+CREATE INDEX idx_email_notifications_user_enabled ON email_notifications (user_id, enabled);
+
+-- Unread notifications per user, newest first
+CREATE INDEX idx_notifications_user_created ON notifications (user_id, created_at);
@@ -0,0 +1,26 @@
+-- Per-user daily aggregates of stress_records, maintained by save_stress_record
+
+CREATE TABLE stress_daily_rollup (
+    user_id VARCHAR(36) NOT NULL,
+    date DATE NOT NULL,
+    record_count INT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    score_max INT NOT NULL,
+    score_min INT NOT NULL,
+    low_count INT NOT NULL DEFAULT 0,
+    medium_count INT NOT NULL DEFAULT 0,
+    high_count INT NOT NULL DEFAULT 0,
+    severe_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Backfill from existing records
+INSERT INTO stress_daily_rollup
+    (user_id, date, record_count, score_sum, score_max, score_min,
+     low_count, medium_count, high_count, severe_count)
+SELECT
+    user_id, DATE(timestamp), COUNT(*), SUM(score), MAX(score), MIN(score),
+    SUM(level = 'low'), SUM(level = 'medium'), SUM(level = 'high'), SUM(level = 'severe')
+FROM stress_records
+GROUP BY user_id, DATE(timestamp);
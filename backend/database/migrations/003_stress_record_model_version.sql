@@ -0,0 +1,4 @@
+-- Which model version produced each reading (NULL for records from before the
+-- model registry, and for mock results)
+
+ALTER TABLE stress_records ADD COLUMN model_version VARCHAR(64) NULL;
@@ -0,0 +1,217 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Reading levels that count towards each email_notifications threshold
+THRESHOLD_LEVELS = {
+    'high': ('high', 'severe'),
+    'severe': ('severe',),
+}
+
+
+class UserRuleState:
+    """Streaming alert state for one user"""
+    __slots__ = ('setting', 'run_length', 'last_reading_at', 'last_sent', 'loaded_at')
+
+    def __init__(self, setting: Optional[Dict[str, Any]], loaded_at: float):
+        self.setting = setting
+        self.run_length = 0
+        self.last_reading_at = None
+        self.last_sent = setting.get('last_sent') if setting else None
+        self.loaded_at = loaded_at
+
+
+class NotificationRuleEngine:
+    """
+    Evaluates email_notifications rules one reading at a time.
+
+    For each user it keeps the length of the current run of consecutive
+    readings at or above their threshold. A reading below the threshold, or a
+    gap longer than window between readings, resets the run. When the run
+    reaches consecutive_readings and the last alert is older than cooldown, an
+    alert is raised. Every reading is O(1).
+
+    State is hydrated per user from the database the first time they are seen
+    (and again after hydrate_ttl seconds of inactivity, so several worker
+    processes do not drift apart for long). Hydration queries run without the
+    engine lock, so a cold user never stalls readings for everyone else.
+
+    alert_sink returns the new notification's id, or None if it could not be
+    created; a failed alert does not start the cooldown.
+    """
+
+    def __init__(self, settings_loader: Callable[[str], Optional[Dict[str, Any]]],
+                 history_loader: Callable[[str, int, Sequence[str]], List[Tuple[str, datetime]]],
+                 alert_sink: Callable[[str, Dict[str, Any], str, int], Optional[str]],
+                 window: timedelta = timedelta(hours=24), cooldown: timedelta = timedelta(hours=1),
+                 hydrate_ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.settings_loader = settings_loader
+        self.history_loader = history_loader
+        self.alert_sink = alert_sink
+        self.window = window
+        self.cooldown = cooldown
+        self.hydrate_ttl = hydrate_ttl
+        self.clock = clock
+
+        self._states: Dict[str, UserRuleState] = {}
+        self._lock = threading.Lock()
+        self._observed = 0
+        self._alerts = 0
+        self._suppressed = 0
+
+    @classmethod
+    def for_database(cls, db, **kwargs) -> 'NotificationRuleEngine':
+        """Wire the engine to a DatabaseConnector's notification methods"""
+        return cls(
+            settings_loader=db.get_notification_setting,
+            history_loader=db.get_recent_readings,
+            alert_sink=db.create_notification,
+            **kwargs
+        )
+
+    def _matches(self, setting: Dict[str, Any], level: str) -> bool:
+        return level in THRESHOLD_LEVELS.get(setting['stress_level_threshold'], ())
+
+    def _advance(self, state: UserRuleState, level: str, timestamp: datetime):
+        if state.last_reading_at is not None and timestamp - state.last_reading_at > self.window:
+            state.run_length = 0
+        state.last_reading_at = timestamp
+        if self._matches(state.setting, level):
+            state.run_length += 1
+        else:
+            state.run_length = 0
+
+    def _hydrate(self, user_id: str, exclude_ids: Sequence[str]) -> UserRuleState:
+        setting = self.settings_loader(user_id)
+        state = UserRuleState(setting, self.clock())
+        if setting:
+            # Replay just enough recent history (oldest first) to rebuild the current run
+            # Readings being observed right now may already be stored; leave them out
+            readings = self.history_loader(user_id, int(setting['consecutive_readings']), exclude_ids)
+            for level, timestamp in readings:
+                # A run is reset whenever an alert fires, so older readings don't count
+                if state.last_sent is not None and timestamp <= state.last_sent:
+                    continue
+                self._advance(state, level, timestamp)
+        return state
+
+    def invalidate(self, user_id: str):
+        """Forget a user's state, e.g. after their notification settings change"""
+        with self._lock:
+            self._states.pop(user_id, None)
+
+    def _fresh_state(self, user_id: str) -> Optional[UserRuleState]:
+        # Caller holds the lock
+        state = self._states.get(user_id)
+        if state is None or self.clock() - state.loaded_at > self.hydrate_ttl:
+            return None
+        state.loaded_at = self.clock()
+        return state
+
+    def _state_for(self, user_id: str, exclude_ids: Sequence[str]) -> UserRuleState:
+        """Return the user's state, hydrating it first (without the lock) if needed"""
+        with self._lock:
+            state = self._fresh_state(user_id)
+        if state is not None:
+            return state
+
+        hydrated = self._hydrate(user_id, exclude_ids)
+        with self._lock:
+            # Another thread may have hydrated the same user meanwhile; keep the first
+            state = self._fresh_state(user_id)
+            if state is None:
+                self._states[user_id] = state = hydrated
+        return state
+
+    def _observe_locked(self, state: UserRuleState, level: str, timestamp: datetime,
+                        can_alert: bool = True) -> Optional[Tuple]:
+        """
+        Advance one reading with the lock held. If an alert is due, returns
+        (setting, last_sent, run_length) with the values to restore if it fails.
+        With can_alert=False the run still advances, but an alert that would be
+        due leaves the cooldown and run untouched, so it fires on a later reading.
+        """
+        self._observed += 1
+
+        setting = state.setting
+        if not setting or not setting.get('enabled'):
+            return None
+
+        self._advance(state, level, timestamp)
+        if state.run_length < int(setting['consecutive_readings']):
+            return None
+
+        if state.last_sent is not None and timestamp - state.last_sent < self.cooldown:
+            self._suppressed += 1
+            return None
+
+        if not can_alert:
+            return None
+
+        previous = (setting, state.last_sent, state.run_length)
+        state.last_sent = timestamp
+        state.run_length = 0
+        self._alerts += 1
+        return previous
+
+    def _send(self, user_id: str, state: UserRuleState, timestamp: datetime, previous: Tuple,
+              level: str, score: int) -> bool:
+        """Run the alert sink outside the lock; on failure undo the cooldown so the next reading retries"""
+        setting, last_sent, run_length = previous
+        try:
+            sent = self.alert_sink(user_id, setting, level, score) is not None
+        except Exception as e:
+            print(f"Error sending a stress alert to {user_id}: {e}")
+            sent = False
+        if not sent:
+            with self._lock:
+                self._alerts -= 1
+                if state.last_sent == timestamp:
+                    state.last_sent = last_sent
+                if state.last_reading_at == timestamp:
+                    state.run_length = run_length
+        return sent
+
+    def observe(self, user_id: str, level: str, score: int, timestamp: datetime = None,
+                record_id: str = None) -> bool:
+        """Feed one reading (of any level) in time order; returns True if an alert was raised"""
+        timestamp = timestamp or datetime.now()
+
+        state = self._state_for(user_id, [record_id] if record_id else [])
+        with self._lock:
+            previous = self._observe_locked(state, level, timestamp)
+        if previous is None:
+            return False
+        return self._send(user_id, state, timestamp, previous, level, score)
+
+    def observe_many(self, user_id: str, readings: List[Dict[str, Any]]) -> bool:
+        """
+        Feed one user's readings (dicts with level, score, timestamp and id) in
+        time order, under a single lock acquisition. At most one alert is sent,
+        for the first reading that triggers one; returns True if it was. Later
+        readings in the batch that would also trigger one don't move the
+        cooldown, so the next batch raises it if the run still holds.
+        """
+        alert = None
+        state = self._state_for(user_id, [reading['id'] for reading in readings if reading.get('id')])
+        with self._lock:
+            for reading in readings:
+                timestamp = reading.get('timestamp') or datetime.now()
+                previous = self._observe_locked(state, reading['level'], timestamp, can_alert=alert is None)
+                if previous is not None:
+                    alert = (timestamp, previous, reading['level'], reading['score'])
+        if alert is None:
+            return False
+        return self._send(user_id, state, *alert)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'users_tracked': len(self._states),
+                'observed': self._observed,
+                'alerts': self._alerts,
+                'suppressed_by_cooldown': self._suppressed,
+                'cooldown_seconds': self.cooldown.total_seconds(),
+                'window_seconds': self.window.total_seconds()
+            }
@@ -0,0 +1,210 @@
+"""
+Replay harness for NotificationRuleEngine.
+
+Generates a synthetic stream of readings for many users, feeds it through the
+engine (with in-memory stand-ins for the database) and compares every alert
+against a brute-force reference that rescans each user's full history. Halfway
+through, the engine is discarded and a new one is rebuilt from the stored
+history, to check that hydration after a restart picks up where it left off.
+
+The stream is replayed twice: one reading at a time through observe(), and in
+write-behind flushes of --batch readings through observe_many(), which raises
+at most one alert per user per flush.
+
+Exits non-zero if the alert counts or timings differ.
+
+Usage:
+    python -m database.replay_notifications [--users 200] [--events 50000] [--seed 1] [--batch 50]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence, Tuple
+
+from .notification_rules import THRESHOLD_LEVELS, NotificationRuleEngine
+
+LEVELS = ('low', 'medium', 'high', 'severe')
+
+
+class InMemoryStore:
+    """Holds settings, readings and alerts the way the database would"""
+
+    def __init__(self):
+        self.settings: Dict[str, Dict] = {}
+        self.readings: Dict[str, List[Tuple[str, datetime, str]]] = {}
+        self.alerts: List[Tuple[str, datetime]] = []
+        # The harness passes each event's index as its score, so an alert can
+        # be stamped with the time of the reading that raised it
+        self.event_times: List[datetime] = []
+
+    def get_notification_setting(self, user_id: str):
+        setting = self.settings.get(user_id)
+        return dict(setting) if setting and setting['enabled'] else None
+
+    def get_recent_readings(self, user_id: str, limit: int, exclude_ids: Sequence[str] = ()):
+        readings = [r for r in self.readings.get(user_id, []) if r[2] not in exclude_ids]
+        return [(level, timestamp) for level, timestamp, _ in readings[-limit:]]
+
+    def create_notification(self, user_id: str, setting: Dict, level: str, score: int):
+        sent_at = self.event_times[score]
+        self.settings[user_id]['last_sent'] = sent_at
+        self.alerts.append((user_id, sent_at))
+        return f"n{len(self.alerts)}"
+
+
+def reference_alerts(settings: Dict[str, Dict], events: List[Tuple[str, str, datetime]],
+                     window: timedelta, cooldown: timedelta, batch: int = 1) -> List[Tuple[str, datetime]]:
+    """
+    Recompute every decision from the full history; slow but obviously correct.
+    With batch > 1 only a user's first alert in each flush of that many events
+    is raised; the others are dropped without resetting the run.
+    """
+    history: Dict[str, List[Tuple[str, datetime]]] = {}
+    last_alert: Dict[str, datetime] = {}
+    alerted_in_flush: Dict[str, int] = {}
+    alerts = []
+
+    for position, (user_id, level, timestamp) in enumerate(events):
+        history.setdefault(user_id, []).append((level, timestamp))
+        setting = settings[user_id]
+        if not setting['enabled']:
+            continue
+
+        matching = THRESHOLD_LEVELS[setting['stress_level_threshold']]
+        run = 0
+        readings = history[user_id]
+        for i in range(len(readings) - 1, -1, -1):
+            r_level, r_time = readings[i]
+            if r_level not in matching:
+                break
+            if user_id in last_alert and r_time <= last_alert[user_id]:
+                break
+            run += 1
+            if i > 0 and r_time - readings[i - 1][1] > window:
+                break
+
+        if run < setting['consecutive_readings']:
+            continue
+        if user_id in last_alert and timestamp - last_alert[user_id] < cooldown:
+            continue
+        if alerted_in_flush.get(user_id) == position // batch:
+            continue
+        alerted_in_flush[user_id] = position // batch
+        last_alert[user_id] = timestamp
+        alerts.append((user_id, timestamp))
+
+    return alerts
+
+
+def generate(users: int, events: int, seed: int):
+    rng = random.Random(seed)
+    settings = {}
+    for i in range(users):
+        user_id = f"user-{i}"
+        settings[user_id] = {
+            'id': f"setting-{i}",
+            'stress_level_threshold': rng.choice(('high', 'severe')),
+            'consecutive_readings': rng.randint(1, 5),
+            'enabled': rng.random() > 0.1,
+            'last_sent': None
+        }
+
+    # Users drift between calm and stressed phases so runs actually form
+    stressed = {user_id: False for user_id in settings}
+    clock = datetime(2024, 1, 1, 8, 0, 0)
+    stream = []
+    for _ in range(events):
+        user_id = f"user-{rng.randrange(users)}"
+        if rng.random() < 0.05:
+            stressed[user_id] = not stressed[user_id]
+        weights = (1, 2, 5, 4) if stressed[user_id] else (6, 3, 1, 0.3)
+        level = rng.choices(LEVELS, weights)[0]
+        # Mostly seconds apart, occasionally a long gap that crosses the window
+        clock += timedelta(seconds=rng.expovariate(1 / 20.0))
+        if rng.random() < 0.0005:
+            clock += timedelta(hours=30)
+        stream.append((user_id, level, clock))
+    return settings, stream
+
+
+def replay(settings: Dict[str, Dict], stream: List[Tuple[str, str, datetime]], window: timedelta,
+           cooldown: timedelta, batch: int) -> Tuple[List[Tuple[str, datetime]], float]:
+    """Feed the stream through the engine, restarting it halfway; returns (alerts, seconds)"""
+    store = InMemoryStore()
+    store.settings = {user_id: dict(setting) for user_id, setting in settings.items()}
+    store.event_times = [timestamp for _, _, timestamp in stream]
+
+    def new_engine():
+        return NotificationRuleEngine(
+            store.get_notification_setting, store.get_recent_readings, store.create_notification,
+            window=window, cooldown=cooldown, hydrate_ttl=float('inf')
+        )
+
+    engine = new_engine()
+    # On a flush boundary, so no flush straddles the restart
+    restart_at = len(stream) // 2 // batch * batch
+    started = time.perf_counter()
+    for start in range(0, len(stream), batch):
+        if start == restart_at:
+            # Simulate a process restart: all in-memory state is rebuilt from the store
+            engine = new_engine()
+        # Like the write-behind queue: store the flush, then evaluate it per user in order
+        by_user: Dict[str, List[Dict]] = {}
+        for i in range(start, min(start + batch, len(stream))):
+            user_id, level, timestamp = stream[i]
+            record_id = f"record-{i}"
+            store.readings.setdefault(user_id, []).append((level, timestamp, record_id))
+            by_user.setdefault(user_id, []).append(
+                {'id': record_id, 'level': level, 'score': i, 'timestamp': timestamp})
+        if batch == 1:
+            reading = by_user[stream[start][0]][0]
+            engine.observe(stream[start][0], reading['level'], reading['score'], reading['timestamp'],
+                           reading['id'])
+            continue
+        for user_id, readings in by_user.items():
+            engine.observe_many(user_id, readings)
+    elapsed = time.perf_counter() - started
+
+    # A flush evaluates users one after another; compare alerts in stream order
+    alerts = sorted(store.alerts, key=lambda alert: alert[1]) if batch > 1 else store.alerts
+    return alerts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a synthetic stream through the notification rules")
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch', type=int, default=50, help="Readings per write-behind flush")
+    parser.add_argument('--cooldown-minutes', type=float, default=60.0)
+    parser.add_argument('--window-hours', type=float, default=24.0)
+    args = parser.parse_args()
+
+    window = timedelta(hours=args.window_hours)
+    cooldown = timedelta(minutes=args.cooldown_minutes)
+    settings, stream = generate(args.users, args.events, args.seed)
+    print(f"Events: {len(stream):,}  users: {args.users}")
+
+    failed = False
+    for batch in (1, max(2, args.batch)):
+        alerts, elapsed = replay(settings, stream, window, cooldown, batch)
+        expected = reference_alerts(settings, stream, window, cooldown, batch)
+        mode = 'observe' if batch == 1 else f'observe_many (flushes of {batch})'
+
+        print(f"{mode}: {len(stream) / elapsed:,.0f} readings/sec, "
+              f"alerts: engine {len(alerts)}  reference {len(expected)}")
+        if alerts != expected:
+            mismatches = [(a, b) for a, b in zip(alerts, expected) if a != b]
+            first = mismatches[0] if mismatches else (alerts[len(expected):][:1], expected[len(alerts):][:1])
+            print(f"MISMATCH: first difference engine={first[0]} reference={first[1]}")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    print("OK: alert counts and timings match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Backfill or rebuild the stress_daily_rollup table from stress_records.
+
+Usage:
+    python -m database.rollup                 # rebuild every user
+    python -m database.rollup --user-id <id>  # rebuild a single user
+"""
+import argparse
+
+from .db_connector import DatabaseConnector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily stress rollup")
+    parser.add_argument('--user-id', help="Only rebuild this user's rows")
+    args = parser.parse_args()
+
+    db = DatabaseConnector(pool_size=1)
+    if not db.connect():
+        raise SystemExit(1)
+
+    try:
+        if not db.rebuild_daily_rollup(args.user_id):
+            raise SystemExit(1)
+        print("Daily rollup rebuilt")
+    finally:
+        db.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -34,7 +34,7 @@ CREATE TABLE notifications (
     user_id VARCHAR(36) NOT NULL,
     title VARCHAR(100) NOT NULL,
     message TEXT NOT NULL,
-    read BOOLEAN DEFAULT FALSE,
+    `read` BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
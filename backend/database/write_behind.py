@@ -0,0 +1,318 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+class WriteBehindQueue:
+    """
+    Persists stress records off the request path.
+
+    submit() assigns the record id and timestamp, appends the record to a local
+    journal file and queues it, then returns immediately. A background thread
+    drains the queue in multi-row INSERT batches and evaluates notification
+    rules once per user for every saved batch; a batch that fails is retried
+    with backoff until it is saved. Saved records are dropped from the front
+    of the journal as batches are flushed, and journals left behind by a
+    crashed process are replayed (skipping ids already stored) on start().
+
+    The queue is bounded. When it is full, submit() waits up to block_timeout
+    for space (on_full='block') or skips the wait (on_full='sync'), and then
+    saves the record synchronously so no reading is ever dropped.
+    """
+
+    def __init__(self, db, journal_dir: str, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.5, on_full: str = 'block', block_timeout: float = 1.0,
+                 fsync: bool = False, notify: bool = True):
+        if on_full not in ('block', 'sync'):
+            raise ValueError(f"Unknown on_full policy: {on_full}")
+
+        self.db = db
+        self.journal_dir = journal_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_full = on_full
+        self.block_timeout = block_timeout
+        self.fsync = fsync
+        self.notify = notify
+
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._journal_lock = threading.Lock()
+        self._journal = None
+        self._journal_path = None
+        self._pid = None
+        # Lines in the journal, and how many of them (a prefix) are saved
+        self._journal_records = 0
+        self._journal_saved = 0
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._flushed = 0
+        self._batches = 0
+        self._sync_fallbacks = 0
+        self._failed_batches = 0
+        self._replayed = 0
+
+    # Journal handling
+
+    def _journal_name(self, pid: int) -> str:
+        return os.path.join(self.journal_dir, f"stress_records.{pid}.journal")
+
+    def _open_journal(self):
+        self._journal_path = self._journal_name(self._pid)
+        self._journal = open(self._journal_path, 'a', encoding='utf-8')
+        self._journal_records = 0
+        self._journal_saved = 0
+
+    @staticmethod
+    def _journal_line(record: Dict[str, Any]) -> str:
+        return json.dumps(dict(record, timestamp=record['timestamp'].isoformat())) + '\n'
+
+    def _append(self, record: Dict[str, Any]):
+        self._journal.write(self._journal_line(record))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_records += 1
+
+    def _compact_journal(self, saved: int):
+        """
+        Drop a flushed batch from the journal. Records are journaled and queued
+        in the same order, so saved records are always a prefix of the file.
+        Truncating is free when everything is saved; otherwise the unsaved tail
+        (exactly what is still queued) is rewritten once the saved prefix is at
+        least half the file, which keeps the cost amortized O(1) per record.
+        """
+        with self._journal_lock:
+            self._journal_saved += saved
+            if self._journal_saved >= self._journal_records:
+                self._journal.truncate(0)
+                self._journal.seek(0)
+                self._journal_records = self._journal_saved = 0
+            elif self._journal_saved * 2 >= self._journal_records:
+                pending = list(self._queue.queue)
+                tmp = f"{self._journal_path}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.writelines(self._journal_line(record) for record in pending)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                os.replace(tmp, self._journal_path)
+                self._journal.close()
+                self._journal = open(self._journal_path, 'a', encoding='utf-8')
+                self._journal_records = len(pending)
+                self._journal_saved = 0
+
+    @staticmethod
+    def _pid_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _claim_orphaned_journals(self) -> List[str]:
+        """
+        Rename journals of dead processes (and replays a dead process claimed but
+        didn't finish) so exactly one worker replays each. Called before this
+        process opens its own journal, so a file under its own pid was left by
+        an earlier process that had the same pid (common in containers).
+        """
+        claimed = []
+        for filename in sorted(os.listdir(self.journal_dir)):
+            parts = filename.split('.')
+            if len(parts) != 3 or parts[0] != 'stress_records':
+                continue
+            if parts[2] == 'journal':
+                owner = parts[1]
+            elif parts[2].startswith('replay-'):
+                owner = parts[2][len('replay-'):].split('-')[0]
+            else:
+                continue
+            try:
+                owner = int(owner)
+            except ValueError:
+                continue
+            if owner != self._pid and self._pid_alive(owner):
+                continue
+            # Unique, so a claim never overwrites another unfinished replay
+            target = os.path.join(self.journal_dir,
+                                  f"stress_records.{parts[1]}.replay-{self._pid}-{uuid.uuid4().hex[:8]}")
+            try:
+                os.rename(os.path.join(self.journal_dir, filename), target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    def _replay(self, path: str):
+        records = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from the crash; everything before it is intact
+                    continue
+                record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+                records.append(record)
+
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            stored = set(self.db.existing_stress_record_ids([r['id'] for r in batch]))
+            pending = [r for r in batch if r['id'] not in stored]
+            if pending and not self.db.save_stress_records(pending):
+                print(f"Could not replay {path}; leaving it for the next start")
+                return
+            with self._stats_lock:
+                self._replayed += len(pending)
+
+        os.remove(path)
+        print(f"Replayed {len(records)} journaled stress record(s) from {path}")
+
+    # Lifecycle
+
+    def start(self):
+        """Open this process's journal, replay orphaned journals and start the worker"""
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+                return
+            # A new process (e.g. after a fork) gets its own journal; a restarted
+            # worker in the same process keeps the open one and its counters
+            if self._pid != os.getpid():
+                os.makedirs(self.journal_dir, exist_ok=True)
+                self._pid = os.getpid()
+                orphaned = self._claim_orphaned_journals()
+                self._open_journal()
+                for path in orphaned:
+                    self._replay(path)
+            self._worker = threading.Thread(target=self._run, name='stress-write-behind', daemon=True)
+            self._worker.start()
+
+    def submit(self, user_id: str, level: str, score: int, source: str, notes: str = None,
+               model_version: str = None) -> str:
+        """Queue a stress record for saving and return its id immediately"""
+        if self._worker is None or not self._worker.is_alive() or self._pid != os.getpid():
+            self.start()
+
+        record = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'level': level,
+            'score': score,
+            'source': source,
+            'notes': notes,
+            'timestamp': datetime.now().replace(microsecond=0),
+            'model_version': model_version
+        }
+
+        deadline = time.monotonic() + (self.block_timeout if self.on_full == 'block' else 0.0)
+        while True:
+            with self._journal_lock:
+                # Only submitters put, and only under this lock, so the slot
+                # checked here is still free after the journal write. A failed
+                # write raises before the record is queued.
+                if not self._queue.full():
+                    self._append(record)
+                    self._queue.put_nowait(record)
+                    with self._stats_lock:
+                        self._submitted += 1
+                    return record['id']
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.005)
+
+        # Backpressure: the queue stayed full, so write through on this thread
+        with self._stats_lock:
+            self._sync_fallbacks += 1
+        if not self.db.save_stress_records([record]):
+            return None
+        if self.notify:
+            self._evaluate_notifications([record])
+        return record['id']
+
+    # Worker
+
+    def _collect_batch(self) -> List[Dict[str, Any]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _save_batch(self, batch: List[Dict[str, Any]]):
+        """Save a batch, retrying with backoff until it is stored; never raises"""
+        backoff = 0.5
+        pending = batch
+        while True:
+            try:
+                if self.db.save_stress_records(pending):
+                    return
+                # Drop ids that did make it in (e.g. a commit whose ack was lost) and retry
+                stored = set(self.db.existing_stress_record_ids([r['id'] for r in pending]))
+                pending = [r for r in pending if r['id'] not in stored]
+                if not pending:
+                    return
+            except Exception as e:
+                print(f"Error saving a write-behind batch of {len(pending)} record(s): {e}")
+            with self._stats_lock:
+                self._failed_batches += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            self._save_batch(batch)
+            with self._stats_lock:
+                self._flushed += len(batch)
+                self._batches += 1
+
+            if self.notify:
+                self._evaluate_notifications(batch)
+            try:
+                self._compact_journal(len(batch))
+            except OSError as e:
+                # The records are saved; a journal that wasn't compacted only means extra replay work
+                print(f"Error compacting {self._journal_path}: {e}")
+
+    def _evaluate_notifications(self, records: List[Dict[str, Any]]):
+        # Each user's readings are fed in order, once per batch; the rule engine is O(1) per reading
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_user.setdefault(record['user_id'], []).append(record)
+        for user_id, readings in by_user.items():
+            try:
+                self.db.notification_rules.observe_many(user_id, readings)
+            except Exception as e:
+                print(f"Error evaluating notifications for {user_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'on_full': self.on_full,
+                'submitted': self._submitted,
+                'flushed': self._flushed,
+                'batches': self._batches,
+                'failed_batches': self._failed_batches,
+                'sync_fallbacks': self._sync_fallbacks,
+                'replayed': self._replayed,
+                'journal': self._journal_path
+            }
@@ -0,0 +1,35 @@
+# Production server settings for the StressSense backend.
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Every value can be overridden through the environment.
+import multiprocessing
+import os
+
+bind = os.environ.get('STRESS_BIND', '0.0.0.0:5000')
+
+# Worker processes; each loads the model once, after forking
+workers = int(os.environ.get('STRESS_WORKERS', max(1, multiprocessing.cpu_count() // 2)))
+
+# Threads per worker serve I/O-bound endpoints (auth, history, trend) while
+# inference runs in the worker's InferencePool
+worker_class = 'gthread'
+threads = int(os.environ.get('STRESS_THREADS', 8))
+
+timeout = int(os.environ.get('STRESS_WORKER_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('STRESS_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Never import the app (and TensorFlow) in the master: forking a process with
+# TensorFlow's thread pools already running is unsafe
+preload_app = False
+
+accesslog = os.environ.get('STRESS_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Load the model and start background workers inside each worker process"""
+    from app import init_worker
+    init_worker()
+    worker.log.info("StressSense worker %s initialized", worker.pid)
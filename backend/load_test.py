@@ -0,0 +1,119 @@
+"""
+Concurrent load test for the StressSense API.
+
+Runs detection and history clients side by side against a running server and
+reports throughput and latency per endpoint, so the dev server, a thread pool
+and a process pool can be compared on the same box:
+
+    python app.py                                                # dev server
+    STRESS_INFERENCE_MODE=process gunicorn -c gunicorn.conf.py wsgi:app
+    python load_test.py --token <jwt> --image face.jpg --duration 30
+
+Only the standard library is used, so it runs from any machine.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, List
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[int(p / 100.0 * (len(ordered) - 1))] if ordered else 0.0
+
+
+def login(base_url: str, email: str, password: str) -> str:
+    body = json.dumps({'email': email, 'password': password}).encode()
+    request = urllib.request.Request(f"{base_url}/api/login", data=body,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())['token']
+
+
+def multipart_image(image_data: bytes, source: str = 'image'):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"source\"\r\n\r\n{source}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"load.jpg\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image_data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, ms: float, ok: bool):
+        with self.lock:
+            if ok:
+                self.latencies.setdefault(name, []).append(ms)
+            else:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def client(name: str, make_request, stats: Stats, stop_at: float):
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(make_request(), timeout=120) as response:
+                response.read()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        stats.record(name, (time.perf_counter() - started) * 1000.0, ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the StressSense API")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--token', help="JWT to use (or pass --email/--password)")
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    parser.add_argument('--image', required=True, help="Image to submit for detection")
+    parser.add_argument('--detect-clients', type=int, default=16)
+    parser.add_argument('--history-clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run")
+    args = parser.parse_args()
+
+    token = args.token or login(args.url, args.email, args.password)
+    auth = {'Authorization': f"Bearer {token}"}
+    with open(args.image, 'rb') as f:
+        body, content_type = multipart_image(f.read())
+
+    def detect_request():
+        return urllib.request.Request(f"{args.url}/api/stress/detect", data=body,
+                                      headers=dict(auth, **{'Content-Type': content_type}))
+
+    def history_request():
+        return urllib.request.Request(f"{args.url}/api/stress/history?limit=20", headers=auth)
+
+    stats = Stats()
+    stop_at = time.monotonic() + args.duration
+    threads = [threading.Thread(target=client, args=('detect', detect_request, stats, stop_at))
+               for _ in range(args.detect_clients)]
+    threads += [threading.Thread(target=client, args=('history', history_request, stats, stop_at))
+                for _ in range(args.history_clients)]
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    print(f"{'endpoint':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name in ('detect', 'history'):
+        samples = stats.latencies.get(name, [])
+        print(f"{name:<10}{len(samples) / elapsed:>10.1f}{percentile(samples, 50):>10.1f}"
+              f"{percentile(samples, 99):>10.1f}{stats.errors.get(name, 0):>8}")
+
+
+if __name__ == '__main__':
+    main()
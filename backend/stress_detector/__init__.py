@@ -1,4 +1,11 @@
 
-from .detector import StressDetector
-
 __all__ = ['StressDetector']
+
+
+def __getattr__(name):
+    # Imported on first access so that importing a light submodule (e.g.
+    # stress_detector.inference_pool) doesn't pull in OpenCV and the detector
+    if name == 'StressDetector':
+        from .detector import StressDetector
+        return StressDetector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
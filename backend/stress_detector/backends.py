@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), 'models')
+
+DEFAULT_MODEL_PATHS = {
+    'keras': os.path.join(MODELS_DIR, 'stress_detection_model.h5'),
+    'graph': os.path.join(MODELS_DIR, 'stress_detection_model.h5'),
+    'tflite': os.path.join(MODELS_DIR, 'stress_detection_model.tflite'),
+}
+
+
+class InferenceBackend:
+    """Runs a loaded model on float32 batches of shape (N, 224, 224, 3)"""
+
+    name = None
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        # Filled in by load(): import_ms and load_ms
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def warm_up_batch_sizes(self) -> List[int]:
+        """Batch sizes worth running once before serving"""
+        return [1]
+
+    def load(self):
+        raise NotImplementedError
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        """Return stress probabilities with shape (N, 1)"""
+        raise NotImplementedError
+
+
+def configure_tensorflow_threads(intra_op_threads: Optional[int], inter_op_threads: Optional[int]):
+    """
+    Cap TensorFlow's thread pools. Must run before the first op executes;
+    afterwards TensorFlow refuses the change and the defaults stay.
+    """
+    import tensorflow as tf
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"TensorFlow already initialized, keeping its thread settings: {e}")
+
+
+class KerasBackend(InferenceBackend):
+    """The full Keras .h5 model, run with model.predict"""
+
+    name = 'keras'
+
+    def __init__(self, model_path: str, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None):
+        super().__init__(model_path)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+    def load(self):
+        started = time.perf_counter()
+        from tensorflow.keras.models import load_model
+        configure_tensorflow_threads(self.intra_op_threads, self.inter_op_threads)
+        imported = time.perf_counter()
+        self.model = load_model(self.model_path)
+        self.timings = {
+            'import_ms': (imported - started) * 1000.0,
+            'load_ms': (time.perf_counter() - imported) * 1000.0
+        }
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self.model.predict(images, batch_size=len(images), verbose=0)
+
+
+class GraphBackend(KerasBackend):
+    """
+    The Keras model called through a compiled tf.function.
+
+    model.predict builds a data adapter and runs a step loop on every call,
+    which dominates the cost of the small batches the batching engine sends.
+    Here each batch is zero-padded up to the nearest bucket size (1, 2, 4, 8
+    by default) so there is exactly one traced graph per bucket, all traced
+    during warm-up. Batches bigger than the largest bucket are split.
+    """
+
+    name = 'graph'
+
+    def __init__(self, model_path: str, buckets: Sequence[int] = (1, 2, 4, 8),
+                 intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+        super().__init__(model_path, intra_op_threads, inter_op_threads)
+        self.buckets = sorted(set(int(b) for b in buckets if int(b) > 0)) or [1]
+
+    @property
+    def warm_up_batch_sizes(self) -> List[int]:
+        return list(self.buckets)
+
+    def load(self):
+        super().load()
+        import tensorflow as tf
+        model = self.model
+        self._forward = tf.function(lambda images: model(images, training=False))
+
+    def _bucket_for(self, batch_size: int) -> int:
+        for bucket in self.buckets:
+            if bucket >= batch_size:
+                return bucket
+        return self.buckets[-1]
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        largest = self.buckets[-1]
+        if len(images) > largest:
+            return np.concatenate([self.predict(images[i:i + largest]) for i in range(0, len(images), largest)])
+
+        bucket = self._bucket_for(len(images))
+        if bucket != len(images):
+            padded = np.zeros((bucket,) + images.shape[1:], dtype=np.float32)
+            padded[:len(images)] = images
+        else:
+            padded = images
+        return self._forward(padded).numpy()[:len(images)]
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    A converted .tflite model (optionally quantized) run by the TFLite interpreter.
+
+    Uses the standalone tflite_runtime package when it is installed, so workers
+    don't need TensorFlow at all, and falls back to tf.lite otherwise. The
+    interpreter is not thread-safe, so calls are serialized; the input tensor is
+    only resized when the batch size changes.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        super().__init__(model_path)
+        self.num_threads = num_threads
+        self._lock = threading.Lock()
+        self._batch_size = None
+
+    def load(self):
+        started = time.perf_counter()
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        imported = time.perf_counter()
+
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self.timings = {
+            'import_ms': (imported - started) * 1000.0,
+            'load_ms': (time.perf_counter() - imported) * 1000.0
+        }
+
+    def _quantize_input(self, images: np.ndarray) -> np.ndarray:
+        dtype = self._input['dtype']
+        if dtype == np.float32:
+            return images
+        # Fully-integer models take quantized inputs
+        scale, zero_point = self._input['quantization']
+        return np.clip(np.round(images / scale + zero_point), np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+
+    def _dequantize_output(self, output: np.ndarray) -> np.ndarray:
+        if self._output['dtype'] == np.float32:
+            return output
+        scale, zero_point = self._output['quantization']
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if len(images) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], (len(images),) + images.shape[1:])
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = len(images)
+            self.interpreter.set_tensor(self._input['index'], self._quantize_input(images))
+            self.interpreter.invoke()
+            return self._dequantize_output(self.interpreter.get_tensor(self._output['index']))
+
+
+def create_backend(name: str, model_path: Optional[str] = None, **options: Any) -> InferenceBackend:
+    """Build an (unloaded) backend by name: 'keras', 'graph' or 'tflite'"""
+    if name not in DEFAULT_MODEL_PATHS:
+        raise ValueError(f"Unknown model backend: {name}")
+    model_path = model_path or DEFAULT_MODEL_PATHS[name]
+    if name == 'tflite':
+        return TFLiteBackend(model_path, num_threads=options.get('num_threads'))
+    threads = dict(intra_op_threads=options.get('intra_op_threads'), inter_op_threads=options.get('inter_op_threads'))
+    if name == 'graph':
+        return GraphBackend(model_path, buckets=options.get('buckets') or (1, 2, 4, 8), **threads)
+    return KerasBackend(model_path, **threads)
@@ -0,0 +1,133 @@
+"""
+Micro-benchmark for the image preprocessing pipeline.
+
+Compares the original decode -> resize -> detect -> crop -> float64 path with
+ImagePreprocessor and reports per-stage timings and peak Python-visible
+allocations (numpy and OpenCV output arrays are tracked by tracemalloc).
+
+Usage:
+    python -m stress_detector.benchmark_preprocess [--image face.jpg] [--iterations 200]
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+from .face_detector import get_face_detector
+from .metrics import summarize
+from .preprocessing import ImagePreprocessor
+
+
+def legacy_preprocess(image_data: bytes, face_detector, timings: Dict[str, float]) -> np.ndarray:
+    """The pre-rewrite pipeline, kept here as the baseline"""
+    t0 = time.perf_counter()
+    image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    t1 = time.perf_counter()
+    image = cv2.resize(image, (224, 224))
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    face = face_detector.detect(gray) if face_detector.available else None
+    t2 = time.perf_counter()
+    if face is not None:
+        x, y, w, h = face
+        image = cv2.resize(image[y:y+h, x:x+w], (224, 224))
+    t3 = time.perf_counter()
+    image = image / 255.0
+    image = np.expand_dims(image, axis=0)
+    t4 = time.perf_counter()
+
+    timings['decode'] = (t1 - t0) * 1000.0
+    timings['detect'] = (t2 - t1) * 1000.0
+    timings['crop_resize'] = (t3 - t2) * 1000.0
+    timings['normalize'] = (t4 - t3) * 1000.0
+    return image
+
+
+def synthetic_image(width: int, height: int) -> bytes:
+    """Encode a noisy gradient frame as JPEG"""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    frame = np.clip(gradient + rng.normal(0, 20, (height, width, 3)), 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("Failed to encode synthetic image")
+    return encoded.tobytes()
+
+
+def run(name: str, fn: Callable[[Dict[str, float]], object], iterations: int) -> Dict[str, object]:
+    # Warm up caches, cascade and allocator
+    for _ in range(5):
+        fn({})
+
+    per_stage: Dict[str, List[float]] = {}
+    totals = []
+    for _ in range(iterations):
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        fn(timings)
+        totals.append((time.perf_counter() - started) * 1000.0)
+        for stage, ms in timings.items():
+            per_stage.setdefault(stage, []).append(ms)
+
+    tracemalloc.start()
+    fn({})
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(stat.count for stat in snapshot.statistics('filename'))
+
+    return {
+        'name': name,
+        'total_ms': summarize(totals),
+        'stages': {stage: summarize(samples) for stage, samples in per_stage.items()},
+        'peak_kib': peak / 1024.0,
+        'retained_kib': current / 1024.0,
+        'live_blocks': allocations
+    }
+
+
+def print_report(result: Dict[str, object]):
+    total = result['total_ms']
+    print(f"\n{result['name']}")
+    print(f"  total        p50 {total['p50']:8.3f} ms   p99 {total['p99']:8.3f} ms")
+    for stage, stats in result['stages'].items():
+        print(f"  {stage:<12} p50 {stats['p50']:8.3f} ms   p99 {stats['p99']:8.3f} ms")
+    print(f"  peak alloc   {result['peak_kib']:10.1f} KiB  (retained {result['retained_kib']:.1f} KiB, "
+          f"{result['live_blocks']} live blocks)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stress detector preprocessing")
+    parser.add_argument('--image', help="Image file to use (defaults to a synthetic JPEG)")
+    parser.add_argument('--width', type=int, default=1920, help="Synthetic image width")
+    parser.add_argument('--height', type=int, default=1080, help="Synthetic image height")
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--detect-max-side', type=int, default=480)
+    parser.add_argument('--reduced-decode-min-side', type=int, default=896,
+                        help="0 disables IMREAD_REDUCED_* decoding")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image_data = f.read()
+    else:
+        image_data = synthetic_image(args.width, args.height)
+
+    face_detector = get_face_detector()
+    preprocessor = ImagePreprocessor(
+        face_detector,
+        detect_max_side=args.detect_max_side,
+        reduced_decode_min_side=args.reduced_decode_min_side or None
+    )
+    out = np.empty((1,) + preprocessor.output_shape, dtype=np.float32)
+
+    print(f"Input: {len(image_data) / 1024.0:.1f} KiB, {args.iterations} iterations")
+    print_report(run('legacy', lambda t: legacy_preprocess(image_data, face_detector, t), args.iterations))
+    print_report(run('pipeline', lambda t: preprocessor.preprocess_into(image_data, out[0], t), args.iterations))
+
+
+if __name__ == '__main__':
+    main()
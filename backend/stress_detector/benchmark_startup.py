@@ -0,0 +1,108 @@
+"""
+Startup-time benchmark for the StressSense backend.
+
+Each phase runs in a fresh Python process so import caches are cold:
+
+  app import        import app.py (auth/history-only workers stop here)
+  detector import   import stress_detector.detector (OpenCV, no TensorFlow)
+  tensorflow import first import of tensorflow.keras
+  model load        load_model() on the .h5 file
+  first inference   first forward pass (graph tracing)
+  steady inference  median of the following forward passes
+
+Usage (from the backend directory):
+    python -m stress_detector.benchmark_startup [--model path/to/model.h5] [--repeat 3]
+
+The model defaults to the registry's active version, as served.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from .model_registry import resolve_active_artifact
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_IMPORT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+print(json.dumps({
+    'app_import_ms': (time.perf_counter() - started) * 1000.0,
+    'tensorflow_imported': 'tensorflow' in sys.modules,
+    'cv2_imported': 'cv2' in sys.modules
+}))
+"""
+
+DETECTOR_STARTUP = """
+import json, sys, time
+import numpy as np
+started = time.perf_counter()
+from stress_detector.detector import StressDetector
+imported = time.perf_counter()
+detector = StressDetector(model_path=sys.argv[1] or None)
+constructed = time.perf_counter()
+timings = detector.warm_up()
+steady = []
+if detector.model is not None:
+    dummy = np.zeros((1,) + detector.preprocessor.output_shape, dtype=np.float32)
+    for _ in range(20):
+        t = time.perf_counter()
+        detector._predict_batch(dummy)
+        steady.append((time.perf_counter() - t) * 1000.0)
+print(json.dumps({
+    'detector_import_ms': (imported - started) * 1000.0,
+    'detector_construct_ms': (constructed - imported) * 1000.0,
+    'tensorflow_import_ms': timings.get('import_ms'),
+    'model_load_ms': timings.get('load_ms'),
+    'first_inference_ms': timings.get('first_inference_ms_batch_1'),
+    'steady_inference_ms': sorted(steady)[len(steady) // 2] if steady else None,
+    'model_state': detector.model_state
+}))
+"""
+
+
+def run_child(code: str, *args: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', code, *args],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down StressSense cold-start latency")
+    parser.add_argument('--model', help="Model file (defaults to the registry's active version, "
+                                        "then the detector's default path)")
+    parser.add_argument('--repeat', type=int, default=3, help="Cold starts per phase")
+    parser.add_argument('--skip-app', action='store_true', help="Skip the app import phase")
+    args = parser.parse_args()
+    # The child builds a detector without registry_config, so resolve the path here
+    try:
+        model = args.model or resolve_active_artifact('graph') or ''
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    samples = {}
+    flags = {}
+    for _ in range(args.repeat):
+        results = {} if args.skip_app else run_child(APP_IMPORT)
+        results.update(run_child(DETECTOR_STARTUP, model))
+        for key, value in results.items():
+            if isinstance(value, bool) or isinstance(value, str):
+                flags[key] = value
+            elif value is not None:
+                samples.setdefault(key, []).append(value)
+
+    print(f"{'phase':<26}{'median ms':>12}{'min ms':>12}")
+    for key, values in samples.items():
+        print(f"{key.replace('_ms', ''):<26}{statistics.median(values):>12.1f}{min(values):>12.1f}")
+    for key, value in flags.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
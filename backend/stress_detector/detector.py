@@ -1,90 +1,506 @@
-
 import cv2
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
 import os
 import io
-from typing import Dict, List, Any, Optional, Union
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 import random  # Just for the mock version
 
+from .backends import create_backend
+from .face_detector import get_face_detector
+from .metrics import LatencyTracker
+from .model_registry import ARTIFACT_NAMES, ModelRegistry
+from .preprocessing import ImagePreprocessor
+from .result_cache import ResultCache
+from .video import VideoAnalyzer
+
+
+class _PendingInference:
+    """
+    A single caller waiting for its slot in a batched forward pass, or (with
+    predict_fn set) a whole stacked batch that runs as a forward pass of its own
+    """
+    __slots__ = ('image', 'predict_fn', 'enqueued_at', 'done', 'prediction', 'model_version', 'error')
+
+    def __init__(self, image: np.ndarray, predict_fn: Callable = None):
+        self.image = image
+        self.predict_fn = predict_fn
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.prediction = None
+        self.model_version = None
+        self.error = None
+
+
+class _LoadedModel:
+    """A loaded backend and the model version it serves, swapped in as one reference"""
+    __slots__ = ('backend', 'version')
+
+    def __init__(self, backend, version: str):
+        self.backend = backend
+        self.version = version
+
+
+class BatchingEngine:
+    """
+    Collects concurrent inference requests into micro-batches.
+
+    Callers block in submit() until their result is ready. A background worker
+    takes the first waiting request, then keeps collecting until either
+    max_batch_size requests are queued or max_wait_ms has elapsed, and runs
+    the whole batch through predict_fn in a single forward pass. predict_fn
+    returns the predictions and the version of the model that made them.
+
+    Callers that already hold a stacked batch (batch uploads, video, warm-up)
+    use submit_batch(). It runs as its own forward pass on the same worker, so
+    every inference on the model is serialized on one thread.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], Tuple[np.ndarray, Optional[str]]],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 stats_window: int = 1000):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        # A stacked batch that arrived while singles were being collected
+        self._held = None
+        self._worker = None
+        # Reused across batches; only the worker thread writes to it
+        self._batch_buffer = None
+        self._worker_lock = threading.Lock()
+
+        # Counters for tuning max_batch_size / max_wait_ms
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._batch_size_histogram = {}
+        self._stacked_batches = 0
+        self._stacked_images = 0
+        self._queue_wait_ms = LatencyTracker(stats_window)
+        self._inference_ms = LatencyTracker(stats_window)
+        self._total_ms = LatencyTracker(stats_window)
+
+    def _ensure_worker(self):
+        # Started lazily so the thread is created in the process that
+        # actually serves requests (e.g. after a pre-fork server forks)
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='stress-batching-engine', daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, image: np.ndarray) -> Tuple[np.ndarray, Optional[str]]:
+        """Queue a single preprocessed image (H, W, C) and wait for (prediction, model version)"""
+        self._ensure_worker()
+        pending = _PendingInference(image)
+        self._queue.put(pending)
+        pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+
+        self._total_ms.record((time.perf_counter() - pending.enqueued_at) * 1000.0)
+
+        return pending.prediction, pending.model_version
+
+    def submit_batch(self, images: np.ndarray,
+                     predict_fn: Callable[[np.ndarray], Tuple[np.ndarray, Optional[str]]] = None
+                     ) -> Tuple[np.ndarray, Optional[str]]:
+        """
+        Run a stacked (N, H, W, C) batch as one forward pass on the worker and
+        wait for (predictions, model version). predict_fn overrides the engine's,
+        e.g. to pin a model version.
+        """
+        self._ensure_worker()
+        pending = _PendingInference(images, predict_fn or self.predict_fn)
+        self._queue.put(pending)
+        pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+
+        return pending.prediction, pending.model_version
+
+    def _collect_batch(self) -> List[_PendingInference]:
+        first, self._held = self._held or self._queue.get(), None
+        batch = [first]
+        if first.predict_fn is not None:
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    pending = self._queue.get_nowait()
+                else:
+                    pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending.predict_fn is not None:
+                # Run what was collected so far; the stacked batch goes next
+                self._held = pending
+                break
+            batch.append(pending)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+
+            try:
+                if batch[0].predict_fn is not None:
+                    pending = batch[0]
+                    pending.prediction, pending.model_version = pending.predict_fn(pending.image)
+                else:
+                    images = self._fill_batch_buffer(batch)
+                    predictions, model_version = self.predict_fn(images)
+                    for pending, prediction in zip(batch, predictions):
+                        pending.prediction = prediction
+                        pending.model_version = model_version
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+
+            finished = time.perf_counter()
+            self._record_batch(batch, started, finished)
+
+            for pending in batch:
+                pending.done.set()
+
+    def _fill_batch_buffer(self, batch: List[_PendingInference]) -> np.ndarray:
+        first = batch[0].image
+        buffer = self._batch_buffer
+        if buffer is None or buffer.shape[1:] != first.shape or buffer.dtype != first.dtype:
+            buffer = np.empty((self.max_batch_size,) + first.shape, dtype=first.dtype)
+            self._batch_buffer = buffer
+        for i, pending in enumerate(batch):
+            buffer[i] = pending.image
+        return buffer[:len(batch)]
+
+    def _record_batch(self, batch: List[_PendingInference], started: float, finished: float):
+        if batch[0].predict_fn is not None:
+            # Stacked batches are counted apart so they don't skew micro-batch tuning
+            with self._stats_lock:
+                self._stacked_batches += 1
+                self._stacked_images += len(batch[0].image)
+                if batch[0].error is not None:
+                    self._errors += 1
+            return
+        with self._stats_lock:
+            size = len(batch)
+            self._requests += size
+            self._batches += 1
+            if batch[0].error is not None:
+                self._errors += 1
+            self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+        self._inference_ms.record((finished - started) * 1000.0)
+        for pending in batch:
+            self._queue_wait_ms.record((started - pending.enqueued_at) * 1000.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return latency and batch-size counters"""
+        with self._stats_lock:
+            stats = {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'requests': self._requests,
+                'batches': self._batches,
+                'errors': self._errors,
+                'queue_depth': self._queue.qsize(),
+                'avg_batch_size': (self._requests / self._batches) if self._batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_size_histogram.items())),
+                'stacked_batches': self._stacked_batches,
+                'stacked_images': self._stacked_images
+            }
+        stats.update({
+            'queue_wait_ms': self._queue_wait_ms.summary(),
+            'inference_ms': self._inference_ms.summary(),
+            'total_ms': self._total_ms.summary()
+        })
+        return stats
+
+
 class StressDetector:
-    def __init__(self, model_path: str = None):
-        # Path to saved model
-        self.model_path = model_path or os.path.join(os.path.dirname(__file__), 'models/stress_detection_model.h5')
+    def __init__(self, model_path: str = None, max_batch_size: int = 8, max_wait_ms: float = 5.0,
+                 backend: str = 'graph', backend_config: Optional[Dict[str, Any]] = None,
+                 face_config: Optional[Dict[str, Any]] = None,
+                 preprocess_config: Optional[Dict[str, Any]] = None,
+                 video_config: Optional[Dict[str, Any]] = None,
+                 result_cache_config: Optional[Dict[str, Any]] = None,
+                 registry_config: Optional[Dict[str, Any]] = None):
+        # Inference backend: 'graph' runs the .h5 model through compiled
+        # per-batch-size graphs, 'keras' through model.predict, and 'tflite'
+        # the converted (optionally quantized) artifact from export_model.py.
+        # backend_config accepts buckets, intra_op_threads and inter_op_threads
+        # for the TensorFlow backends and num_threads for 'tflite'
+        self.backend_name = backend
+        self.backend_config = backend_config or {}
+        
+        # Without an explicit model_path the active version of the model
+        # registry is served, and newer activations are hot-swapped in.
+        # registry_config accepts root and poll_interval (seconds, 0 disables polling)
+        self.registry = None
+        self.reload_interval = 0.0
+        self.model_version = None
+        artifact_error = None
+        from_registry = False
+        if model_path is None and registry_config is not None:
+            registry_config = dict(registry_config)
+            self.reload_interval = float(registry_config.pop('poll_interval', 10.0))
+            self.registry = ModelRegistry(**registry_config)
+            self.model_version = self.registry.active_version()
+            if self.model_version is not None:
+                from_registry = True
+                try:
+                    model_path = self.registry.artifact_path(self.model_version, backend)
+                except ValueError as e:
+                    # e.g. the tflite backend and a version published with only model.h5;
+                    # reported by load() instead of quietly falling back to mock mode
+                    artifact_error = str(e)
+                    model_path = os.path.join(self.registry.version_dir(self.model_version), ARTIFACT_NAMES[backend])
+                    print(f"Active model version {self.model_version} can't be served by the {backend} backend: {e}")
+        
+        self.backend = create_backend(backend, model_path, **self.backend_config)
+        self.model_path = self.backend.model_path
+        # Models that didn't come from the registry are identified by file name
+        self.model_version = self.model_version or os.path.basename(self.model_path)
         self.model = None
+        self.batching_engine = None
+        # Read once per request or batch, so a hot swap never splits one
+        self._active: Optional[_LoadedModel] = None
         
-        # Try to load the model if it exists
-        try:
-            if os.path.exists(self.model_path):
-                print(f"Loading model from {self.model_path}")
-                self.model = load_model(self.model_path)
-                self.model.summary()
-            else:
-                print("Model file not found, running in mock mode")
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            print("Running in mock mode")
-    
-    def preprocess_image(self, image_data: bytes) -> np.ndarray:
-        """Preprocess image for the model"""
-        # Convert bytes to image
-        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+        # Face detector is loaded once per process and shared by every request.
+        # face_config accepts cascade_path, scale_factor, min_neighbors, min_size, max_size
+        self.face_detector = get_face_detector(**(face_config or {}))
+        
+        # preprocess_config accepts input_size, detect_max_side, reduced_decode_min_side
+        self.preprocessor = ImagePreprocessor(self.face_detector, **(preprocess_config or {}))
+        self._local = threading.local()
         
-        # Resize to our model input size
-        image = cv2.resize(image, (224, 224))
+        # video_config accepts sample_fps, frame_stride, segment_seconds, max_segments, batch_size
+        self.video_config = video_config or {}
         
-        # Convert BGR to RGB (if using OpenCV which reads as BGR)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        # Results for byte-identical uploads (retries, re-sent still frames).
+        # result_cache_config accepts max_bytes (0 disables it) and check_interval
+        self.result_cache = ResultCache(self.model_path, **(result_cache_config or {}))
         
-        # Facial feature extraction
-        face = self.extract_face(image)
-        if face is not None:
-            image = face
+        # The model is loaded on first use or by warm_up(); TensorFlow itself is
+        # only imported then, so processes that never run inference skip it
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.model_state = 'not_loaded'
+        self.model_error = None
+        self._artifact_error = artifact_error
+        # Set when the model is the registry's active version rather than a plain file
+        self._from_registry = from_registry
+        self.startup_timings = {}
+        self._load_lock = threading.Lock()
         
-        # Normalize pixel values to [0, 1]
-        image = image / 255.0
+        # Hot reload bookkeeping
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._failed_version = None
+        self.reloads = 0
+        self.reload_error = None
+        self.last_reload = None
+    
+    def load(self) -> bool:
+        """Import TensorFlow and load the model once; returns True if a real model is available"""
+        if self.model_state in ('ready', 'mock', 'error'):
+            return self.model is not None
         
-        # Add batch dimension if using TF
-        image = np.expand_dims(image, axis=0)
+        with self._load_lock:
+            if self.model_state in ('ready', 'mock', 'error'):
+                return self.model is not None
+            self.model_state = 'loading'
+            
+            # Try to load the model if it exists
+            try:
+                if self._artifact_error is not None:
+                    raise ValueError(self._artifact_error)
+                # A registry artifact that went missing is an error, not mock mode
+                if self._from_registry or os.path.exists(self.model_path):
+                    print(f"Loading {self.backend.name} model {self.model_version} from {self.model_path}")
+                    if self._from_registry:
+                        self.registry.verify(self.model_version, os.path.basename(self.model_path))
+                    self.backend.load()
+                    self.startup_timings.update(self.backend.timings)
+                    self._install(self.backend, self.model_version)
+                else:
+                    print("Model file not found, running in mock mode")
+                    self.model_state = 'mock'
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                print("Running in mock mode")
+                self.model_error = str(e)
+                self.model_state = 'error'
+                if self._from_registry:
+                    self._failed_version = self.model_version
+            
+            # Started even in mock mode, so activating a version later ends it
+            self._start_watcher()
         
-        return image
+        return self.model is not None
+    
+    def _install(self, backend, version: str):
+        """Make a loaded, warmed-up backend the one serving requests"""
+        if self.batching_engine is None:
+            self.batching_engine = BatchingEngine(
+                self._predict_versioned,
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_wait_ms
+            )
+        # A single reference assignment: batches already running keep the old
+        # backend until they finish, every later batch gets the new one
+        self._active = _LoadedModel(backend, version)
+        self.backend = backend
+        self.model = backend
+        self.model_path = backend.model_path
+        self.model_version = version
+        self.model_state = 'ready'
+        self.model_error = None
+        self.result_cache.switch_model(self.model_path)
+    
+    def _start_watcher(self):
+        if self.registry is None or self.reload_interval <= 0:
+            return
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher = threading.Thread(target=self._watch_registry, name='stress-model-reload', daemon=True)
+        self._watcher.start()
+    
+    def _watch_registry(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                self.reload_model()
+            except Exception as e:
+                print(f"Error checking the model registry: {e}")
+    
+    def reload_model(self) -> bool:
+        """
+        Switch to the registry's active version if it changed. The new model is
+        verified, loaded and warmed up on this thread while the current one
+        keeps serving, then swapped in. Returns True if a new version went live.
+        """
+        if self.registry is None:
+            return False
+        version = self.registry.active_version()
+        if version is None or version == self.model_version or version == self._failed_version:
+            return False
+        
+        with self._reload_lock:
+            if version == self.model_version:
+                return False
+            started = time.perf_counter()
+            try:
+                print(f"Loading model {version} in the background")
+                model_path = self.registry.artifact_path(version, self.backend_name)
+                self.registry.verify(version, os.path.basename(model_path))
+                backend = create_backend(self.backend_name, model_path, **self.backend_config)
+                backend.load()
+                loaded = time.perf_counter()
+                for batch_size in backend.warm_up_batch_sizes:
+                    backend.predict(np.zeros((batch_size,) + self.preprocessor.output_shape, dtype=np.float32))
+            except Exception as e:
+                # Keep serving the current model; retried only once ACTIVE changes again
+                print(f"Error loading model {version}, keeping {self.model_version}: {e}")
+                self._failed_version = version
+                self.reload_error = f"{version}: {e}"
+                return False
+            
+            previous = self.model_version
+            self._install(backend, version)
+            self._failed_version = None
+            self.reload_error = None
+            self.reloads += 1
+            self.last_reload = {
+                'from': previous,
+                'to': version,
+                'load_ms': (loaded - started) * 1000.0,
+                'warm_up_ms': (time.perf_counter() - loaded) * 1000.0
+            }
+            print(f"Now serving model {version} (was {previous})")
+            return True
+    
+    def warm_up(self, batch_sizes: List[int] = None) -> Dict[str, float]:
+        """
+        Load the model and run dummy batches so the first real request doesn't
+        pay for graph tracing. Returns the startup timings in milliseconds.
+        """
+        if not self.load():
+            return self.startup_timings
+        
+        for batch_size in batch_sizes or self.backend.warm_up_batch_sizes:
+            dummy = np.zeros((batch_size,) + self.preprocessor.output_shape, dtype=np.float32)
+            started = time.perf_counter()
+            self._predict_batch(dummy)
+            self.startup_timings[f'first_inference_ms_batch_{batch_size}'] = (time.perf_counter() - started) * 1000.0
+        return self.startup_timings
+    
+    def get_model_status(self) -> Dict[str, Any]:
+        """Model state for readiness checks"""
+        return {
+            'state': self.model_state,
+            'ready': self.model_state in ('ready', 'mock'),
+            'mock': self.model_state in ('mock', 'error'),
+            'backend': self.backend.name,
+            'model_path': self.model_path,
+            'version': self.model_version,
+            'error': self.model_error,
+            'timings_ms': dict(self.startup_timings),
+            'registry': None if self.registry is None else {
+                'root': self.registry.root,
+                'poll_interval': self.reload_interval,
+                'reloads': self.reloads,
+                'last_reload': self.last_reload,
+                'error': self.reload_error
+            }
+        }
+    
+    def preprocess_image(self, image_data: bytes, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Preprocess image for the model into a (1, 224, 224, 3) float32 batch"""
+        if out is None:
+            out = np.empty((1,) + self.preprocessor.output_shape, dtype=np.float32)
+        self.preprocessor.preprocess_into(image_data, out[0])
+        return out
+    
+    def _input_buffer(self) -> np.ndarray:
+        # One reusable input buffer per request thread; the caller blocks until
+        # its prediction is back, so the buffer is never shared while in use
+        buffer = getattr(self._local, 'input_buffer', None)
+        if buffer is None:
+            buffer = np.empty((1,) + self.preprocessor.output_shape, dtype=np.float32)
+            self._local.input_buffer = buffer
+        return buffer
     
     def extract_face(self, image: np.ndarray) -> Optional[np.ndarray]:
         """Extract face from the image using OpenCV"""
-        # Load face detector
-        face_cascade_path = os.path.join(os.path.dirname(__file__), 'models/haarcascade_frontalface_default.xml')
-        if not os.path.exists(face_cascade_path):
-            print(f"Cascade file not found at {face_cascade_path}, using full image")
+        if not self.face_detector.available:
             return None
-            
-        face_cascade = cv2.CascadeClassifier(face_cascade_path)
         
         # Convert to grayscale for face detection
         gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
         
-        # Detect faces
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        if len(faces) == 0:
-            print("No face detected, using full image")
+        # Detect the largest face
+        largest_face = self.face_detector.detect(gray)
+        if largest_face is None:
             return None
         
-        # Get the largest face
-        largest_area = 0
-        largest_face = None
-        
-        for (x, y, w, h) in faces:
-            if w * h > largest_area:
-                largest_area = w * h
-                largest_face = (x, y, w, h)
-        
-        if largest_face:
-            x, y, w, h = largest_face
-            face = image[y:y+h, x:x+w]
-            return cv2.resize(face, (224, 224))
-        
-        return None
+        x, y, w, h = largest_face
+        face = image[y:y+h, x:x+w]
+        return cv2.resize(face, (224, 224))
     
     def extract_features(self, image: np.ndarray) -> Dict[str, float]:
         """Extract features from face image for stress detection"""
@@ -112,55 +528,196 @@ class StressDetector:
     
     def detect_stress(self, image_data: bytes) -> Dict[str, Any]:
         """Detect stress from image data"""
-        if self.model is None:
+        if not self.load():
             # Return mock results if model isn't loaded
             return self._mock_detection()
             
+        cache_key = None
+        if self.result_cache.enabled:
+            cache_key = self.result_cache.key_for(image_data)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
             # Preprocess the image
-            preprocessed_image = self.preprocess_image(image_data)
+            preprocessed_image = self.preprocess_image(image_data, out=self._input_buffer())
             
-            # Run the model
-            prediction = self.model.predict(preprocessed_image)[0]
+            # Run the model as part of a micro-batch with other concurrent requests
+            prediction, model_version = self.batching_engine.submit(preprocessed_image[0])
+            prediction = float(np.ravel(prediction)[0])
             
             # Convert to stress score (0-100)
             # Assuming model returns probability of stress (0-1)
             stress_score = int(prediction * 100)
             
             # Determine stress level based on score
-            if stress_score < 25:
-                stress_level = "low"
-            elif stress_score < 50:
-                stress_level = "medium"
-            elif stress_score < 75:
-                stress_level = "high"
-            else:
-                stress_level = "severe"
+            stress_level = self.level_for_score(stress_score)
                 
-            return {
+            result = {
                 "stress_score": stress_score,
                 "stress_level": stress_level,
-                "confidence": float(prediction),
-                "analysis": self._get_analysis_for_level(stress_level)
+                "confidence": prediction,
+                "analysis": self._get_analysis_for_level(stress_level),
+                "model_version": model_version
             }
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
+            return result
             
         except Exception as e:
             print(f"Error detecting stress: {e}")
             # Fall back to mock detection
             return self._mock_detection()
     
-    def _mock_detection(self) -> Dict[str, Any]:
-        """Return mock detection results when model isn't available"""
-        stress_score = random.randint(0, 100)
+    def detect_stress_batch(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        """
+        Detect stress for several images with one forward pass. Returns one
+        result per input, in order; images that can't be decoded get
+        {"error": ...} instead.
+        """
+        if not self.load():
+            return [self._mock_detection() for _ in images]
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        keys: List[Optional[bytes]] = [None] * len(images)
+        pending = []
+        for index, image_data in enumerate(images):
+            if self.result_cache.enabled:
+                keys[index] = self.result_cache.key_for(image_data)
+                cached = self.result_cache.get(keys[index])
+                if cached is not None:
+                    results[index] = cached
+                    continue
+            pending.append(index)
+        
+        if pending:
+            batch = np.empty((len(pending),) + self.preprocessor.output_shape, dtype=np.float32)
+            decoded = []
+            for index in pending:
+                try:
+                    self.preprocessor.preprocess_into(images[index], batch[len(decoded)])
+                except ValueError as e:
+                    results[index] = {"error": str(e)}
+                    continue
+                decoded.append(index)
+            
+            if decoded:
+                try:
+                    predictions, model_version = self.batching_engine.submit_batch(batch[:len(decoded)])
+                    predictions = np.ravel(predictions)
+                except Exception as e:
+                    print(f"Error detecting stress for a batch: {e}")
+                    predictions = None
+                
+                for position, index in enumerate(decoded):
+                    if predictions is None:
+                        results[index] = self._mock_detection()
+                        continue
+                    prediction = float(predictions[position])
+                    stress_score = int(prediction * 100)
+                    stress_level = self.level_for_score(stress_score)
+                    results[index] = {
+                        "stress_score": stress_score,
+                        "stress_level": stress_level,
+                        "confidence": prediction,
+                        "analysis": self._get_analysis_for_level(stress_level),
+                        "model_version": model_version
+                    }
+                    if keys[index] is not None:
+                        self.result_cache.put(keys[index], results[index])
+        
+        return results
+    
+    def detect_stress_video(self, video_path: str) -> Dict[str, Any]:
+        """Detect stress across a video file by sampling frames and aggregating scores"""
+        if not self.load():
+            return self._mock_detection()
         
+        # The whole video is scored by one model version, even across a hot swap;
+        # its batches still run on the batching engine's thread
+        active = self._active
+        
+        def pinned(images: np.ndarray) -> Tuple[np.ndarray, str]:
+            return active.backend.predict(images), active.version
+        
+        def predict(images: np.ndarray) -> np.ndarray:
+            return self.batching_engine.submit_batch(images, pinned)[0]
+        
+        analyzer = VideoAnalyzer(self.preprocessor, predict, **self.video_config)
+        try:
+            video = analyzer.analyze(video_path)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Error detecting stress from video: {e}")
+            return self._mock_detection()
+        
+        stress_score = int(round(video['mean_score']))
+        stress_level = self.level_for_score(stress_score)
+        return {
+            "stress_score": stress_score,
+            "stress_level": stress_level,
+            "confidence": video['mean_confidence'],
+            "analysis": self._get_analysis_for_level(stress_level),
+            "model_version": active.version,
+            "video": video
+        }
+    
+    def predict_image(self, image: np.ndarray) -> float:
+        """Return the stress probability for one preprocessed (H, W, C) image"""
+        return self.predict_image_versioned(image)[0]
+    
+    def predict_image_versioned(self, image: np.ndarray) -> Tuple[float, Optional[str]]:
+        """Stress probability for one preprocessed image and the model version (None in mock mode)"""
+        if not self.load():
+            return random.uniform(0.0, 1.0), None
+        prediction, model_version = self.batching_engine.submit(image)
+        return float(np.ravel(prediction)[0]), model_version
+    
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        """Stress probabilities for a stacked (N, H, W, C) batch, run as one forward pass on the batching engine"""
+        if not self.load():
+            raise RuntimeError("No stress model is loaded")
+        return np.ravel(self._predict_batch(images))
+    
+    @staticmethod
+    def level_for_score(stress_score: int) -> str:
+        """Map a 0-100 score onto the stress level buckets"""
         if stress_score < 25:
-            stress_level = "low"
+            return "low"
         elif stress_score < 50:
-            stress_level = "medium"  
+            return "medium"
         elif stress_score < 75:
-            stress_level = "high"
+            return "high"
+        return "severe"
+    
+    def _predict_versioned(self, images: np.ndarray) -> Tuple[np.ndarray, str]:
+        """Run one forward pass; returns the predictions and the model version that made them"""
+        active = self._active
+        return active.backend.predict(images), active.version
+    
+    def _predict_batch(self, images: np.ndarray) -> np.ndarray:
+        """Run one forward pass over a stacked batch of preprocessed images on the batching engine's thread"""
+        return self.batching_engine.submit_batch(images)[0]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return inference counters (empty in mock mode)"""
+        stats = {
+            'model': self.get_model_status(),
+            'face_detection': self.face_detector.get_stats(),
+            'result_cache': self.result_cache.get_stats()
+        }
+        if self.batching_engine is None:
+            stats['mock'] = True
         else:
-            stress_level = "severe"
+            stats['batching'] = self.batching_engine.get_stats()
+        return stats
+    
+    def _mock_detection(self) -> Dict[str, Any]:
+        """Return mock detection results when model isn't available"""
+        stress_score = random.randint(0, 100)
+        stress_level = self.level_for_score(stress_score)
             
         return {
             "stress_score": stress_score,
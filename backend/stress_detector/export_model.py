@@ -0,0 +1,235 @@
+"""
+Export the trained Keras model to TensorFlow Lite for serving.
+
+Quantization options:
+
+  none      float32 weights (a straight conversion)
+  float16   float16 weights, float32 compute; about half the size
+  dynamic   int8 weights, activations quantized on the fly
+  int8      int8 weights and activations, calibrated on a sample of the
+            training images (float32 input/output so the serving code is
+            unchanged)
+
+Calibration and comparison images go through the same decode/face-crop/
+resize path as served requests, so quantization ranges match real inputs.
+
+The model defaults to the .h5 of the registry's active version (or the
+legacy models/stress_detection_model.h5 if nothing is active). Registry
+versions are immutable, so the .tflite is then written next to the other
+models rather than into the version; publish both files to register it.
+
+--compare runs the .h5 model and the exported file on a labelled sample, each
+in a fresh process, and reports accuracy, agreement, the largest score
+difference, batch-1 latency and peak RSS.
+
+Usage (from the backend directory):
+    python -m stress_detector.export_model [--quantize int8] [--compare]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from typing import List, Tuple
+
+import numpy as np
+
+from .model_registry import resolve_active_artifact
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(BASE_DIR, 'data', 'stress_images')
+MODELS_DIR = os.path.join(BASE_DIR, 'stress_detector', 'models')
+# Used when the registry has no active version
+LEGACY_MODEL = os.path.join(MODELS_DIR, 'stress_detection_model.h5')
+
+# Same layout as train_model.prepare_data; the label is 1 for 'stressed'
+CLASS_DIRS = {'not_stressed': 0, 'stressed': 1}
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+COMPARE_CHILD = """
+import json, resource, sys, time
+import numpy as np
+sys.path.insert(0, sys.argv[4])
+from stress_detector.backends import create_backend
+backend = create_backend(sys.argv[1], sys.argv[2])
+backend.load()
+images = np.load(sys.argv[3])
+scores = []
+latencies = []
+for i in range(len(images)):
+    started = time.perf_counter()
+    scores.append(float(backend.predict(images[i:i + 1])[0][0]))
+    latencies.append((time.perf_counter() - started) * 1000.0)
+# Skip the first call, which includes one-off setup
+latencies = sorted(latencies[1:] or latencies)
+print(json.dumps({
+    'scores': scores,
+    'load_ms': backend.timings.get('load_ms'),
+    'p50_ms': latencies[len(latencies) // 2],
+    'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+}))
+"""
+
+
+def list_samples(data_dir: str, limit: int, seed: int = 0) -> List[Tuple[str, int]]:
+    """A shuffled, class-balanced sample of (path, label) from the training directory"""
+    per_class = {}
+    for class_name, label in CLASS_DIRS.items():
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        per_class[label] = sorted(
+            os.path.join(class_dir, name) for name in os.listdir(class_dir)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+
+    rng = random.Random(seed)
+    samples = []
+    for label, paths in per_class.items():
+        rng.shuffle(paths)
+        samples.extend((path, label) for path in paths[:max(1, limit // max(1, len(per_class)))])
+    rng.shuffle(samples)
+    return samples
+
+
+def load_samples(samples: List[Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Preprocess sample images exactly as the detector does at serving time"""
+    from .face_detector import get_face_detector
+    from .preprocessing import ImagePreprocessor
+
+    preprocessor = ImagePreprocessor(get_face_detector())
+    images = []
+    labels = []
+    for path, label in samples:
+        with open(path, 'rb') as f:
+            data = f.read()
+        out = np.empty(preprocessor.output_shape, dtype=np.float32)
+        try:
+            preprocessor.preprocess_into(data, out)
+        except ValueError:
+            print(f"Skipping unreadable image {path}")
+            continue
+        images.append(out)
+        labels.append(label)
+    if not images:
+        raise ValueError("No usable sample images found")
+    return np.stack(images), np.array(labels)
+
+
+def export_tflite(model_path: str, output_path: str, quantize: str = 'none',
+                  calibration: np.ndarray = None) -> int:
+    """Convert the Keras model and write it to output_path; returns the file size in bytes"""
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'dynamic':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantize == 'int8':
+        if calibration is None or not len(calibration):
+            raise ValueError("int8 quantization needs calibration images")
+
+        def representative_dataset():
+            for image in calibration:
+                yield [image[np.newaxis]]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantize != 'none':
+        raise ValueError(f"Unknown quantization: {quantize}")
+
+    tflite_model = converter.convert()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    return len(tflite_model)
+
+
+def run_backend(backend: str, model_path: str, images_path: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', COMPARE_CHILD, backend, model_path, images_path, BASE_DIR],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(keras_path: str, tflite_path: str, images: np.ndarray, labels: np.ndarray) -> dict:
+    """Run both artifacts on the same inputs and summarise parity and cost"""
+    with tempfile.TemporaryDirectory() as tmp:
+        images_path = os.path.join(tmp, 'images.npy')
+        np.save(images_path, images)
+        reference = run_backend('keras', keras_path, images_path)
+        candidate = run_backend('tflite', tflite_path, images_path)
+
+    reference_scores = np.array(reference.pop('scores'))
+    candidate_scores = np.array(candidate.pop('scores'))
+    reference_labels = reference_scores > 0.5
+    candidate_labels = candidate_scores > 0.5
+
+    return {
+        'samples': int(len(labels)),
+        'keras': dict(reference, accuracy=float(np.mean(reference_labels == labels)),
+                      size_mb=os.path.getsize(keras_path) / 1e6),
+        'tflite': dict(candidate, accuracy=float(np.mean(candidate_labels == labels)),
+                       size_mb=os.path.getsize(tflite_path) / 1e6),
+        'agreement': float(np.mean(reference_labels == candidate_labels)),
+        'max_score_diff': float(np.max(np.abs(reference_scores - candidate_scores))),
+        'mean_score_diff': float(np.mean(np.abs(reference_scores - candidate_scores)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the stress model to TensorFlow Lite")
+    parser.add_argument('--model', help="Trained Keras .h5 model (defaults to the registry's active version)")
+    parser.add_argument('--output', help="Output .tflite path (defaults to the model path with .tflite, or "
+                                         "models/stress_detection_model-<version>.tflite for a registry model)")
+    parser.add_argument('--quantize', choices=['none', 'float16', 'dynamic', 'int8'], default='none')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Training images for calibration/comparison")
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--compare', action='store_true', help="Check accuracy parity, latency and RSS against the .h5")
+    parser.add_argument('--compare-samples', type=int, default=200)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help="Exit non-zero if the exported model loses more accuracy than this")
+    args = parser.parse_args()
+
+    output = args.output
+    if args.model is None:
+        try:
+            args.model = resolve_active_artifact('keras')
+        except ValueError as e:
+            raise SystemExit(str(e))
+        if args.model is None:
+            args.model = LEGACY_MODEL
+        elif output is None:
+            version = os.path.basename(os.path.dirname(args.model))
+            output = os.path.join(MODELS_DIR, f"stress_detection_model-{version}.tflite")
+    output = output or os.path.splitext(args.model)[0] + '.tflite'
+
+    calibration = None
+    if args.quantize == 'int8':
+        calibration, _ = load_samples(list_samples(args.data_dir, args.calibration_samples, seed=1))
+        print(f"Calibrating on {len(calibration)} images from {args.data_dir}")
+
+    size = export_tflite(args.model, output, args.quantize, calibration)
+    print(f"Wrote {output} ({size / 1e6:.1f} MB, quantize={args.quantize})")
+
+    if args.compare:
+        images, labels = load_samples(list_samples(args.data_dir, args.compare_samples, seed=2))
+        report = compare(args.model, output, images, labels)
+        print(json.dumps(report, indent=2))
+        drop = report['keras']['accuracy'] - report['tflite']['accuracy']
+        if drop > args.max_accuracy_drop:
+            print(f"Accuracy dropped by {drop:.3f} (limit {args.max_accuracy_drop})")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
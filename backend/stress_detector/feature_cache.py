@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+def file_content_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Pooled backbone features for training images, stored in a memory-mapped
+    float32 file with a JSON index.
+
+    Each row is keyed by image path and content hash. A file whose size and
+    mtime are unchanged is trusted without rehashing; otherwise it is
+    rehashed, and its features are recomputed only if the content really
+    changed. Files are namespaced by backbone_id (a hash of the frozen
+    backbone's weights) and by precision (the dtype policy the features were
+    computed under), so new weights or a switch between float32 and
+    mixed_bfloat16 start a fresh cache instead of reusing stale features.
+    """
+
+    def __init__(self, cache_dir: str, backbone_id: str, dim: int = 1280, precision: str = 'float32'):
+        self.cache_dir = cache_dir
+        self.backbone_id = backbone_id
+        self.precision = precision
+        self.dim = dim
+        os.makedirs(cache_dir, exist_ok=True)
+        namespace = f"{backbone_id}-{precision}"
+        self.data_path = os.path.join(cache_dir, f"features-{namespace}.f32")
+        self.index_path = os.path.join(cache_dir, f"features-{namespace}.json")
+
+        self._entries: Dict[str, List[Any]] = {}
+        self._rows = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('dim') == dim:
+                self._entries = index['entries']
+                self._rows = index['rows']
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+    def _open(self, rows: int) -> np.memmap:
+        # Grow the backing file first; np.memmap can't extend an existing file in r+ mode
+        needed = rows * self.dim * 4
+        with open(self.data_path, 'ab') as f:
+            if f.tell() < needed:
+                f.truncate(needed)
+        return np.memmap(self.data_path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+
+    def _save_index(self):
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'rows': self._rows, 'entries': self._entries}, f)
+        os.replace(tmp, self.index_path)
+
+    def _lookup(self, path: str) -> Any:
+        """Return (row, fresh) for a path; row is None for a new path"""
+        st = os.stat(path)
+        entry = self._entries.get(path)
+        if entry is not None and entry[1] == st.st_size and entry[2] == st.st_mtime_ns:
+            return entry[0], True
+        content_hash = file_content_hash(path)
+        self._dirty = True
+        if entry is not None and entry[3] == content_hash:
+            entry[1], entry[2] = st.st_size, st.st_mtime_ns
+            return entry[0], True
+        row = entry[0] if entry is not None else None
+        self._entries[path] = [row, st.st_size, st.st_mtime_ns, content_hash]
+        return row, False
+
+    def features_for(self, paths: List[str], extract: Callable[[List[str]], np.ndarray],
+                     batch_size: int = 64) -> np.ndarray:
+        """
+        Return an (N, dim) array of features for paths, in order, running
+        extract(list_of_paths) -> (n, dim) only for images not cached yet.
+        """
+        if not paths:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        rows = []
+        stale = []
+        for path in paths:
+            row, fresh = self._lookup(path)
+            if row is None:
+                row = self._rows
+                self._rows += 1
+                self._entries[path][0] = row
+            rows.append(row)
+            if not fresh:
+                stale.append((path, row))
+
+        self.hits += len(paths) - len(stale)
+        self.misses += len(stale)
+        features = self._open(self._rows)
+        for start in range(0, len(stale), batch_size):
+            chunk = stale[start:start + batch_size]
+            features[[row for _, row in chunk]] = extract([path for path, _ in chunk])
+            print(f"Extracted features for {min(start + batch_size, len(stale))}/{len(stale)} images")
+        features.flush()
+        # The index is only written once the rows it points to are on disk, and
+        # not at all for pure reads, so concurrent sweep trials don't rewrite it
+        if self._dirty:
+            self._save_index()
+            self._dirty = False
+
+        result = np.array(features[rows])
+        del features
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backbone_id': self.backbone_id,
+            'rows': self._rows,
+            'hits': self.hits,
+            'misses': self.misses
+        }
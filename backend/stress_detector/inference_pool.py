@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .metrics import LatencyTracker
+
+# Detector owned by a process-pool child; created by _init_process
+_process_detector = None
+
+
+class InferenceTimeout(TimeoutError):
+    """An inference call did not finish within the pool's timeout"""
+
+
+def _init_process(detector_config: Dict[str, Any], threads: Optional[int], ready_count):
+    global _process_detector
+    if threads:
+        # Keep each child from spinning up one BLAS/TF thread per core
+        for name in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+            os.environ.setdefault(name, str(threads))
+    from .detector import StressDetector
+    _process_detector = StressDetector(**detector_config)
+    _process_detector.warm_up()
+    with ready_count.get_lock():
+        ready_count.value += 1
+
+
+def _process_ping() -> int:
+    return os.getpid()
+
+
+def _process_detect_image(image_data: bytes) -> Dict[str, Any]:
+    return _process_detector.detect_stress(image_data)
+
+
+def _process_detect_batch(images: List[bytes]) -> List[Dict[str, Any]]:
+    return _process_detector.detect_stress_batch(images)
+
+
+def _process_detect_video(video_path: str) -> Dict[str, Any]:
+    return _process_detector.detect_stress_video(video_path)
+
+
+def _process_predict_image(image) -> Tuple[float, Optional[str]]:
+    return _process_detector.predict_image_versioned(image)
+
+
+class InferencePool:
+    """
+    Runs decode/preprocess/predict off the request threads.
+
+    mode='thread' shares one in-process StressDetector between a fixed number
+    of threads, so concurrent requests still meet in the micro-batching
+    engine. mode='process' starts worker processes (spawned, never forked from
+    a process that has TensorFlow loaded), each with its own detector, which
+    sidesteps the GIL for the Python-heavy preprocessing at the cost of one
+    model copy per process. Either way request threads only wait on a future,
+    and the pool size caps how much CPU inference can take from I/O-bound
+    endpoints.
+
+    Process mode starts its processes right away and counts those whose
+    initializer has finished loading and warming the model (see readiness).
+    A call that takes longer than timeout raises InferenceTimeout.
+    """
+
+    def __init__(self, detector_factory: Callable[[], Any], detector_config: Dict[str, Any] = None,
+                 mode: str = 'thread', workers: int = None, threads_per_process: int = None,
+                 timeout: float = 60.0):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown inference pool mode: {mode}")
+
+        self.mode = mode
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.timeout = timeout
+        self._detector_factory = detector_factory
+
+        self._ready_count = None
+        self._started: List[Future] = []
+        if mode == 'process':
+            context = multiprocessing.get_context('spawn')
+            self._ready_count = context.Value('i', 0)
+            self._executor: Executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_process,
+                initargs=(detector_config or {}, threads_per_process, self._ready_count)
+            )
+            # Processes are spawned on demand; one ping each starts them all now,
+            # so they load the model before traffic arrives
+            self._started = [self._executor.submit(_process_ping) for _ in range(self.workers)]
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='stress-inference')
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._latency = LatencyTracker()
+
+    def _run(self, fn: Callable, *args) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Don't run it later if it is still queued; nobody is waiting for it
+            future.cancel()
+            with self._lock:
+                self._failed += 1
+            raise InferenceTimeout(f"Inference did not finish within {self.timeout:g}s")
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._completed += 1
+        self._latency.record((time.perf_counter() - started) * 1000.0)
+        return result
+
+    def detect_stress(self, image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        if self.mode == 'process':
+            # Buffers and views can't be pickled; this is the one copy process mode needs
+            return self._run(_process_detect_image, bytes(image_data))
+        return self._run(lambda data: self._detector_factory().detect_stress(data), image_data)
+
+    def detect_stress_batch(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        if self.mode == 'process':
+            return self._run(_process_detect_batch, [bytes(image) for image in images])
+        return self._run(lambda batch: self._detector_factory().detect_stress_batch(batch), images)
+
+    def detect_stress_video(self, video_path: str) -> Dict[str, Any]:
+        if self.mode == 'process':
+            return self._run(_process_detect_video, video_path)
+        return self._run(lambda path: self._detector_factory().detect_stress_video(path), video_path)
+
+    def predict_image(self, image) -> Tuple[float, Optional[str]]:
+        """(confidence, model version) for one already preprocessed (H, W, C) image"""
+        if self.mode == 'process':
+            return self._run(_process_predict_image, image)
+        return self._run(lambda data: self._detector_factory().predict_image_versioned(data), image)
+
+    def readiness(self) -> Dict[str, Any]:
+        """Process mode: how many inference processes have loaded and warmed the model"""
+        ready = self._ready_count.value if self._ready_count is not None else 0
+        status = {'workers': self.workers, 'workers_ready': ready, 'ready': ready >= self.workers}
+        for started in self._started:
+            if started.done() and started.exception() is not None:
+                # An initializer failed, which breaks the whole process pool
+                status.update(ready=False, error=str(started.exception()))
+                break
+        return status
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                'mode': self.mode,
+                'workers': self.workers,
+                'pending': self._pending,
+                'completed': self._completed,
+                'failed': self._failed
+            }
+        stats['latency_ms'] = self._latency.summary()
+        return stats
@@ -0,0 +1,38 @@
+import threading
+from collections import deque
+from typing import Dict, Iterable
+
+
+def summarize(samples: Iterable[float]) -> Dict[str, float]:
+    """Return avg/p50/p99/max for a collection of latency samples"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'avg': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+    return {
+        'avg': sum(ordered) / len(ordered),
+        'p50': ordered[int(0.50 * (len(ordered) - 1))],
+        'p99': ordered[int(0.99 * (len(ordered) - 1))],
+        'max': ordered[-1]
+    }
+
+
+class LatencyTracker:
+    """Thread-safe rolling window of latency samples in milliseconds"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self._count = 0
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+            self._count += 1
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = list(self._samples)
+            count = self._count
+        stats = summarize(samples)
+        stats['count'] = count
+        return stats
@@ -0,0 +1,212 @@
+"""
+Local registry of trained stress models.
+
+Each published version is an immutable directory holding its artifacts and a
+manifest with their SHA-256 checksums, plus whatever metadata training
+recorded (metrics, data fingerprint, ...). A one-line ACTIVE file names the
+version that should be served; serving workers poll it and hot-swap when it
+changes (see StressDetector), so deploying or rolling back is just:
+
+    registry/
+      ACTIVE                  "v0003"
+      versions/
+        v0001/ model.h5  manifest.json
+        v0003/ model.h5  model.tflite  manifest.json
+
+Usage (from the backend directory):
+    python -m stress_detector.model_registry list
+    python -m stress_detector.model_registry publish model.h5 [model.tflite] [--activate]
+    python -m stress_detector.model_registry activate v0002
+    python -m stress_detector.model_registry verify [v0002]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Any, Dict, List, Optional
+
+# No heavy imports here: app.py reads DEFAULT_REGISTRY_DIR at startup
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(__file__), 'models', 'registry')
+
+# Artifact file name inside a version, per backend
+ARTIFACT_NAMES = {
+    'keras': 'model.h5',
+    'graph': 'model.h5',
+    'tflite': 'model.tflite',
+}
+
+_VERSION = re.compile(r'^v(\d+)$')
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Versioned, checksummed model artifacts with an "active" pointer"""
+
+    def __init__(self, root: str = DEFAULT_REGISTRY_DIR):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.active_path = os.path.join(root, 'ACTIVE')
+
+    def versions(self) -> List[str]:
+        """Published versions, oldest first"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        found = [name for name in os.listdir(self.versions_dir) if _VERSION.match(name)]
+        return sorted(found, key=lambda name: int(_VERSION.match(name).group(1)))
+
+    def version_dir(self, version: str) -> str:
+        if not _VERSION.match(version or ''):
+            raise ValueError(f"Invalid model version: {version!r}")
+        return os.path.join(self.versions_dir, version)
+
+    def manifest(self, version: str) -> Dict[str, Any]:
+        path = os.path.join(self.version_dir(version), 'manifest.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Unknown model version: {version}")
+
+    def artifact_path(self, version: str, backend: str) -> str:
+        """Path of the artifact a backend loads; ValueError if the version doesn't have one"""
+        name = ARTIFACT_NAMES.get(backend)
+        if name is None:
+            raise ValueError(f"Unknown model backend: {backend}")
+        if name not in self.manifest(version)['artifacts']:
+            raise ValueError(f"Model version {version} has no {name} for the {backend} backend")
+        return os.path.join(self.version_dir(version), name)
+
+    def verify(self, version: str, name: str = None):
+        """Check artifact checksums (all of them, or just name); ValueError on mismatch"""
+        artifacts = self.manifest(version)['artifacts']
+        for artifact, expected in artifacts.items():
+            if name is not None and artifact != name:
+                continue
+            actual = file_sha256(os.path.join(self.version_dir(version), artifact))
+            if actual != expected['sha256']:
+                raise ValueError(f"Checksum mismatch for {version}/{artifact}")
+
+    def active_version(self) -> Optional[str]:
+        try:
+            with open(self.active_path, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def activate(self, version: str):
+        """Point ACTIVE at a published version; serving workers pick it up on their next poll"""
+        self.manifest(version)
+        tmp = f"{self.active_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(version + '\n')
+        os.replace(tmp, self.active_path)
+
+    def publish(self, files: List[str], metadata: Dict[str, Any] = None) -> str:
+        """
+        Copy model files (.h5 and/or .tflite) into a new version and return its
+        name. The version directory only appears once it is complete.
+        """
+        artifacts = {}
+        for path in files:
+            extension = os.path.splitext(path)[1]
+            name = 'model' + extension
+            if name not in ARTIFACT_NAMES.values():
+                raise ValueError(f"Unsupported model file: {path}")
+            artifacts[name] = path
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = os.path.join(self.versions_dir, f".staging-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        manifest = {
+            'created_at': datetime.datetime.now().replace(microsecond=0).isoformat(),
+            'artifacts': {},
+            'metadata': metadata or {}
+        }
+        for name, source in artifacts.items():
+            target = os.path.join(staging, name)
+            shutil.copyfile(source, target)
+            manifest['artifacts'][name] = {'sha256': file_sha256(target), 'bytes': os.path.getsize(target)}
+
+        # Another publisher may claim the same number first; take the next one
+        while True:
+            existing = self.versions()
+            number = int(_VERSION.match(existing[-1]).group(1)) + 1 if existing else 1
+            version = f"v{number:04d}"
+            manifest['version'] = version
+            with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            try:
+                os.rename(staging, os.path.join(self.versions_dir, version))
+                return version
+            except OSError:
+                if not os.path.exists(os.path.join(self.versions_dir, version)):
+                    raise
+
+
+def resolve_active_artifact(backend: str = 'keras', root: str = None) -> Optional[str]:
+    """
+    Path of the active version's artifact for a backend, or None if nothing is
+    active. The registry defaults to STRESS_MODEL_REGISTRY, as for serving.
+    """
+    registry = ModelRegistry(root or os.environ.get('STRESS_MODEL_REGISTRY') or DEFAULT_REGISTRY_DIR)
+    version = registry.active_version()
+    if version is None:
+        return None
+    return registry.artifact_path(version, backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local model registry")
+    parser.add_argument('--registry', default=os.environ.get('STRESS_MODEL_REGISTRY') or DEFAULT_REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List versions")
+    publish = commands.add_parser('publish', help="Publish model files as a new version")
+    publish.add_argument('files', nargs='+', help=".h5 and/or .tflite files")
+    publish.add_argument('--activate', action='store_true', help="Also make it the active version")
+    activate = commands.add_parser('activate', help="Serve a version (also used to roll back)")
+    activate.add_argument('version')
+    verify = commands.add_parser('verify', help="Check artifact checksums")
+    verify.add_argument('version', nargs='?', help="Defaults to the active version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == 'list':
+            active = registry.active_version()
+            for version in registry.versions():
+                manifest = registry.manifest(version)
+                marker = '*' if version == active else ' '
+                metrics = ', '.join(f"{k}={v}" for k, v in manifest['metadata'].items() if isinstance(v, (int, float)))
+                print(f"{marker} {version}  {manifest['created_at']}  {' '.join(manifest['artifacts'])}  {metrics}")
+        elif args.command == 'publish':
+            version = registry.publish(args.files)
+            print(f"Published {version}")
+            if args.activate:
+                registry.activate(version)
+                print(f"Activated {version}")
+        elif args.command == 'activate':
+            registry.activate(args.version)
+            print(f"Activated {args.version}")
+        elif args.command == 'verify':
+            version = args.version or registry.active_version()
+            if version is None:
+                raise ValueError("No active version")
+            registry.verify(version)
+            print(f"{version}: checksums OK")
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == '__main__':
+    main()
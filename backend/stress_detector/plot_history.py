@@ -0,0 +1,58 @@
+"""
+Plot a training history saved by train_model.
+
+Runs in its own process so the training process never imports matplotlib.
+
+Usage (from the backend directory):
+    python -m stress_detector.plot_history outputs/training_history.json
+"""
+import json
+import os
+import sys
+from typing import Dict, List
+
+
+def plot_training_history(history: Dict[str, List[float]], title: str, output_path: str):
+    """Plot accuracy and loss curves and save them as a PNG"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(12, 4))
+
+    # Plot accuracy
+    plt.subplot(1, 2, 1)
+    plt.plot(history['accuracy'])
+    plt.plot(history['val_accuracy'])
+    plt.title(f'{title} - Accuracy')
+    plt.ylabel('Accuracy')
+    plt.xlabel('Epoch')
+    plt.legend(['Train', 'Validation'], loc='upper left')
+
+    # Plot loss
+    plt.subplot(1, 2, 2)
+    plt.plot(history['loss'])
+    plt.plot(history['val_loss'])
+    plt.title(f'{title} - Loss')
+    plt.ylabel('Loss')
+    plt.xlabel('Epoch')
+    plt.legend(['Train', 'Validation'], loc='upper left')
+
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python -m stress_detector.plot_history <history.json>")
+    path = sys.argv[1]
+    with open(path, encoding='utf-8') as f:
+        saved = json.load(f)
+    output_path = os.path.splitext(path)[0] + '.png'
+    plot_training_history(saved['history'], saved['title'], output_path)
+    print(f"Saved {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import cv2
+import numpy as np
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+from .face_detector import FaceDetector
+
+# cv2.IMREAD_REDUCED_* flags, largest reduction first
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_image_size(image_data: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a PNG or JPEG header without decoding the pixels"""
+    data = memoryview(image_data)
+
+    if len(data) >= 24 and data[:8] == b'\x89PNG\r\n\x1a\n':
+        width, height = struct.unpack('>II', data[16:24])
+        return width, height
+
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    offset = 2
+    while offset + 9 < len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+
+    return None
+
+
+class ImagePreprocessor:
+    """
+    Turns encoded image bytes into a normalized float32 model input.
+
+    The face is located on a small grayscale proxy of the decoded frame and
+    then cropped from the full-resolution image, so detection stays cheap
+    without throwing away face detail. The crop is resized once and written
+    straight into a caller-supplied float32 slot (e.g. a row of a batch
+    buffer), avoiding intermediate full-frame copies and float64 math.
+    """
+
+    def __init__(self, face_detector: FaceDetector, input_size: int = 224, detect_max_side: int = 480,
+                 reduced_decode_min_side: Optional[int] = 896):
+        self.face_detector = face_detector
+        self.input_size = input_size
+        self.detect_max_side = detect_max_side
+        # Large uploads are decoded with IMREAD_REDUCED_* as long as the
+        # shorter side stays at or above this many pixels (None disables it)
+        self.reduced_decode_min_side = reduced_decode_min_side
+        self._scale = np.float32(1.0 / 255.0)
+
+    @property
+    def output_shape(self) -> Tuple[int, int, int]:
+        return (self.input_size, self.input_size, 3)
+
+    def _decode_flag(self, image_data: bytes) -> int:
+        if not self.reduced_decode_min_side:
+            return cv2.IMREAD_COLOR
+        size = read_image_size(image_data)
+        if size is None:
+            return cv2.IMREAD_COLOR
+        short_side = min(size)
+        for factor, flag in _REDUCED_DECODE_FLAGS:
+            if short_side // factor >= self.reduced_decode_min_side:
+                return flag
+        return cv2.IMREAD_COLOR
+
+    def decode(self, image_data: bytes) -> np.ndarray:
+        """Decode bytes to a BGR image, using a reduced decode for large uploads"""
+        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), self._decode_flag(image_data))
+        if image is None:
+            raise ValueError("Could not decode image data")
+        return image
+
+    def locate_face(self, image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Find the largest face in a BGR frame, in full-resolution coordinates"""
+        if not self.face_detector.available:
+            return None
+
+        height, width = image.shape[:2]
+        scale = min(1.0, self.detect_max_side / float(max(height, width)))
+        if scale < 1.0:
+            proxy = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            proxy = image
+        gray = cv2.cvtColor(proxy, cv2.COLOR_BGR2GRAY)
+
+        face = self.face_detector.detect(gray)
+        if face is None:
+            return None
+
+        x, y, w, h = (int(round(v / scale)) for v in face)
+        x, y = max(0, x), max(0, y)
+        return x, y, min(w, width - x), min(h, height - y)
+
+    def preprocess_frame_into(self, image: np.ndarray, out: np.ndarray,
+                              face: Optional[Tuple[int, int, int, int]] = None,
+                              timings: Optional[Dict[str, float]] = None,
+                              detect: bool = True) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Write an already-decoded BGR frame into out (input_size x input_size x 3 float32).
+
+        If face is given it is used as the crop region instead of running the
+        detector. Returns the face box that was used, or None for the full frame.
+        """
+        started = time.perf_counter()
+        if face is None and detect:
+            face = self.locate_face(image)
+        detected = time.perf_counter()
+
+        # Crop is a view into the full-resolution frame, not a copy
+        if face is not None:
+            x, y, w, h = face
+            region = image[y:y+h, x:x+w]
+        else:
+            region = image
+        resized = cv2.resize(region, (self.input_size, self.input_size), interpolation=cv2.INTER_AREA)
+        cropped = time.perf_counter()
+
+        # BGR -> RGB via a reversed-channel view and normalize to [0, 1] in one pass
+        np.multiply(resized[..., ::-1], self._scale, out=out)
+        normalized = time.perf_counter()
+
+        if timings is not None:
+            timings['detect'] = timings.get('detect', 0.0) + (detected - started) * 1000.0
+            timings['crop_resize'] = timings.get('crop_resize', 0.0) + (cropped - detected) * 1000.0
+            timings['normalize'] = timings.get('normalize', 0.0) + (normalized - cropped) * 1000.0
+
+        return face
+
+    def preprocess_into(self, image_data: bytes, out: np.ndarray,
+                        timings: Optional[Dict[str, float]] = None) -> Optional[Tuple[int, int, int, int]]:
+        """Decode, locate the face and write the model input into out"""
+        started = time.perf_counter()
+        image = self.decode(image_data)
+        if timings is not None:
+            timings['decode'] = timings.get('decode', 0.0) + (time.perf_counter() - started) * 1000.0
+        return self.preprocess_frame_into(image, out, timings=timings)
@@ -0,0 +1,233 @@
+import cv2
+import numpy as np
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .detector import StressDetector
+
+
+class RealtimeSession:
+    """
+    State for one realtime camera stream.
+
+    Each incoming frame is compared with the last frame that was actually
+    scored using the mean absolute difference of tiny grayscale thumbnails;
+    near-identical frames reuse the previous score. The last face box is
+    reused as the crop for following frames and only re-checked (inside a
+    padded region around it) every redetect_every scored frames. Scores are
+    smoothed with an EWMA and folded into per-interval summaries, which the
+    caller persists as a single stress record.
+
+    Decoding and face tracking use preprocessor in this process; only the
+    forward pass goes through predict_fn(image) -> (confidence, model_version),
+    so sessions share whatever runs inference (e.g. the inference pool).
+    """
+
+    THUMB_SIZE = (32, 32)
+
+    def __init__(self, session_id: str, user_id: str, preprocessor,
+                 predict_fn: Callable[[np.ndarray], Tuple[float, Optional[str]]], diff_threshold: float = 4.0,
+                 ewma_alpha: float = 0.3, summary_interval: float = 30.0,
+                 redetect_every: int = 15, roi_padding: float = 0.25):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.preprocessor = preprocessor
+        self.predict_fn = predict_fn
+        self.diff_threshold = diff_threshold
+        self.ewma_alpha = ewma_alpha
+        self.summary_interval = summary_interval
+        self.redetect_every = max(1, redetect_every)
+        self.roi_padding = roi_padding
+
+        # Held by the stream feeding this session; close() only sets cancelled,
+        # which the stream checks between frames
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+        self._input = np.empty((1,) + preprocessor.output_shape, dtype=np.float32)
+        self._last_thumb = None
+        self._face = None
+        self._frames_since_detect = 0
+
+        self.smoothed_score = None
+        self.last_score = None
+        self.last_confidence = None
+        self.model_version = None
+
+        self.frames_received = 0
+        self.frames_scored = 0
+        self._reset_interval()
+
+    def _reset_interval(self):
+        self._interval_started = time.time()
+        self._interval_frames = 0
+        self._interval_skipped = 0
+        self._interval_total = 0.0
+        self._interval_max = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _track_face(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        preprocessor = self.preprocessor
+        if self._face is not None and self._frames_since_detect < self.redetect_every:
+            self._frames_since_detect += 1
+            return self._face
+
+        self._frames_since_detect = 0
+        face = None
+        if self._face is not None:
+            # Search only a padded window around the previous face first
+            height, width = frame.shape[:2]
+            x, y, w, h = self._face
+            pad_x, pad_y = int(w * self.roi_padding), int(h * self.roi_padding)
+            left, top = max(0, x - pad_x), max(0, y - pad_y)
+            right, bottom = min(width, x + w + pad_x), min(height, y + h + pad_y)
+            found = preprocessor.locate_face(frame[top:bottom, left:right])
+            if found is not None:
+                fx, fy, fw, fh = found
+                face = (fx + left, fy + top, fw, fh)
+
+        if face is None:
+            face = preprocessor.locate_face(frame)
+
+        self._face = face
+        return face
+
+    def process_frame(self, image_data: bytes) -> Dict[str, Any]:
+        """Score one encoded frame, skipping inference when it barely changed"""
+        frame = self.preprocessor.decode(image_data)
+        self.last_seen = time.time()
+        self.frames_received += 1
+
+        thumb = self._thumbnail(frame)
+        difference = None
+        if self._last_thumb is not None:
+            difference = float(cv2.mean(cv2.absdiff(thumb, self._last_thumb))[0])
+
+        skipped = difference is not None and difference < self.diff_threshold
+        if not skipped:
+            face = self._track_face(frame)
+            self.preprocessor.preprocess_frame_into(frame, self._input[0], face=face, detect=False)
+            confidence, self.model_version = self.predict_fn(self._input[0])
+            self.last_confidence = confidence
+            self.last_score = min(100, max(0, int(confidence * 100)))
+            if self.smoothed_score is None:
+                self.smoothed_score = float(self.last_score)
+            else:
+                self.smoothed_score = (self.ewma_alpha * self.last_score
+                                       + (1.0 - self.ewma_alpha) * self.smoothed_score)
+            self._last_thumb = thumb
+            self.frames_scored += 1
+        else:
+            self._interval_skipped += 1
+
+        self._interval_frames += 1
+        self._interval_total += self.smoothed_score
+        self._interval_max = max(self._interval_max, self.last_score)
+
+        smoothed = int(round(self.smoothed_score))
+        return {
+            'frame': self.frames_received,
+            'skipped': skipped,
+            'difference': difference,
+            'face': self._face is not None,
+            'stress_score': smoothed,
+            'stress_level': StressDetector.level_for_score(smoothed),
+            'raw_score': self.last_score,
+            'confidence': self.last_confidence
+        }
+
+    def summary_due(self) -> bool:
+        return (self._interval_frames > 0
+                and time.time() - self._interval_started >= self.summary_interval)
+
+    def pop_summary(self) -> Optional[Dict[str, Any]]:
+        """Return the aggregate for the current interval and start a new one"""
+        if self._interval_frames == 0:
+            return None
+
+        score = int(round(self._interval_total / self._interval_frames))
+        summary = {
+            'stress_score': score,
+            'stress_level': StressDetector.level_for_score(score),
+            'notes': (f"Realtime session {self.session_id}: {self._interval_frames} frames "
+                      f"({self._interval_skipped} unchanged), max {self._interval_max}, "
+                      f"{time.time() - self._interval_started:.0f}s"),
+            'model_version': self.model_version
+        }
+        self._reset_interval()
+        return summary
+
+
+class RealtimeSessionManager:
+    """
+    In-process registry of open realtime sessions with idle expiry.
+
+    A background thread (started with the first session, so after a pre-fork
+    server forks) removes sessions idle for longer than idle_timeout and hands
+    each to on_expire, e.g. to save its last summary.
+    """
+
+    def __init__(self, preprocessor, predict_fn: Callable[[np.ndarray], Tuple[float, Optional[str]]],
+                 idle_timeout: float = 300.0, on_expire: Optional[Callable[[RealtimeSession], Any]] = None,
+                 **session_config):
+        self.preprocessor = preprocessor
+        self.predict_fn = predict_fn
+        self.idle_timeout = idle_timeout
+        self.on_expire = on_expire
+        self.session_config = session_config
+        self._sessions: Dict[str, RealtimeSession] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def create(self, user_id: str) -> RealtimeSession:
+        session = RealtimeSession(str(uuid.uuid4()), user_id, self.preprocessor, self.predict_fn,
+                                  **self.session_config)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(target=self._reap, name='stress-realtime-reaper', daemon=True)
+                self._reaper.start()
+        return session
+
+    def _reap(self):
+        while True:
+            time.sleep(min(60.0, max(1.0, self.idle_timeout / 4)))
+            for session in self.expire_idle():
+                if self.on_expire is None:
+                    continue
+                try:
+                    self.on_expire(session)
+                except Exception as e:
+                    print(f"Error flushing expired realtime session {session.session_id}: {e}")
+
+    def get(self, session_id: str, user_id: str) -> Optional[RealtimeSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None or session.user_id != user_id:
+            return None
+        return session
+
+    def close(self, session_id: str) -> Optional[RealtimeSession]:
+        """Remove a session and tell any stream still feeding it to stop"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.cancelled.set()
+        return session
+
+    def expire_idle(self) -> list:
+        """Remove sessions idle longer than idle_timeout and return them"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            # A session with an open stream is still in use, however long its client pauses
+            expired = [s for s in self._sessions.values() if s.last_seen < cutoff and not s.lock.locked()]
+            for session in expired:
+                del self._sessions[session.session_id]
+        return expired
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResultCache:
+    """
+    LRU cache of detection results keyed by a hash of the uploaded bytes.
+
+    Retried uploads and re-sent still frames skip decode and inference. Keys
+    are a 128-bit BLAKE2b digest of the image plus the model version, where
+    the version is derived from the model file's size and mtime; when the
+    file changes (checked at most every check_interval seconds) every entry is
+    dropped. Eviction is by total size of the stored results, not entry count.
+    """
+
+    def __init__(self, model_path: str, max_bytes: int = 16 * 1024 * 1024, check_interval: float = 5.0):
+        self.model_path = model_path
+        self.max_bytes = max(0, max_bytes)
+        self.check_interval = check_interval
+
+        self._entries: 'OrderedDict[bytes, Tuple[int, Dict[str, Any]]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = self._read_version()
+        self._checked_at = time.monotonic()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _read_version(self) -> str:
+        try:
+            st = os.stat(self.model_path)
+        except OSError:
+            return 'missing'
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+    def _check_model(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        version = self._read_version()
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+
+    def switch_model(self, model_path: str):
+        """Follow a hot-swapped model file; results from the previous one are dropped"""
+        with self._lock:
+            if model_path == self.model_path:
+                return
+            self.model_path = model_path
+            self._version = self._read_version()
+            self._checked_at = time.monotonic()
+            self._entries.clear()
+            self._bytes = 0
+            self._invalidations += 1
+
+    def key_for(self, image_data: bytes) -> bytes:
+        digest = hashlib.blake2b(image_data, digest_size=16)
+        digest.update(self._version.encode())
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._check_model()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(entry[1])
+
+    def put(self, key: bytes, result: Dict[str, Any]):
+        # Approximate footprint: the serialized result plus key and bookkeeping
+        size = len(json.dumps(result)) + len(key) + 64
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[key] = (size, dict(result))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'model_version': self._version
+            }
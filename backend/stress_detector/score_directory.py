@@ -0,0 +1,295 @@
+"""
+Offline bulk scoring of image archives, e.g. after a model update.
+
+Walks a directory tree and scores every image with StressDetector. A pool of
+worker processes reads, decodes and preprocesses chunks of images while the
+main process runs batched inference on the chunks that are already ready, so
+decoding overlaps with predict. Results are appended to the output as each
+batch finishes:
+
+  results.csv        one CSV file; rows are flushed after every batch
+  results.parquet/   a directory of part-NNNNN.parquet files (needs pyarrow)
+
+Re-running the same command resumes: images already in the output are
+skipped (for CSV a torn final line from a crash is dropped first). Pass
+--restart to score everything again.
+
+Usage (from the backend directory):
+    python -m stress_detector.score_directory /data/archive --output results.csv [--workers 4]
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .model_registry import DEFAULT_REGISTRY_DIR
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+FIELDS = ['path', 'stress_score', 'stress_level', 'confidence', 'model', 'error']
+
+# Preprocessor owned by a pool worker; created by _init_worker
+_worker_preprocessor = None
+
+
+def _init_worker(preprocess_config: Dict[str, Any]):
+    global _worker_preprocessor
+    import cv2
+    from .face_detector import get_face_detector
+    from .preprocessing import ImagePreprocessor
+
+    # Parallelism comes from the pool; keep OpenCV from adding its own threads
+    cv2.setNumThreads(1)
+    _worker_preprocessor = ImagePreprocessor(get_face_detector(), **preprocess_config)
+
+
+def _preprocess_chunk(root: str, paths: List[str]) -> Tuple[List[str], np.ndarray, List[Tuple[str, str]], float]:
+    """Read and preprocess a chunk in a worker; returns (paths, batch, errors, seconds)"""
+    started = time.perf_counter()
+    batch = np.empty((len(paths),) + _worker_preprocessor.output_shape, dtype=np.float32)
+    done = []
+    errors = []
+    for path in paths:
+        try:
+            with open(os.path.join(root, path), 'rb') as f:
+                data = f.read()
+            _worker_preprocessor.preprocess_into(data, batch[len(done)])
+        except (OSError, ValueError) as e:
+            errors.append((path, str(e)))
+            continue
+        done.append(path)
+    return done, batch[:len(done)], errors, time.perf_counter() - started
+
+
+def find_images(root: str) -> List[str]:
+    """Image paths under root, relative to it and in a stable order"""
+    found = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(directory, filename), root))
+    return found
+
+
+class CsvResultWriter:
+    """Appends result rows to a CSV file, flushing after every batch"""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        if restart and os.path.exists(path):
+            os.remove(path)
+        self._drop_torn_line()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+        if new_file:
+            self._writer.writeheader()
+
+    def _drop_torn_line(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            if content and not content.endswith(b'\n'):
+                f.truncate(content.rfind(b'\n') + 1)
+
+    def completed(self) -> Set[str]:
+        with open(self.path, newline='', encoding='utf-8') as f:
+            return {row['path'] for row in csv.DictReader(f)}
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Writes result rows as numbered Parquet part files in a directory"""
+
+    def __init__(self, path: str, restart: bool = False, rows_per_part: int = 5000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.rows_per_part = rows_per_part
+        os.makedirs(path, exist_ok=True)
+        if restart:
+            for name in self._parts():
+                os.remove(os.path.join(path, name))
+        self._pending: List[Dict[str, Any]] = []
+        self._next_part = len(self._parts())
+
+    def _parts(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.path)
+                      if name.startswith('part-') and name.endswith('.parquet'))
+
+    def completed(self) -> Set[str]:
+        done = set()
+        for name in self._parts():
+            table = self._pq.read_table(os.path.join(self.path, name), columns=['path'])
+            done.update(table.column('path').to_pylist())
+        return done
+
+    def _flush(self):
+        if not self._pending:
+            return
+        final = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # Written under a temporary name so a crash never leaves a half-written part
+        self._pq.write_table(self._pa.Table.from_pylist(self._pending), final + '.tmp')
+        os.replace(final + '.tmp', final)
+        self._next_part += 1
+        self._pending = []
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._pending.extend(rows)
+        if len(self._pending) >= self.rows_per_part:
+            self._flush()
+
+    def close(self):
+        self._flush()
+
+
+def chunked(items: List[str], size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def score_directory(root: str, writer, detector, workers: int, batch_size: int,
+                    preprocess_config: Dict[str, Any], limit: Optional[int] = None) -> Dict[str, Any]:
+    """Score every image under root that the writer hasn't seen yet; returns throughput stats"""
+    images = find_images(root)
+    done = writer.completed()
+    todo = [path for path in images if path not in done]
+    if limit:
+        todo = todo[:limit]
+    print(f"{len(images)} images found, {len(images) - len(todo)} already scored, {len(todo)} to score")
+
+    model_name = f"{detector.backend.name}:{detector.model_version}"
+    totals = {'images': 0, 'errors': 0, 'decode_s': 0.0, 'wait_s': 0.0, 'predict_s': 0.0, 'write_s': 0.0}
+    started = time.perf_counter()
+
+    # Spawned, not forked: the parent already has the model (and TensorFlow) loaded
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(preprocess_config,)) as pool:
+        chunks = chunked(todo, batch_size)
+        # Keep a couple of chunks per worker in flight so decoding runs ahead of predict
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(_preprocess_chunk, root, chunk))
+            if len(in_flight) >= workers * 2:
+                break
+
+        while in_flight:
+            waited = time.perf_counter()
+            paths, batch, errors, decode_s = in_flight.popleft().result()
+            totals['wait_s'] += time.perf_counter() - waited
+            totals['decode_s'] += decode_s
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                in_flight.append(pool.submit(_preprocess_chunk, root, next_chunk))
+
+            rows = []
+            if paths:
+                t = time.perf_counter()
+                predictions = detector.predict_batch(batch)
+                totals['predict_s'] += time.perf_counter() - t
+                for path, prediction in zip(paths, predictions):
+                    score = int(float(prediction) * 100)
+                    rows.append({
+                        'path': path,
+                        'stress_score': score,
+                        'stress_level': detector.level_for_score(score),
+                        'confidence': float(prediction),
+                        'model': model_name,
+                        'error': ''
+                    })
+            for path, error in errors:
+                rows.append({'path': path, 'stress_score': None, 'stress_level': None,
+                             'confidence': None, 'model': model_name, 'error': error})
+
+            t = time.perf_counter()
+            writer.write(rows)
+            totals['write_s'] += time.perf_counter() - t
+            totals['images'] += len(paths)
+            totals['errors'] += len(errors)
+
+    t = time.perf_counter()
+    writer.close()
+    totals['write_s'] += time.perf_counter() - t
+    totals['wall_s'] = time.perf_counter() - started
+    return totals
+
+
+def print_report(totals: Dict[str, Any], workers: int):
+    images = totals['images']
+
+    def rate(seconds: float) -> str:
+        return f"{images / seconds:10.1f}" if seconds > 0 and images else f"{'-':>10}"
+
+    print(f"Scored {images} images ({totals['errors']} unreadable) in {totals['wall_s']:.1f}s")
+    print(f"{'stage':<24}{'images/sec':>10}{'seconds':>10}")
+    # Decode runs in parallel, so its capacity is per-worker throughput times the pool size
+    print(f"{'decode (per worker)':<24}{rate(totals['decode_s'])}{totals['decode_s']:10.1f}")
+    print(f"{'decode (pool of ' + str(workers) + ')':<24}{rate(totals['decode_s'] / workers)}{totals['decode_s'] / workers:10.1f}")
+    print(f"{'predict':<24}{rate(totals['predict_s'])}{totals['predict_s']:10.1f}")
+    print(f"{'write':<24}{rate(totals['write_s'])}{totals['write_s']:10.1f}")
+    print(f"{'end to end':<24}{rate(totals['wall_s'])}{totals['wall_s']:10.1f}")
+    print(f"Waiting on decode: {totals['wait_s']:.1f}s"
+          f" ({'decode' if totals['wait_s'] > totals['predict_s'] else 'predict'} is the bottleneck)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every image under a directory")
+    parser.add_argument('root', help="Directory to scan (recursively)")
+    parser.add_argument('--output', required=True, help="results.csv, or a .parquet directory")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="Defaults from the output extension")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Decode/preprocess processes")
+    parser.add_argument('--batch-size', type=int, default=32, help="Images per forward pass")
+    # Same environment defaults as the server, so both score with the same model
+    parser.add_argument('--backend', default=os.environ.get('STRESS_MODEL_BACKEND', 'graph'),
+                        help="Model backend: graph, keras or tflite")
+    parser.add_argument('--model', default=os.environ.get('STRESS_MODEL_PATH') or None,
+                        help="Model file (defaults to the registry's active version)")
+    parser.add_argument('--registry', default=os.environ.get('STRESS_MODEL_REGISTRY') or DEFAULT_REGISTRY_DIR,
+                        help="Model registry directory")
+    parser.add_argument('--limit', type=int, help="Score at most this many new images")
+    parser.add_argument('--restart', action='store_true', help="Ignore and replace existing output")
+    args = parser.parse_args()
+
+    from .detector import StressDetector
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'csv')
+    if output_format == 'parquet':
+        writer = ParquetResultWriter(args.output, restart=args.restart)
+    else:
+        writer = CsvResultWriter(args.output, restart=args.restart)
+
+    # One version for the whole run: no hot reload here
+    detector = StressDetector(model_path=args.model, backend=args.backend,
+                              registry_config={'root': args.registry, 'poll_interval': 0})
+    if not detector.load():
+        # Mock scores are random; never write them into an analysis dataset
+        writer.close()
+        sys.exit(f"No usable model at {detector.model_path}: {detector.model_error or 'file not found'}")
+
+    totals = score_directory(args.root, writer, detector, args.workers, args.batch_size, preprocess_config={},
+                             limit=args.limit)
+    print_report(totals, args.workers)
+
+
+if __name__ == '__main__':
+    main()
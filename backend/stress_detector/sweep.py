@@ -0,0 +1,283 @@
+"""
+Hyperparameter sweep for the stress model on a single CPU-only machine.
+
+Every combination of the given values (or a random sample of them) is one
+trial. Trials run in a pool of spawned processes, each with its TensorFlow
+and BLAS thread pools capped so that workers x threads fits the cores. The
+image and feature caches are filled once up front, so trials only read them.
+
+Each trial trains the head (on cached backbone features with
+--feature-cache-dir, otherwise on images), then optionally fine-tunes the
+top layers. After every epoch it records validation accuracy in
+<output>/trials/<id>.jsonl. A trial that is below the median of the other
+trials at the same epoch (once --prune-after epochs have run and at least
+--prune-min-trials others have reported) is stopped early.
+
+The sweep writes results.csv (every trial, best first) and copies the best
+trial's model to best_model.h5 with its settings in best.json.
+
+Usage (from the backend directory):
+    python -m stress_detector.sweep --learning-rate 1e-4,3e-4 --dropout 0.3/0.2,0.5/0.3 \\
+        --unfreeze-layers 20,40 --feature-cache-dir data/feature_cache
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULT_FIELDS = [
+    'trial', 'learning_rate', 'dropout', 'batch_size', 'unfreeze_layers', 'fine_tune_learning_rate',
+    'best_val_accuracy', 'best_val_loss', 'epochs_run', 'pruned', 'seconds', 'artifact'
+]
+
+
+def _init_trial_process(threads: int):
+    # Must happen before TensorFlow creates its thread pools
+    for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[name] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    from .backends import configure_tensorflow_threads
+    configure_tensorflow_threads(threads, 1)
+
+
+def read_reports(trials_dir: str, exclude: str) -> Dict[int, List[float]]:
+    """val_accuracy reported by other trials, by epoch"""
+    by_epoch: Dict[int, List[float]] = {}
+    for name in os.listdir(trials_dir):
+        if not name.endswith('.jsonl') or name == f"{exclude}.jsonl":
+            continue
+        with open(os.path.join(trials_dir, name), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    report = json.loads(line)
+                except ValueError:
+                    continue
+                by_epoch.setdefault(report['epoch'], []).append(report['val_accuracy'])
+    return by_epoch
+
+
+def make_pruning_callback(trial_id: str, trials_dir: str, epoch_offset: int, prune_after: int,
+                          min_trials: int, state: Dict[str, Any]):
+    """Keras callback that records each epoch and stops the trial if it falls below the median"""
+    import tensorflow as tf
+
+    class MedianPruning(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            step = epoch_offset + epoch
+            accuracy = float(logs.get('val_accuracy', 0.0))
+            state['epochs_run'] = step + 1
+            state['best_val_accuracy'] = max(state.get('best_val_accuracy', 0.0), accuracy)
+            state['best_val_loss'] = min(state.get('best_val_loss', float('inf')),
+                                         float(logs.get('val_loss', float('inf'))))
+            with open(os.path.join(trials_dir, f"{trial_id}.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'epoch': step, 'val_accuracy': accuracy}) + '\n')
+
+            if step + 1 < prune_after:
+                return
+            others = read_reports(trials_dir, trial_id).get(step, [])
+            if len(others) >= min_trials and accuracy < statistics.median(others):
+                print(f"Pruning trial {trial_id} at epoch {step + 1}: "
+                      f"val_accuracy {accuracy:.3f} < median {statistics.median(others):.3f}")
+                state['pruned'] = True
+                self.model.stop_training = True
+
+    return MedianPruning()
+
+
+def run_trial(trial: Dict[str, Any], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Train one configuration in a pool process and return its result row"""
+    from . import train_model as tm
+
+    started = time.perf_counter()
+    trial_id = trial['trial']
+    trials_dir = os.path.join(settings['output'], 'trials')
+    state: Dict[str, Any] = {'pruned': False, 'epochs_run': 0}
+
+    def pruning(offset: int):
+        return make_pruning_callback(trial_id, trials_dir, offset, settings['prune_after'],
+                                     settings['prune_min_trials'], state)
+
+    model = tm.build_model(learning_rate=trial['learning_rate'], dropout=trial['dropout'])
+    train_ds, val_ds = tm.prepare_data(settings['data_dir'], trial['batch_size'], cache_dir=settings['cache_dir'])
+
+    if settings['feature_cache_dir']:
+        tm.train_head_on_features(
+            model, settings['data_dir'], settings['feature_cache_dir'], epochs=settings['epochs'],
+            batch_size=trial['batch_size'], learning_rate=trial['learning_rate'], dropout=trial['dropout'],
+            callbacks=[pruning(0)]
+        )
+    else:
+        model.fit(train_ds, validation_data=val_ds, epochs=settings['epochs'], verbose=2, callbacks=[
+            tf_early_stopping(), pruning(0)
+        ])
+
+    if settings['fine_tune_epochs'] and not state['pruned']:
+        tm.unfreeze_for_fine_tuning(model, trial['unfreeze_layers'], trial['fine_tune_learning_rate'])
+        model.fit(train_ds, validation_data=val_ds, epochs=settings['fine_tune_epochs'], verbose=2,
+                  callbacks=[tf_early_stopping(), pruning(state['epochs_run'])])
+
+    artifact = None
+    if not state['pruned']:
+        artifact = os.path.join(trials_dir, f"{trial_id}.h5")
+        model.save(artifact)
+
+    return dict(
+        trial,
+        dropout='/'.join(str(d) for d in trial['dropout']),
+        best_val_accuracy=state.get('best_val_accuracy'),
+        best_val_loss=state.get('best_val_loss'),
+        epochs_run=state['epochs_run'],
+        pruned=state['pruned'],
+        seconds=round(time.perf_counter() - started, 1),
+        artifact=artifact
+    )
+
+
+def tf_early_stopping():
+    import tensorflow as tf
+    return tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True)
+
+
+def build_trials(args) -> List[Dict[str, Any]]:
+    grid = itertools.product(
+        [float(v) for v in args.learning_rate.split(',')],
+        [tuple(float(d) for d in v.split('/')) for v in args.dropout.split(',')],
+        [int(v) for v in args.batch_size.split(',')],
+        [int(v) for v in args.unfreeze_layers.split(',')],
+        [float(v) for v in args.fine_tune_learning_rate.split(',')]
+    )
+    combinations = list(grid)
+    if args.samples and args.samples < len(combinations):
+        combinations = random.Random(args.seed).sample(combinations, args.samples)
+    return [
+        {'trial': f"t{index:03d}", 'learning_rate': lr, 'dropout': dropout, 'batch_size': batch_size,
+         'unfreeze_layers': unfreeze, 'fine_tune_learning_rate': fine_tune_lr}
+        for index, (lr, dropout, batch_size, unfreeze, fine_tune_lr) in enumerate(combinations)
+    ]
+
+
+def warm_caches(settings: Dict[str, Any]):
+    """Fill the image and feature caches once so concurrent trials only read them"""
+    from . import train_model as tm
+
+    started = time.perf_counter()
+    if settings['fine_tune_epochs'] or not settings['feature_cache_dir']:
+        train_ds, val_ds = tm.prepare_data(settings['data_dir'], 64, cache_dir=settings['cache_dir'])
+        for dataset in (train_ds, val_ds):
+            for _ in dataset:
+                pass
+    if settings['feature_cache_dir']:
+        model = tm.build_model()
+        paths, labels = tm.list_image_files(settings['data_dir'])
+        tm.load_cached_features(model, paths, settings['feature_cache_dir'])
+    print(f"Caches ready in {time.perf_counter() - started:.1f}s")
+
+
+def write_results(output: str, results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    results.sort(key=lambda r: (r['pruned'], -(r['best_val_accuracy'] or 0.0)))
+    with open(os.path.join(output, 'results.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+    print(f"{'trial':<7}{'lr':>9}{'dropout':>10}{'batch':>7}{'unfreeze':>10}{'val_acc':>9}{'epochs':>8}{'pruned':>8}{'sec':>8}")
+    for r in results:
+        print(f"{r['trial']:<7}{r['learning_rate']:>9.0e}{r['dropout']:>10}{r['batch_size']:>7}"
+              f"{r['unfreeze_layers']:>10}{r['best_val_accuracy'] or 0:>9.3f}{r['epochs_run']:>8}"
+              f"{str(r['pruned']):>8}{r['seconds']:>8}")
+
+    best = next((r for r in results if r['artifact']), None)
+    if best:
+        best_path = os.path.join(output, 'best_model.h5')
+        shutil.copyfile(best['artifact'], best_path)
+        with open(os.path.join(output, 'best.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(best, artifact=best_path), f, indent=2)
+    return best
+
+
+def main():
+    cores = os.cpu_count() or 2
+    parser = argparse.ArgumentParser(description="Run a parallel hyperparameter sweep for the stress model")
+    parser.add_argument('--data-dir', default=os.path.join(BASE_DIR, 'data', 'stress_images'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'outputs', 'sweep'))
+    parser.add_argument('--cache-dir', default=os.path.join(BASE_DIR, 'data', 'tf_cache'))
+    parser.add_argument('--feature-cache-dir', help="Train heads on cached backbone features (much faster)")
+    parser.add_argument('--learning-rate', default='1e-4', help="Comma-separated values")
+    parser.add_argument('--dropout', default='0.3/0.2', help="Comma-separated first/second dropout pairs")
+    parser.add_argument('--batch-size', default='32', help="Comma-separated values")
+    parser.add_argument('--unfreeze-layers', default='20', help="Comma-separated values")
+    parser.add_argument('--fine-tune-learning-rate', default='1e-5', help="Comma-separated values")
+    parser.add_argument('--epochs', type=int, default=20, help="Head-training epochs per trial")
+    parser.add_argument('--fine-tune-epochs', type=int, default=0, help="Fine-tuning epochs per trial (0 skips it)")
+    parser.add_argument('--samples', type=int, help="Randomly pick this many combinations instead of all")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads-per-trial', type=int, default=2)
+    parser.add_argument('--workers', type=int, help="Concurrent trials (default: cores / threads per trial)")
+    parser.add_argument('--prune-after', type=int, default=3, help="Never prune before this many epochs")
+    parser.add_argument('--prune-min-trials', type=int, default=3, help="Reports needed at an epoch to prune")
+    parser.add_argument('--keep-all', action='store_true', help="Keep every trial's model, not just the best")
+    args = parser.parse_args()
+
+    workers = args.workers or max(1, cores // max(1, args.threads_per_trial))
+    trials = build_trials(args)
+    settings = {
+        'data_dir': args.data_dir,
+        'output': args.output,
+        'cache_dir': args.cache_dir or None,
+        'feature_cache_dir': args.feature_cache_dir,
+        'epochs': args.epochs,
+        'fine_tune_epochs': args.fine_tune_epochs,
+        'prune_after': args.prune_after,
+        'prune_min_trials': args.prune_min_trials
+    }
+
+    trials_dir = os.path.join(args.output, 'trials')
+    shutil.rmtree(trials_dir, ignore_errors=True)
+    os.makedirs(trials_dir)
+    print(f"{len(trials)} trials on {workers} workers x {args.threads_per_trial} threads ({cores} cores)")
+
+    # In a child process so the parent never initializes TensorFlow's thread pools
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as warm_pool:
+        warm_pool.submit(warm_caches, settings).result()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_trial_process, initargs=(args.threads_per_trial,)) as pool:
+        futures = {pool.submit(run_trial, trial, settings): trial for trial in trials}
+        for future in as_completed(futures):
+            trial = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Trial {trial['trial']} failed: {e}")
+                continue
+            print(f"Trial {result['trial']} finished: val_accuracy={result['best_val_accuracy']} "
+                  f"pruned={result['pruned']} in {result['seconds']}s")
+            results.append(result)
+
+    best = write_results(args.output, results)
+    if best:
+        print(f"Best trial {best['trial']} (val_accuracy {best['best_val_accuracy']:.3f}) "
+              f"saved to {os.path.join(args.output, 'best_model.h5')}")
+    if not args.keep_all:
+        for result in results:
+            if result['artifact'] and os.path.exists(result['artifact']):
+                os.remove(result['artifact'])
+                result['artifact'] = None
+
+
+if __name__ == '__main__':
+    main()
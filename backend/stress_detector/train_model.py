@@ -1,20 +1,96 @@
-
+import argparse
+import hashlib
+import json
 import os
+import subprocess
+import sys
+import time
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
 from tensorflow.keras.models import Model
 from tensorflow.keras.optimizers import Adam
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
-import matplotlib.pyplot as plt
 import cv2
 import pandas as pd
 from typing import Tuple, List
 
-def build_model() -> Model:
+from .backends import configure_tensorflow_threads
+from .feature_cache import FeatureCache
+from .model_registry import DEFAULT_REGISTRY_DIR, ModelRegistry
+
+# Set by configure_training; read by compile_model
+TRAINING_OPTIONS = {'jit_compile': False}
+
+def cpu_supports_bfloat16() -> bool:
+    """True if the CPU has native bfloat16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+def configure_training(intra_op_threads: int = None, inter_op_threads: int = None,
+                       bfloat16: bool = False, jit_compile: bool = False):
+    """
+    Process-wide training settings; call before building any model.
+    
+    bfloat16 enables the mixed_bfloat16 policy (bfloat16 compute, float32
+    weights) only on CPUs with native support, since emulating it is slower
+    than float32. jit_compile compiles each training step with XLA.
+    """
+    configure_tensorflow_threads(intra_op_threads, inter_op_threads)
+    if bfloat16:
+        if cpu_supports_bfloat16():
+            tf.keras.mixed_precision.set_global_policy('mixed_bfloat16')
+            print("Mixed precision: mixed_bfloat16")
+        else:
+            print("This CPU has no native bfloat16 support; training in float32")
+    TRAINING_OPTIONS['jit_compile'] = jit_compile
+
+def compile_model(model: Model, learning_rate: float):
+    model.compile(
+        optimizer=Adam(learning_rate=learning_rate),
+        loss='binary_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=TRAINING_OPTIONS['jit_compile']
+    )
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Adds epoch_seconds and samples_per_sec to the logs (and so to the history)"""
+    
+    def __init__(self, samples: int):
+        super().__init__()
+        self.samples = samples
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._started
+        if logs is not None:
+            logs['epoch_seconds'] = elapsed
+            logs['samples_per_sec'] = self.samples / elapsed
+        print(f"Epoch {epoch + 1}: {elapsed:.1f}s, {self.samples / elapsed:.1f} samples/sec")
+
+def add_head(x, dropout: Tuple[float, float] = (0.3, 0.2)):
+    """
+    The trainable classifier on top of the pooled backbone features. Shared by
+    build_model and the feature-cache head model so their weights line up.
+    """
+    x = Dense(512, activation='relu')(x)
+    x = Dropout(dropout[0])(x)
+    x = Dense(128, activation='relu')(x)
+    x = Dropout(dropout[1])(x)
+    
+    # Output layer with sigmoid activation for binary classification
+    # (stressed vs. not stressed); kept in float32 under mixed precision
+    return Dense(1, activation='sigmoid', dtype='float32')(x)
+
+def build_model(learning_rate: float = 0.0001, dropout: Tuple[float, float] = (0.3, 0.2)) -> Model:
     """
     Build a stress detection model based on MobileNetV2 architecture
     """
@@ -32,30 +108,98 @@ def build_model() -> Model:
     # Add custom top layers for stress detection
     x = base_model.output
     x = GlobalAveragePooling2D()(x)
-    x = Dense(512, activation='relu')(x)
-    x = Dropout(0.3)(x)
-    x = Dense(128, activation='relu')(x)
-    x = Dropout(0.2)(x)
-    
-    # Output layer with sigmoid activation for binary classification
-    # (stressed vs. not stressed)
-    predictions = Dense(1, activation='sigmoid')(x)
+    predictions = add_head(x, dropout)
     
     # Create the model
     model = Model(inputs=base_model.input, outputs=predictions)
     
     # Compile the model
-    model.compile(
-        optimizer=Adam(learning_rate=0.0001),
-        loss='binary_crossentropy',
-        metrics=['accuracy']
-    )
+    compile_model(model, learning_rate)
     
     return model
 
-def prepare_data(data_dir: str, batch_size: int = 32) -> Tuple[ImageDataGenerator, ImageDataGenerator]:
+# flow_from_directory's alphabetical class order, kept so labels mean the same thing
+CLASS_NAMES = ['not_stressed', 'stressed']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+IMAGE_SIZE = 224
+
+def list_image_files(data_dir: str) -> Tuple[List[str], List[int]]:
+    """Return (paths, labels) for every image under the class directories, in a stable order"""
+    paths, labels = [], []
+    for label, class_name in enumerate(CLASS_NAMES):
+        class_dir = os.path.join(data_dir, class_name)
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(class_dir, name))
+                labels.append(label)
+    return paths, labels
+
+def split_image_files(paths: List[str], labels: List[int], validation_split: float = 0.2, seed: int = 42):
+    """Stratified train/validation split; the same seed always gives the same split"""
+    return train_test_split(paths, labels, test_size=validation_split, stratify=labels, random_state=seed)
+
+def dataset_fingerprint(paths: List[str]) -> str:
+    """Short hash of the file list, sizes and mtimes; names cache files so they go stale with the data"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(str(IMAGE_SIZE).encode())
+    for path in paths:
+        st = os.stat(path)
+        digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def decode_image(path: tf.Tensor, label: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Read, decode and resize one image to uint8 (what gets cached; 4x smaller than float32)"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, (IMAGE_SIZE, IMAGE_SIZE))
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+    return image, tf.cast(label, tf.float32)
+
+def build_augmenter() -> tf.keras.Sequential:
+    """
+    Batched on-graph augmentation roughly matching the old ImageDataGenerator
+    settings (rotation 20 degrees, 20% shift and zoom, horizontal flips;
+    shear has no built-in layer and is dropped)
+    """
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip('horizontal'),
+        tf.keras.layers.RandomRotation(20 / 360, fill_mode='nearest'),
+        tf.keras.layers.RandomTranslation(0.2, 0.2, fill_mode='nearest'),
+        tf.keras.layers.RandomZoom(0.2, fill_mode='nearest'),
+    ], name='augmentation')
+
+def make_dataset(paths: List[str], labels: List[int], batch_size: int, training: bool,
+                 cache_path: str = None, shuffle_buffer: int = 1024, seed: int = 42) -> tf.data.Dataset:
+    """
+    Build an input pipeline: parallel decode, cache, shuffle (training only),
+    batch, augment (training only), normalize to [0, 1] and prefetch.
+
+    cache_path caches decoded images to that file prefix; '' caches in
+    memory; None disables caching.
     """
-    Prepare data generators for training and validation
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(decode_image, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+    if cache_path is not None:
+        dataset = dataset.cache(cache_path)
+    if training:
+        dataset = dataset.shuffle(min(shuffle_buffer, len(paths)), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE)
+    
+    if training:
+        augmenter = build_augmenter()
+        dataset = dataset.map(
+            lambda images, y: (augmenter(tf.cast(images, tf.float32), training=True), y),
+            num_parallel_calls=tf.data.AUTOTUNE
+        )
+    dataset = dataset.map(
+        lambda images, y: (tf.cast(images, tf.float32) / 255.0, y),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def prepare_data(data_dir: str, batch_size: int = 32, cache_dir: str = None,
+                 validation_split: float = 0.2, seed: int = 42) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
+    """
+    Prepare tf.data pipelines for training and validation
     
     The expected directory structure is:
     data_dir/
@@ -67,106 +211,206 @@ def prepare_data(data_dir: str, batch_size: int = 32) -> Tuple[ImageDataGenerato
             img1.jpg
             img2.jpg
             ...
+    
+    The split is stratified and fixed by seed. Only the training set is
+    augmented. With cache_dir, decoded images are cached there in files named
+    after the dataset fingerprint, so later epochs and runs skip decoding;
+    without it they are cached in memory.
     """
-    # Data augmentation for training
-    train_datagen = ImageDataGenerator(
-        rescale=1./255,
-        rotation_range=20,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        shear_range=0.2,
-        zoom_range=0.2,
-        horizontal_flip=True,
-        fill_mode='nearest',
-        validation_split=0.2  # 20% for validation
-    )
+    paths, labels = list_image_files(data_dir)
+    train_paths, val_paths, train_labels, val_labels = split_image_files(paths, labels, validation_split, seed)
     
-    # Load training data
-    train_generator = train_datagen.flow_from_directory(
-        data_dir,
-        target_size=(224, 224),
-        batch_size=batch_size,
-        class_mode='binary',
-        subset='training'
-    )
+    train_cache = val_cache = ''
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        fingerprint = dataset_fingerprint(paths)
+        train_cache = os.path.join(cache_dir, f"train-{fingerprint}-{seed}.tfcache")
+        val_cache = os.path.join(cache_dir, f"val-{fingerprint}-{seed}.tfcache")
+    
+    print(f"Found {len(train_paths)} training and {len(val_paths)} validation images")
+    train_ds = make_dataset(train_paths, train_labels, batch_size, training=True, cache_path=train_cache, seed=seed)
+    val_ds = make_dataset(val_paths, val_labels, batch_size, training=False, cache_path=val_cache, seed=seed)
+    return train_ds, val_ds
+
+def benchmark_input_pipeline(dataset: tf.data.Dataset, epochs: int = 2, steps: int = None):
+    """Iterate a dataset without training and print steps/sec and images/sec per epoch"""
+    for epoch in range(epochs):
+        started = time.perf_counter()
+        batches = images = 0
+        for batch_images, _ in dataset.take(steps) if steps else dataset:
+            batches += 1
+            images += int(batch_images.shape[0])
+        elapsed = time.perf_counter() - started
+        # The first epoch also decodes and fills the cache; later epochs read from it
+        print(f"Input epoch {epoch + 1}: {batches} steps in {elapsed:.2f}s "
+              f"({batches / elapsed:.1f} steps/sec, {images / elapsed:.1f} images/sec)")
+
+def backbone_fingerprint(model: Model) -> str:
+    """Hash of the frozen backbone's weights (everything below the pooling layer)"""
+    digest = hashlib.blake2b(digest_size=8)
+    for layer in model.layers:
+        if isinstance(layer, GlobalAveragePooling2D):
+            break
+        for weight in layer.get_weights():
+            digest.update(np.ascontiguousarray(weight).tobytes())
+    return digest.hexdigest()
+
+def build_feature_extractor(model: Model) -> Model:
+    """The model's frozen backbone up to the pooled 1280-d features"""
+    pooling = next(layer for layer in model.layers if isinstance(layer, GlobalAveragePooling2D))
+    return Model(inputs=model.input, outputs=pooling.output)
+
+def build_head_model(feature_dim: int = 1280, learning_rate: float = 0.0001,
+                     dropout: Tuple[float, float] = (0.3, 0.2)) -> Model:
+    """The classifier head alone, trained directly on cached features"""
+    inputs = tf.keras.Input(shape=(feature_dim,))
+    head = Model(inputs=inputs, outputs=add_head(inputs, dropout))
+    compile_model(head, learning_rate)
+    return head
+
+def copy_head_weights(head: Model, model: Model):
+    """Copy the Dense layers of a trained head model into the full model"""
+    head_layers = [layer for layer in head.layers if isinstance(layer, Dense)]
+    model_layers = [layer for layer in model.layers if isinstance(layer, Dense)]
+    for source, target in zip(head_layers, model_layers):
+        target.set_weights(source.get_weights())
+
+def load_cached_features(model: Model, paths: List[str], feature_cache_dir: str,
+                         batch_size: int = 64) -> np.ndarray:
+    """Pooled backbone features for paths, computed only for images the cache hasn't seen"""
+    extractor = build_feature_extractor(model)
+    # Features are stored as float32 either way, but bfloat16 compute gives different values
+    cache = FeatureCache(feature_cache_dir, backbone_fingerprint(model), dim=int(extractor.output.shape[-1]),
+                         precision=extractor.dtype_policy.name)
+    
+    def extract(batch_paths: List[str]) -> np.ndarray:
+        images = tf.stack([decode_image(path, 0)[0] for path in batch_paths])
+        features = extractor(tf.cast(images, tf.float32) / 255.0, training=False)
+        return tf.cast(features, tf.float32).numpy()
     
-    # Load validation data
-    validation_generator = train_datagen.flow_from_directory(
-        data_dir,
-        target_size=(224, 224),
+    features = cache.features_for(paths, extract, batch_size=batch_size)
+    print(f"Feature cache: {cache.get_stats()}")
+    return features
+
+def train_head_on_features(model: Model, data_dir: str, feature_cache_dir: str, epochs: int = 20,
+                           batch_size: int = 32, seed: int = 42, learning_rate: float = 0.0001,
+                           dropout: Tuple[float, float] = (0.3, 0.2), callbacks: list = None):
+    """
+    Phase one with a frozen backbone: run the backbone once per image (cached
+    across runs), train the head on the features and copy it into model.
+    Training images are not augmented in this mode.
+    """
+    paths, labels = list_image_files(data_dir)
+    train_paths, val_paths, train_labels, val_labels = split_image_files(paths, labels, seed=seed)
+    train_features = load_cached_features(model, train_paths, feature_cache_dir)
+    val_features = load_cached_features(model, val_paths, feature_cache_dir)
+    
+    head = build_head_model(train_features.shape[1], learning_rate, dropout)
+    history = head.fit(
+        train_features, np.array(train_labels, dtype=np.float32),
+        validation_data=(val_features, np.array(val_labels, dtype=np.float32)),
         batch_size=batch_size,
-        class_mode='binary',
-        subset='validation'
+        epochs=epochs,
+        shuffle=True,
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+                   EpochTimer(len(train_paths))] + list(callbacks or [])
     )
-    
-    return train_generator, validation_generator
+    copy_head_weights(head, model)
+    return history
 
-def train_stress_model(data_dir: str, model_save_path: str, epochs: int = 20, batch_size: int = 32):
+def train_stress_model(data_dir: str, work_dir: str, registry: ModelRegistry, epochs: int = 20,
+                       batch_size: int = 32, fine_tune_epochs: int = 10, cache_dir: str = None,
+                       feature_cache_dir: str = None, plot: bool = False, activate: bool = False) -> str:
     """
-    Train the stress detection model and save it
+    Train the stress detection model and publish it to the model registry
+    
+    Checkpoints are written to work_dir; only the best fine-tuned model is
+    published, as a new version (made active if activate is set). Returns
+    the version name.
+    
+    With feature_cache_dir, the frozen-backbone phase trains the head on
+    cached backbone features instead of images (see train_head_on_features).
     """
     # Build the model
     model = build_model()
     print("Model built successfully")
     
-    # Prepare data generators
-    train_generator, validation_generator = prepare_data(data_dir, batch_size)
+    # Prepare input pipelines
+    train_ds, val_ds = prepare_data(data_dir, batch_size, cache_dir=cache_dir)
+    train_samples = count_training_samples(data_dir)
     print("Data prepared successfully")
     
-    # Create callbacks
-    checkpoint_callback = tf.keras.callbacks.ModelCheckpoint(
-        filepath=model_save_path,
-        save_best_only=True,
-        monitor='val_accuracy',
-        mode='max',
-        verbose=1
-    )
+    if feature_cache_dir:
+        print("Training the head on cached backbone features...")
+        history = train_head_on_features(model, data_dir, feature_cache_dir, epochs=epochs, batch_size=batch_size)
+    else:
+        # Create callbacks
+        checkpoint_callback = tf.keras.callbacks.ModelCheckpoint(
+            filepath=os.path.join(work_dir, 'checkpoint.h5'),
+            save_best_only=True,
+            monitor='val_accuracy',
+            mode='max',
+            verbose=1
+        )
+        
+        early_stopping_callback = tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss',
+            patience=5,
+            restore_best_weights=True
+        )
+        
+        # Train the model
+        print("Starting model training...")
+        history = model.fit(
+            train_ds,
+            validation_data=val_ds,
+            epochs=epochs,
+            callbacks=[checkpoint_callback, early_stopping_callback, EpochTimer(train_samples)]
+        )
     
-    early_stopping_callback = tf.keras.callbacks.EarlyStopping(
-        monitor='val_loss',
-        patience=5,
-        restore_best_weights=True
-    )
+    report_history(history, "Training History", plot)
     
-    # Train the model
-    print("Starting model training...")
-    history = model.fit(
-        train_generator,
-        steps_per_epoch=train_generator.samples // batch_size,
-        validation_data=validation_generator,
-        validation_steps=validation_generator.samples // batch_size,
-        epochs=epochs,
-        callbacks=[checkpoint_callback, early_stopping_callback]
-    )
-    
-    # Save the final model
-    model.save(model_save_path)
-    print(f"Model saved to {model_save_path}")
+    # Fine-tune model by unfreezing some layers
+    fine_tuned_path = os.path.join(work_dir, 'fine_tuned.h5')
+    history_fine = fine_tune_model(model, train_ds, val_ds, fine_tuned_path, epochs=fine_tune_epochs,
+                                   train_samples=train_samples, plot=plot)
     
-    # Plot training history
-    plot_training_history(history)
+    paths, _ = list_image_files(data_dir)
+    version = registry.publish([fine_tuned_path], metadata={
+        'val_accuracy': round(max(history_fine.history['val_accuracy']), 4),
+        'head_val_accuracy': round(max(history.history['val_accuracy']), 4),
+        'epochs': len(history.history['loss']),
+        'fine_tune_epochs': len(history_fine.history['loss']),
+        'batch_size': batch_size,
+        'training_samples': train_samples,
+        'data_fingerprint': dataset_fingerprint(paths)
+    })
+    print(f"Published model {version} to {registry.root}")
+    if activate:
+        registry.activate(version)
+        print(f"Activated {version}; serving workers switch to it on their next registry poll")
+    else:
+        print(f"Activate it with: python -m stress_detector.model_registry activate {version}")
+    return version
     
-    # Fine-tune model by unfreezing some layers
-    fine_tune_model(model, train_generator, validation_generator, model_save_path, epochs=10)
+def unfreeze_for_fine_tuning(model: Model, unfreeze_layers: int = 20, learning_rate: float = 0.00001):
+    """Make the last unfreeze_layers layers trainable and recompile with a lower learning rate"""
+    for layer in model.layers[-unfreeze_layers:]:
+        layer.trainable = True
     
-def fine_tune_model(model: Model, train_generator, validation_generator, model_save_path: str, epochs: int = 10):
+    compile_model(model, learning_rate)
+
+def fine_tune_model(model: Model, train_ds: tf.data.Dataset, val_ds: tf.data.Dataset, checkpoint_path: str,
+                    epochs: int = 10, train_samples: int = None, plot: bool = False):
     """
-    Fine-tune the model by unfreezing the last few layers of the base model
+    Fine-tune the model by unfreezing the last few layers of the base model.
+    The best epoch (by validation accuracy) is saved to checkpoint_path.
     """
-    # Unfreeze the last 20 layers
-    for layer in model.layers[-20:]:
-        layer.trainable = True
-    
-    # Recompile with a lower learning rate
-    model.compile(
-        optimizer=Adam(learning_rate=0.00001),  # Lower learning rate for fine-tuning
-        loss='binary_crossentropy',
-        metrics=['accuracy']
-    )
+    unfreeze_for_fine_tuning(model)
     
     # Create callbacks
     checkpoint_callback = tf.keras.callbacks.ModelCheckpoint(
-        filepath=model_save_path,
+        filepath=checkpoint_path,
         save_best_only=True,
         monitor='val_accuracy',
         mode='max',
@@ -176,61 +420,81 @@ def fine_tune_model(model: Model, train_generator, validation_generator, model_s
     # Fine-tune
     print("Starting fine-tuning...")
     history_fine = model.fit(
-        train_generator,
-        steps_per_epoch=train_generator.samples // train_generator.batch_size,
-        validation_data=validation_generator,
-        validation_steps=validation_generator.samples // validation_generator.batch_size,
+        train_ds,
+        validation_data=val_ds,
         epochs=epochs,
-        callbacks=[checkpoint_callback]
+        callbacks=[checkpoint_callback] + ([EpochTimer(train_samples)] if train_samples else [])
     )
     
-    # Save the fine-tuned model
-    model.save(model_save_path.replace('.h5', '_fine_tuned.h5'))
-    print(f"Fine-tuned model saved")
-    
-    # Plot fine-tuning history
-    plot_training_history(history_fine, title="Fine-tuning History")
-
-def plot_training_history(history, title="Training History"):
-    """Plot training history"""
-    plt.figure(figsize=(12, 4))
-    
-    # Plot accuracy
-    plt.subplot(1, 2, 1)
-    plt.plot(history.history['accuracy'])
-    plt.plot(history.history['val_accuracy'])
-    plt.title(f'{title} - Accuracy')
-    plt.ylabel('Accuracy')
-    plt.xlabel('Epoch')
-    plt.legend(['Train', 'Validation'], loc='upper left')
-    
-    # Plot loss
-    plt.subplot(1, 2, 2)
-    plt.plot(history.history['loss'])
-    plt.plot(history.history['val_loss'])
-    plt.title(f'{title} - Loss')
-    plt.ylabel('Loss')
-    plt.xlabel('Epoch')
-    plt.legend(['Train', 'Validation'], loc='upper left')
-    
-    plt.tight_layout()
-    
-    # Save the plot
-    plt.savefig(os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                            'outputs', f'{title.replace(" ", "_").lower()}.png'))
-    plt.close()
+    report_history(history_fine, "Fine-tuning History", plot)
+    return history_fine
+
+def count_training_samples(data_dir: str, validation_split: float = 0.2, seed: int = 42) -> int:
+    paths, labels = list_image_files(data_dir)
+    return len(split_image_files(paths, labels, validation_split, seed)[0])
+
+def report_history(history, title: str, plot: bool = False):
+    """
+    Print per-epoch timings, save the history as JSON under outputs/ and
+    optionally plot it in a separate process (matplotlib never loads here)
+    """
+    epochs = history.history
+    seconds = epochs.get('epoch_seconds', [])
+    if seconds:
+        rates = epochs.get('samples_per_sec', [])
+        print(f"{title}: {len(seconds)} epochs, {sum(seconds):.1f}s total, "
+              f"median {sorted(seconds)[len(seconds) // 2]:.1f}s/epoch, "
+              f"{sorted(rates)[len(rates) // 2]:.1f} samples/sec")
+    
+    output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'outputs')
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'{title.replace(" ", "_").lower()}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'title': title, 'history': {k: [float(v) for v in vs] for k, vs in epochs.items()}}, f)
+    
+    if plot:
+        subprocess.Popen([sys.executable, '-m', 'stress_detector.plot_history', path],
+                         cwd=os.path.dirname(output_dir))
 
 if __name__ == "__main__":
     # Define paths
-    base_dir = os.path.dirname(os.path.dirname(__file__))
-    data_dir = os.path.join(base_dir, 'data', 'stress_images')
-    model_save_dir = os.path.join(base_dir, 'stress_detector', 'models')
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
-    # Create directories if they don't exist
-    os.makedirs(model_save_dir, exist_ok=True)
-    os.makedirs(os.path.join(base_dir, 'outputs'), exist_ok=True)
+    parser = argparse.ArgumentParser(description="Train the stress detection model")
+    parser.add_argument('--data-dir', default=os.path.join(base_dir, 'data', 'stress_images'))
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--fine-tune-epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--registry', default=os.environ.get('STRESS_MODEL_REGISTRY') or DEFAULT_REGISTRY_DIR,
+                        help="Model registry to publish the trained model to")
+    parser.add_argument('--activate', action='store_true', help="Make the new version the one being served")
+    parser.add_argument('--cache-dir', default=os.path.join(base_dir, 'data', 'tf_cache'),
+                        help="Where decoded images are cached ('' caches in memory)")
+    parser.add_argument('--feature-cache-dir', default=None,
+                        help="Train the frozen-backbone phase on cached features stored here")
+    parser.add_argument('--intra-op-threads', type=int, help="TensorFlow threads per op (default: all cores)")
+    parser.add_argument('--inter-op-threads', type=int, help="Ops run concurrently (default: TensorFlow decides)")
+    parser.add_argument('--bf16', action='store_true',
+                        help="Mixed bfloat16 precision (only on CPUs with native bfloat16 support)")
+    parser.add_argument('--xla', action='store_true', help="Compile training steps with XLA")
+    parser.add_argument('--plot', action='store_true', help="Plot training curves (in a separate process)")
+    parser.add_argument('--benchmark-input', action='store_true',
+                        help="Only measure input pipeline throughput; no training")
+    parser.add_argument('--benchmark-steps', type=int, help="Steps per benchmark epoch (default: all)")
+    args = parser.parse_args()
     
-    model_save_path = os.path.join(model_save_dir, 'stress_detection_model.h5')
+    configure_training(args.intra_op_threads, args.inter_op_threads, bfloat16=args.bf16, jit_compile=args.xla)
     
-    # Train the model
-    train_stress_model(data_dir, model_save_path)
+    if args.benchmark_input:
+        train_ds, _ = prepare_data(args.data_dir, args.batch_size, cache_dir=args.cache_dir or None)
+        benchmark_input_pipeline(train_ds, epochs=3, steps=args.benchmark_steps)
+    else:
+        # Checkpoints live here until the final model is published
+        work_dir = os.path.join(base_dir, 'outputs', 'checkpoints')
+        os.makedirs(work_dir, exist_ok=True)
+        
+        # Train the model
+        train_stress_model(args.data_dir, work_dir, ModelRegistry(args.registry), epochs=args.epochs,
+                           batch_size=args.batch_size, fine_tune_epochs=args.fine_tune_epochs,
+                           cache_dir=args.cache_dir or None, feature_cache_dir=args.feature_cache_dir,
+                           plot=args.plot, activate=args.activate)
@@ -0,0 +1,176 @@
+import cv2
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ScoreAccumulator:
+    """
+    Running statistics over 0-100 integer stress scores.
+
+    Scores are kept as a 101-bucket histogram, so percentiles are exact and
+    memory stays constant no matter how many frames are added.
+    """
+
+    def __init__(self):
+        self.histogram = np.zeros(101, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.confidence_total = 0.0
+
+    def add(self, score: int, confidence: float):
+        self.histogram[score] += 1
+        self.count += 1
+        self.total += score
+        self.confidence_total += confidence
+
+    def merge(self, other: 'ScoreAccumulator'):
+        self.histogram += other.histogram
+        self.count += other.count
+        self.total += other.total
+        self.confidence_total += other.confidence_total
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def max(self) -> int:
+        nonzero = np.flatnonzero(self.histogram)
+        return int(nonzero[-1]) if len(nonzero) else 0
+
+    @property
+    def min(self) -> int:
+        nonzero = np.flatnonzero(self.histogram)
+        return int(nonzero[0]) if len(nonzero) else 0
+
+    def percentile(self, p: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, int(np.ceil(p / 100.0 * self.count)))
+        return int(np.searchsorted(np.cumsum(self.histogram), rank))
+
+
+class VideoAnalyzer:
+    """
+    Scores a video file by sampling frames and running them through the model in batches.
+
+    Frames between samples are skipped with grab() so they are never converted
+    to BGR images. Sampled frames are preprocessed straight into a fixed-size
+    batch buffer, and scores are folded into histogram accumulators; the
+    per-segment timeline is capped at max_segments by merging neighbouring
+    segments, so memory is bounded for videos of any length.
+    """
+
+    def __init__(self, preprocessor, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 sample_fps: float = 2.0, frame_stride: Optional[int] = None,
+                 segment_seconds: float = 10.0, max_segments: int = 120, batch_size: int = 16):
+        self.preprocessor = preprocessor
+        self.predict_fn = predict_fn
+        self.sample_fps = sample_fps
+        self.frame_stride = frame_stride
+        self.segment_seconds = segment_seconds
+        self.max_segments = max(2, max_segments)
+        self.batch_size = max(1, batch_size)
+
+    def _stride(self, fps: float) -> int:
+        if self.frame_stride:
+            return max(1, int(self.frame_stride))
+        return max(1, int(round(fps / self.sample_fps))) if self.sample_fps > 0 else 1
+
+    def analyze(self, video_path: str) -> Dict[str, Any]:
+        """Sample and score a video, returning aggregate statistics and a timeline"""
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            raise ValueError("Could not open video data")
+
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            stride = self._stride(fps)
+
+            overall = ScoreAccumulator()
+            segments: List[ScoreAccumulator] = []
+            segment_seconds = self.segment_seconds
+
+            batch = np.empty((self.batch_size,) + self.preprocessor.output_shape, dtype=np.float32)
+            batch_times = [0.0] * self.batch_size
+            pending = 0
+            frame = None
+            frame_index = 0
+            frames_with_face = 0
+
+            def flush(count: int):
+                nonlocal segments, segment_seconds
+                predictions = np.ravel(self.predict_fn(batch[:count]))
+                for prediction, timestamp in zip(predictions, batch_times[:count]):
+                    confidence = float(prediction)
+                    score = min(100, max(0, int(confidence * 100)))
+                    overall.add(score, confidence)
+
+                    segment_index = int(timestamp // segment_seconds)
+                    # Halve the timeline resolution whenever it would exceed max_segments
+                    while segment_index >= self.max_segments:
+                        segments = [self._merge_pair(segments[i:i+2]) for i in range(0, len(segments), 2)]
+                        segment_seconds *= 2
+                        segment_index = int(timestamp // segment_seconds)
+                    while len(segments) <= segment_index:
+                        segments.append(ScoreAccumulator())
+                    segments[segment_index].add(score, confidence)
+
+            while capture.grab():
+                if frame_index % stride == 0:
+                    ok, frame = capture.retrieve(frame)
+                    if ok and frame is not None:
+                        if self.preprocessor.preprocess_frame_into(frame, batch[pending]) is not None:
+                            frames_with_face += 1
+                        batch_times[pending] = frame_index / fps
+                        pending += 1
+                        if pending == self.batch_size:
+                            flush(pending)
+                            pending = 0
+                frame_index += 1
+
+            if pending:
+                flush(pending)
+        finally:
+            capture.release()
+
+        if overall.count == 0:
+            raise ValueError("No frames could be decoded from the video")
+
+        timeline = []
+        for i, segment in enumerate(segments):
+            if segment.count == 0:
+                continue
+            timeline.append({
+                'start': i * segment_seconds,
+                'end': (i + 1) * segment_seconds,
+                'frames': segment.count,
+                'mean_score': round(segment.mean, 2),
+                'max_score': segment.max
+            })
+
+        return {
+            'duration_seconds': frame_index / fps,
+            'frames_total': frame_index,
+            'frames_sampled': overall.count,
+            'frames_with_face': frames_with_face,
+            'frame_stride': stride,
+            'mean_score': round(overall.mean, 2),
+            'max_score': overall.max,
+            'min_score': overall.min,
+            'percentiles': {
+                'p50': overall.percentile(50),
+                'p90': overall.percentile(90),
+                'p99': overall.percentile(99)
+            },
+            'mean_confidence': overall.confidence_total / overall.count,
+            'segment_seconds': segment_seconds,
+            'timeline': timeline
+        }
+
+    @staticmethod
+    def _merge_pair(pair: List[ScoreAccumulator]) -> ScoreAccumulator:
+        merged = ScoreAccumulator()
+        for segment in pair:
+            merged.merge(segment)
+        return merged
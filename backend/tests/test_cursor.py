@@ -0,0 +1,18 @@
+from datetime import datetime
+
+import pytest
+
+from database.db_connector import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips():
+    timestamp = datetime(2024, 5, 1, 12, 30, 5)
+    cursor = encode_cursor(timestamp, 'record-1')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (timestamp, 'record-1')
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'W10', encode_cursor(datetime(2024, 1, 1), 'x')[:-3]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,27 @@
+import jwt
+
+import app as backend
+
+USER = {'id': 'u1', 'type': 'it_professional'}
+
+
+def history(monkeypatch, page, query=''):
+    monkeypatch.setattr(backend.db, 'get_user_principal', lambda user_id: USER)
+    monkeypatch.setattr(backend.db, 'get_stress_page', lambda *args: page)
+    token = jwt.encode({'user_id': USER['id']}, backend.app.config['SECRET_KEY'], algorithm='HS256')
+    client = backend.app.test_client()
+    return client.get(f'/api/stress/history{query}', headers={'Authorization': f'Bearer {token}'})
+
+
+def test_history_is_a_list_with_the_cursor_in_a_header(monkeypatch):
+    records = [{'id': 'r1', 'level': 'low', 'score': 10}]
+    response = history(monkeypatch, {'records': records, 'next_cursor': 'abc'})
+    assert response.status_code == 200
+    assert response.get_json() == records
+    assert response.headers['X-Next-Cursor'] == 'abc'
+
+
+def test_last_page_has_no_cursor_header(monkeypatch):
+    response = history(monkeypatch, {'records': [], 'next_cursor': None}, '?cursor=abc&fields=level')
+    assert response.get_json() == []
+    assert 'X-Next-Cursor' not in response.headers
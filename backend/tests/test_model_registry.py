@@ -0,0 +1,43 @@
+import pytest
+
+from stress_detector.model_registry import ModelRegistry, resolve_active_artifact
+
+
+def publish(tmp_path, *names):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    files = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b'weights for ' + name.encode())
+        files.append(str(path))
+    return registry, registry.publish(files, {'val_accuracy': 0.9})
+
+
+def test_published_version_verifies_and_resolves(tmp_path):
+    registry, version = publish(tmp_path, 'model.h5')
+    assert version == 'v0001'
+    registry.verify(version)
+    assert resolve_active_artifact('keras', registry.root) is None
+
+    registry.activate(version)
+    expected = tmp_path / 'registry' / 'versions' / 'v0001' / 'model.h5'
+    assert resolve_active_artifact('keras', registry.root) == str(expected)
+
+
+def test_tampered_artifact_fails_verification(tmp_path):
+    registry, version = publish(tmp_path, 'model.h5', 'model.tflite')
+    with open(registry.artifact_path(version, 'tflite'), 'ab') as f:
+        f.write(b'corrupted')
+
+    registry.verify(version, 'model.h5')
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        registry.verify(version)
+
+
+def test_backend_without_an_artifact_is_rejected(tmp_path):
+    registry, version = publish(tmp_path, 'model.h5')
+    registry.activate(version)
+    with pytest.raises(ValueError, match='no model.tflite'):
+        resolve_active_artifact('tflite', registry.root)
+    with pytest.raises(ValueError):
+        registry.activate('v0002')
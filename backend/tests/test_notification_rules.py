@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from database.notification_rules import NotificationRuleEngine
+
+START = datetime(2024, 1, 1, 8, 0, 0)
+SETTING = {'stress_level_threshold': 'high', 'consecutive_readings': 2, 'enabled': True, 'last_sent': None}
+
+
+def make_engine(sink=None, cooldown=timedelta(hours=1)):
+    sent = []
+
+    def record(user_id, setting, level, score):
+        sent.append((user_id, level, score))
+        return f"n{len(sent)}"
+
+    engine = NotificationRuleEngine(lambda user_id: dict(SETTING), lambda user_id, limit, exclude: [],
+                                    sink or record, cooldown=cooldown)
+    return engine, sent
+
+
+def readings(levels, minutes_apart=10):
+    return [{'id': f"r{i}", 'level': level, 'score': 80, 'timestamp': START + timedelta(minutes=i * minutes_apart)}
+            for i, level in enumerate(levels)]
+
+
+def test_run_reaching_the_threshold_alerts_once_within_the_cooldown():
+    engine, sent = make_engine()
+    for reading in readings(['high', 'severe', 'high', 'high']):
+        engine.observe('u1', reading['level'], reading['score'], reading['timestamp'])
+    assert len(sent) == 1
+    assert engine.get_stats()['alerts'] == 1
+    assert engine.get_stats()['suppressed_by_cooldown'] == 1
+
+
+def test_batch_spanning_several_cooldowns_only_counts_the_alert_it_sends():
+    engine, sent = make_engine()
+    # Four alert-worthy runs, an hour and a half apart
+    batch = readings(['high'] * 8, minutes_apart=45)
+    assert engine.observe_many('u1', batch)
+    assert len(sent) == 1
+    assert engine.get_stats()['alerts'] == 1
+
+    # The cooldown started at the alert that was sent, so the next batch alerts
+    later = [{'id': 'next', 'level': 'high', 'score': 90, 'timestamp': batch[-1]['timestamp'] + timedelta(minutes=5)}]
+    assert engine.observe_many('u1', later)
+    assert len(sent) == 2
+    assert engine.get_stats()['alerts'] == 2
+
+
+def test_failed_alert_does_not_start_the_cooldown():
+    engine, _ = make_engine(sink=lambda user_id, setting, level, score: None)
+    assert not engine.observe_many('u1', readings(['high', 'high']))
+    assert engine.get_stats()['alerts'] == 0
+
+    engine.alert_sink = lambda user_id, setting, level, score: 'n1'
+    assert engine.observe('u1', 'high', 80, START + timedelta(minutes=30))
+    assert engine.get_stats()['alerts'] == 1
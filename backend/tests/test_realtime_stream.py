@@ -0,0 +1,92 @@
+import json
+import struct
+import threading
+
+import jwt
+
+import app as backend
+
+USER = {'id': 'u1', 'type': 'it_professional'}
+
+
+class FakeSession:
+    session_id = 's1'
+    user_id = USER['id']
+    frames_received = 0
+    frames_scored = 0
+
+    def __init__(self, process_frame):
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.process_frame = process_frame
+        self.summaries = 0
+
+    def summary_due(self):
+        return False
+
+    def pop_summary(self):
+        self.summaries += 1
+        return None
+
+
+class FakeSessions:
+    def __init__(self, session):
+        self.session = session
+
+    def get(self, session_id, user_id):
+        return self.session
+
+    def close(self, session_id):
+        self.session.cancelled.set()
+        return self.session
+
+
+def client_for(monkeypatch, session):
+    monkeypatch.setattr(backend.db, 'get_user_principal', lambda user_id: USER)
+    monkeypatch.setattr(backend, 'realtime_sessions', FakeSessions(session))
+    token = jwt.encode({'user_id': USER['id']}, backend.app.config['SECRET_KEY'], algorithm='HS256')
+    return backend.app.test_client(), {'Authorization': f'Bearer {token}'}
+
+
+def frames(*payloads):
+    return b''.join(struct.pack('>I', len(payload)) + payload for payload in payloads)
+
+
+def test_failing_frame_ends_the_stream_with_an_error_line(monkeypatch):
+    def process_frame(frame):
+        if frame == b'bad':
+            raise RuntimeError('decoder crashed')
+        return {'frame': 1}
+
+    session = FakeSession(process_frame)
+    client, headers = client_for(monkeypatch, session)
+    response = client.post('/api/stress/realtime/session/s1/frames', data=frames(b'ok', b'bad', b'ok'),
+                           headers=headers)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [{'frame': 1}, {'error': 'Could not process frame'}]
+    response.close()
+    assert not session.lock.locked()
+
+
+def test_delete_does_not_wait_for_an_open_stream(monkeypatch):
+    session = FakeSession(lambda frame: {'frame': 1})
+    client, headers = client_for(monkeypatch, session)
+    session.lock.acquire()
+
+    response = client.delete('/api/stress/realtime/session/s1', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['streaming'] is True
+    assert session.cancelled.is_set()
+    # The stream saves the last summary when it closes
+    assert session.summaries == 0
+
+
+def test_cancelled_stream_stops_and_saves_the_last_summary(monkeypatch):
+    session = FakeSession(lambda frame: {'frame': 1})
+    session.cancelled.set()
+    client, headers = client_for(monkeypatch, session)
+    response = client.post('/api/stress/realtime/session/s1/frames', data=frames(b'ok'), headers=headers)
+    assert response.get_data() == b''
+    response.close()
+    assert session.summaries == 1
+    assert not session.lock.locked()
@@ -0,0 +1,48 @@
+import json
+
+from stress_detector.result_cache import ResultCache
+
+RESULT = {'stress_score': 40, 'stress_level': 'medium'}
+# What put() charges for one entry with a 16-byte key
+ENTRY_BYTES = len(json.dumps(RESULT)) + 16 + 64
+
+
+def make_cache(tmp_path, entries):
+    model = tmp_path / 'model.h5'
+    model.write_bytes(b'weights')
+    return ResultCache(str(model), max_bytes=ENTRY_BYTES * entries, check_interval=0)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, 2)
+    first, second, third = (cache.key_for(data) for data in (b'one', b'two', b'three'))
+    cache.put(first, RESULT)
+    cache.put(second, RESULT)
+    # Reading first makes second the oldest
+    assert cache.get(first) == RESULT
+    cache.put(third, RESULT)
+
+    assert cache.get(second) is None
+    assert cache.get(first) == RESULT
+    assert cache.get(third) == RESULT
+    stats = cache.get_stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    assert stats['bytes'] <= stats['max_bytes']
+
+
+def test_changed_model_file_drops_every_entry(tmp_path):
+    cache = make_cache(tmp_path, 4)
+    key = cache.key_for(b'one')
+    cache.put(key, RESULT)
+    (tmp_path / 'model.h5').write_bytes(b'retrained weights')
+
+    assert cache.get(key) is None
+    assert cache.get_stats()['invalidations'] == 1
+
+
+def test_result_larger_than_the_cache_is_not_stored(tmp_path):
+    cache = make_cache(tmp_path, 1)
+    key = cache.key_for(b'one')
+    cache.put(key, dict(RESULT, notes='x' * ENTRY_BYTES))
+    assert cache.get(key) is None
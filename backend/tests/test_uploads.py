@@ -0,0 +1,67 @@
+import io
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import app as backend
+from stress_detector.inference_pool import InferenceTimeout
+
+
+class TimingOutPool:
+    def detect_stress(self, image_data):
+        raise InferenceTimeout('Inference did not finish within 1s')
+
+
+def test_timed_out_upload_buffer_is_not_reused(monkeypatch):
+    monkeypatch.setattr(backend, 'get_inference_pool', lambda: TimingOutPool())
+    first = backend.read_into_buffer(io.BytesIO(b'first image'), 1024)
+
+    with backend.app.test_request_context():
+        response = backend.score_image({'id': 'u1'}, first, 'image', '')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(backend.INFERENCE_RETRY_AFTER)
+
+    second = backend.read_into_buffer(io.BytesIO(b'second image'), 1024)
+    assert second.obj is not first.obj
+    assert bytes(first) == b'first image'
+
+
+def test_buffer_is_reused_between_uploads():
+    first = backend.read_into_buffer(io.BytesIO(b'a' * 100), 1024)
+    second = backend.read_into_buffer(io.BytesIO(b'b' * 50), 1024)
+    assert second.obj is first.obj
+    assert bytes(second) == b'b' * 50
+
+
+def test_read_into_buffer_rejects_streams_over_the_limit():
+    with pytest.raises(backend.UploadTooLarge):
+        backend.read_into_buffer(io.BytesIO(b'x' * 2048), 1024)
+
+
+def test_spool_upload_stops_at_the_limit():
+    spool = io.BytesIO()
+    assert backend.spool_upload(io.BytesIO(b'v' * 100), spool, 100, chunk_size=16) == 100
+    assert spool.getvalue() == b'v' * 100
+
+    spool = io.BytesIO()
+    with pytest.raises(backend.UploadTooLarge):
+        backend.spool_upload(io.BytesIO(b'v' * 101), spool, 100, chunk_size=16)
+    assert len(spool.getvalue()) <= 100
+
+
+def test_app_caps_request_bodies():
+    assert backend.app.config['MAX_CONTENT_LENGTH'] == max(
+        backend.MAX_IMAGE_UPLOAD_BYTES, backend.MAX_VIDEO_UPLOAD_BYTES, backend.MAX_BATCH_UPLOAD_BYTES)
+
+
+def test_chunked_body_is_held_to_the_per_request_limit():
+    # No Content-Length, so upload_too_large() can't see the size up front
+    body = b'x' * 4096
+    environ = {'wsgi.input': io.BytesIO(body), 'wsgi.input_terminated': True}
+    with backend.app.test_request_context('/api/stress/detect/raw', method='POST', environ_overrides=environ,
+                                          content_type='application/octet-stream'):
+        assert not backend.upload_too_large(1024)
+        backend.limit_request_body(1024)
+        with pytest.raises(RequestEntityTooLarge):
+            backend.read_into_buffer(backend.request.stream, 1024)
+        assert backend.request_too_large(None)[1] == 413
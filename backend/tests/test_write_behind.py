@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from database.write_behind import WriteBehindQueue
+
+
+class FakeDatabase:
+    """In-memory stand-in for the DatabaseConnector methods the queue uses"""
+
+    def __init__(self, failures: int = 0):
+        self.records = {}
+        self.failures = failures
+        self.lock = threading.Lock()
+        self.notification_rules = self
+
+    def save_stress_records(self, records):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('database is down')
+            for record in records:
+                self.records[record['id']] = record
+            return True
+
+    def existing_stress_record_ids(self, ids):
+        with self.lock:
+            return [record_id for record_id in ids if record_id in self.records]
+
+    def observe_many(self, user_id, readings):
+        return False
+
+
+def journal_record(**overrides):
+    record = {
+        'id': str(uuid.uuid4()), 'user_id': 'u1', 'level': 'high', 'score': 70, 'source': 'image',
+        'notes': None, 'timestamp': datetime(2024, 1, 1, 12, 0, 0), 'model_version': None
+    }
+    record.update(overrides)
+    return record
+
+
+def write_journal(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(WriteBehindQueue._journal_line(record) for record in records)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_journal_left_under_own_pid_is_replayed(tmp_path):
+    # A crashed process that had this process's pid (e.g. pid 1 in a container)
+    crashed = [journal_record() for _ in range(3)]
+    own_journal = tmp_path / f"stress_records.{os.getpid()}.journal"
+    write_journal(own_journal, crashed)
+
+    db = FakeDatabase()
+    queue = WriteBehindQueue(db, str(tmp_path), flush_interval=0.01, notify=False)
+    new_id = queue.submit('u1', 'low', 10, 'image')
+
+    assert wait_for(lambda: len(db.records) == 4)
+    assert set(db.records) == {record['id'] for record in crashed} | {new_id}
+    assert wait_for(lambda: own_journal.stat().st_size == 0)
+    assert queue.get_stats()['replayed'] == 3
+
+
+def test_orphaned_journal_skips_records_already_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(WriteBehindQueue, '_pid_alive', staticmethod(lambda pid: False))
+    records = [journal_record() for _ in range(3)]
+    write_journal(tmp_path / 'stress_records.999999.journal', records)
+
+    db = FakeDatabase()
+    db.records[records[0]['id']] = records[0]
+    queue = WriteBehindQueue(db, str(tmp_path), notify=False)
+    queue.start()
+
+    assert set(db.records) == {record['id'] for record in records}
+    assert queue.get_stats()['replayed'] == 2
+    assert not (tmp_path / 'stress_records.999999.journal').exists()
+    assert not [name for name in os.listdir(tmp_path) if '.replay-' in name]
+
+
+def test_failed_batch_is_retried_not_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr('database.write_behind.time.sleep', lambda seconds: None)
+    db = FakeDatabase(failures=2)
+    queue = WriteBehindQueue(db, str(tmp_path), flush_interval=0.01, notify=False)
+    ids = [queue.submit('u1', 'low', 10, 'image') for _ in range(5)]
+
+    assert wait_for(lambda: len(db.records) == 5)
+    assert set(db.records) == set(ids)
+    assert queue.get_stats()['failed_batches'] == 2
+    assert queue._worker.is_alive()